@@ -0,0 +1,223 @@
+"""
+ATS fingerprinting
+Recognizes applicant tracking systems (Workday, Greenhouse, Lever,
+SmartRecruiters, ...) from the page URL or, failing that, DOM signatures in
+the parsed form, and maps their fields to profile paths with a versioned
+template instead of the LLM. Templates are JSON files in ATS_TEMPLATE_DIR.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from field_rules import PROFILE_PATHS
+from metrics import ATS_DETECTIONS
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ats_templates')
+
+# Template mappings are exact by construction, so they rank above the rules tier
+DEFAULT_TEMPLATE_CONFIDENCE = 0.97
+
+
+def _field_value(field, key: str) -> Optional[str]:
+    """Attribute of a field record; data-* keys read its data attributes"""
+    if key.startswith('data-'):
+        return field.data_attrs.get(key)
+    return field.get(key)
+
+
+def _compile_match(match: Dict[str, str], where: str) -> List[Tuple[str, "re.Pattern"]]:
+    if not isinstance(match, dict) or not match:
+        raise ValueError(f"{where}: 'match' must be a non-empty object")
+    return [(key, re.compile(pattern, re.IGNORECASE)) for key, pattern in match.items()]
+
+
+class ATSTemplate:
+    """
+    One platform's template:
+      {"platform", "version", "form_type",
+       "url_patterns": [regex, ...],                searched in the page URL
+       "dom_signatures": {"form": {attr: regex},    any form attribute matching, or
+                          "fields": {key: regex},   at least min_fields fields matching
+                          "min_fields": 2},
+       "fields": [{"match": {key: regex}, "purpose", "path"?, "confidence"?}]}
+    Field keys are record keys (name, id, label, ...) or data-* attributes;
+    patterns must match the whole value and any one key matching is enough.
+    "path" is a profile path or a composite like "{personalInfo.city}, {personalInfo.state}";
+    without it the purpose's standard path is used. A field whose rule has no path,
+    or whose path has no profile value, goes on to the rules tier and the LLM.
+    """
+
+    def __init__(self, spec: Dict[str, Any], source: Optional[str] = None):
+        where = source or spec.get('platform', 'template')
+        try:
+            self.platform = str(spec['platform'])
+            self.version = int(spec['version'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{where}: needs 'platform' and an integer 'version'") from None
+        self.form_type = spec.get('form_type', 'job_application')
+        self.source = source
+
+        self.url_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in spec.get('url_patterns', [])]
+
+        signatures = spec.get('dom_signatures') or {}
+        self.form_signature = _compile_match(signatures['form'], where) if signatures.get('form') else []
+        self.field_signature = _compile_match(signatures['fields'], where) if signatures.get('fields') else []
+        self.min_fields = int(signatures.get('min_fields', 2))
+
+        self.rules = []
+        for index, rule in enumerate(spec.get('fields', [])):
+            purpose = rule.get('purpose')
+            if not purpose:
+                raise ValueError(f"{where}: field rule {index} needs a 'purpose'")
+            self.rules.append({
+                "match": _compile_match(rule.get('match'), f"{where} field rule {index}"),
+                "purpose": purpose,
+                "path": rule.get('path', PROFILE_PATHS.get(purpose)),
+                "confidence": float(rule.get('confidence', DEFAULT_TEMPLATE_CONFIDENCE)),
+            })
+
+    @classmethod
+    def load(cls, path: str) -> "ATSTemplate":
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), source=os.path.basename(path))
+
+    @property
+    def key(self) -> str:
+        return f"{self.platform}@{self.version}"
+
+    def describe(self) -> Dict[str, Any]:
+        return {"platform": self.platform, "version": self.version}
+
+    def matches_url(self, url: Optional[str]) -> bool:
+        return bool(url) and any(pattern.search(url) for pattern in self.url_patterns)
+
+    def matches_dom(self, parser) -> bool:
+        """Form attributes matching the form signature, or enough fields matching the field one"""
+        for form in parser.forms:
+            attrs = form.get('attrs') or {}
+            if any(
+                attrs.get(key) and pattern.fullmatch(attrs[key])
+                for key, pattern in self.form_signature
+            ):
+                return True
+
+        if not self.field_signature:
+            return False
+        found = 0
+        for form in parser.forms:
+            for field in form['fields']:
+                if self._matches(field, self.field_signature):
+                    found += 1
+                    if found >= self.min_fields:
+                        return True
+        return False
+
+    def match(self, field) -> Optional[Dict[str, Any]]:
+        """The template rule covering this field, if any"""
+        for rule in self.rules:
+            if self._matches(field, rule['match']):
+                return rule
+        return None
+
+    @staticmethod
+    def _matches(field, match: List[Tuple[str, "re.Pattern"]]) -> bool:
+        for key, pattern in match:
+            value = _field_value(field, key)
+            if value and pattern.fullmatch(value):
+                return True
+        return False
+
+
+class ATSRegistry:
+    """
+    Loaded ATS templates, newest version per platform
+    Detection tries every template's URL patterns first, then DOM signatures
+    """
+
+    def __init__(self, template_dir: Optional[str] = DEFAULT_TEMPLATE_DIR, enabled: bool = True):
+        self.template_dir = template_dir
+        self.enabled = enabled
+        self.templates: Dict[str, ATSTemplate] = {}
+        self._lock = threading.Lock()
+        self.stats = {"url": 0, "dom": 0, "unrecognized": 0}
+        if enabled and template_dir:
+            self.reload()
+
+    @classmethod
+    def from_env(cls) -> "ATSRegistry":
+        return cls(
+            template_dir=os.getenv('ATS_TEMPLATE_DIR', DEFAULT_TEMPLATE_DIR),
+            enabled=os.getenv('ATS_TEMPLATES', 'true').lower() == 'true'
+        )
+
+    def reload(self):
+        """(Re)load every *.json template; a platform keeps its highest version"""
+        templates: Dict[str, ATSTemplate] = {}
+        if os.path.isdir(self.template_dir):
+            for name in sorted(os.listdir(self.template_dir)):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    template = ATSTemplate.load(os.path.join(self.template_dir, name))
+                except (OSError, ValueError, re.error) as e:
+                    print(f"⚠️  Skipping ATS template {name}: {e}")
+                    continue
+                current = templates.get(template.platform)
+                if current is None or template.version > current.version:
+                    templates[template.platform] = template
+        else:
+            print(f"⚠️  ATS template directory not found: {self.template_dir}")
+
+        with self._lock:
+            self.templates = templates
+        print(f"🧩 ATS templates: {', '.join(t.key for t in templates.values()) or 'none'}")
+
+    def add(self, template: ATSTemplate):
+        with self._lock:
+            current = self.templates.get(template.platform)
+            if current is None or template.version >= current.version:
+                self.templates = {**self.templates, template.platform: template}
+
+    def detect(self, url: Optional[str], parser=None) -> Optional[ATSTemplate]:
+        """Template for the page's platform, or None when it is not recognized"""
+        if not self.enabled:
+            return None
+        templates = list(self.templates.values())
+
+        for template in templates:
+            if template.matches_url(url):
+                return self._record(template, 'url')
+
+        if parser is not None:
+            for template in templates:
+                if template.matches_dom(parser):
+                    return self._record(template, 'dom')
+
+        with self._lock:
+            self.stats["unrecognized"] += 1
+        return None
+
+    def _record(self, template: ATSTemplate, via: str) -> ATSTemplate:
+        with self._lock:
+            self.stats[via] += 1
+        ATS_DETECTIONS.inc(platform=template.platform, via=via)
+        return template
+
+    def is_current(self, analysis: Dict[str, Any]) -> bool:
+        """False for an analysis built with a template version that is no longer the loaded one"""
+        built_with = analysis.get('ats')
+        if not built_with:
+            return True
+        template = self.templates.get(built_with.get('platform'))
+        return template is not None and self.enabled and template.version == built_with.get('version')
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "enabled": self.enabled,
+                "templates": {platform: template.version for platform, template in self.templates.items()},
+            }
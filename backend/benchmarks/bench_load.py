@@ -0,0 +1,332 @@
+"""
+Benchmark: API load scenarios with no network
+Runs the FastAPI app in-process with the replay LLM provider (recorded responses
+from benchmarks/recordings.json, simulated latency) and reports throughput,
+p50/p99 latency and peak memory per scenario. Results are compared with a stored
+baseline and regressions beyond the tolerance fail the run; a baseline recorded
+with different settings is refused rather than compared.
+
+Run from the backend directory:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --scenario ws --concurrency 16 --requests 200
+    python benchmarks/bench_load.py --save-baseline
+
+Re-record the corpus answers after a prompt change (LLM_REPLAY_SOURCE=openai or
+dedalus records real model answers and needs that provider's API key):
+    LLM_REPLAY_SOURCE=stub STUB_LLM_LATENCY_MS=0 python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --save-baseline
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from form_cache import FormStructureCache
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ['analyze-form', 'analyze-form-cached', 'smart-dropdown', 'ws']
+
+PROFILE = {
+    "personalInfo": {
+        "firstName": "Jane", "lastName": "Doe", "email": "jane@example.com",
+        "phone": "+1 555 0100", "city": "Austin", "country": "United States",
+    },
+    "professionalInfo": {"currentTitle": "Software Engineer", "yearsExperience": "6"},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenario', choices=SCENARIOS + ['all'], default='all')
+    parser.add_argument('--requests', type=int, default=100, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=200, help="simulated LLM latency")
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--sizes', default='50,200', help="synthetic form sizes (fields)")
+    parser.add_argument('--recordings', default=os.path.join(BENCH_DIR, 'recordings.json'))
+    parser.add_argument('--baseline', default=os.path.join(BENCH_DIR, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument('--min-delta-ms', type=float, default=50,
+                        help="slowdowns smaller than this are scheduler noise, not regressions")
+    parser.add_argument('--verbose', action='store_true', help="keep the server's per-request logging")
+    return parser.parse_args()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def run_load(call: Callable[[int], Awaitable[Any]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue `requests` calls with at most `concurrency` in flight; latency per call"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in next_index:
+            started = time.perf_counter()
+            try:
+                await call(index)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"  ⚠️ first error: {e}", file=sys.stderr)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def analyze_form_scenario(client, pages, args, cached: bool) -> Dict[str, Any]:
+    import server
+
+    cache = server.form_analyzer.cache
+    if not cached:
+        # Every request goes through triage and the LLM
+        server.form_analyzer.cache = FormStructureCache(max_entries=0)
+
+    async def call(index: int):
+        name, html = pages[index % len(pages)]
+        response = await client.post("/api/analyze-form", json={
+            "html": html, "url": f"https://bench.local/{name}", "user_profile": PROFILE
+        })
+        body = response.json()
+        if not body.get('success'):
+            raise RuntimeError(body.get('error'))
+
+    try:
+        if cached:
+            for index in range(len(pages)):
+                await call(index)
+        return await run_load(call, args.requests, args.concurrency)
+    finally:
+        server.form_analyzer.cache = cache
+
+
+async def smart_dropdown_scenario(client, args) -> Dict[str, Any]:
+    from corpus import dropdown_cases
+
+    cases = dropdown_cases()
+
+    async def call(index: int):
+        options, desired, context = cases[index % len(cases)]
+        response = await client.post(
+            "/api/smart-dropdown",
+            params={"dropdown_html": "", "desired_value": desired, "context": context},
+            json=options
+        )
+        body = response.json()
+        if not body.get('success'):
+            raise RuntimeError(body.get('error'))
+
+    return await run_load(call, args.requests, args.concurrency)
+
+
+async def ws_scenario(pages, args) -> Dict[str, Any]:
+    """One connection per worker; latency is analyze_form until the final form_analysis"""
+    import uvicorn
+    import websockets
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    uv = uvicorn.Server(config)
+    serve = asyncio.ensure_future(uv.serve())
+    while not uv.started:
+        await asyncio.sleep(0.01)
+    port = uv.servers[0].sockets[0].getsockname()[1]
+
+    cache = server.form_analyzer.cache
+    server.form_analyzer.cache = FormStructureCache(max_entries=0)
+    first_instruction: List[float] = []
+    connections: Dict[int, Any] = {}
+    request_ids = iter(range(1, 1 << 30))
+
+    async def call(index: int):
+        task = id(asyncio.current_task())
+        if task not in connections:
+            connections[task] = await websockets.connect(f"ws://127.0.0.1:{port}/ws", max_size=None)
+        ws = connections[task]
+        name, html = pages[index % len(pages)]
+        request_id = next(request_ids)
+        started = time.perf_counter()
+        await ws.send(json.dumps({
+            "action": "analyze_form", "request_id": request_id,
+            "html": html, "url": f"https://bench.local/{name}", "user_profile": PROFILE
+        }))
+        seen_instruction = False
+        while True:
+            message = json.loads(await ws.recv())
+            if message.get('request_id') != request_id:
+                continue
+            if message['type'] == 'instruction' and not seen_instruction:
+                seen_instruction = True
+                first_instruction.append(time.perf_counter() - started)
+            elif message['type'] == 'form_analysis':
+                return
+            elif message['type'] == 'error':
+                raise RuntimeError(message.get('error'))
+
+    try:
+        result = await run_load(call, args.requests, args.concurrency)
+        result["first_instruction_p50_ms"] = round(percentile(first_instruction, 50) * 1000, 2)
+        return result
+    finally:
+        server.form_analyzer.cache = cache
+        for ws in connections.values():
+            await ws.close()
+        uv.should_exit = True
+        await serve
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Any], tolerance: float,
+            min_delta_ms: float = 0) -> List[str]:
+    """Regressions of each scenario against its stored baseline"""
+    concurrency = baseline.get('config', {}).get('concurrency', 1)
+
+    def slower(value: float, base: float) -> bool:
+        return value > base * (1 + tolerance) and value - base > min_delta_ms
+
+    regressions = []
+    for scenario, result in results.items():
+        base = baseline.get('scenarios', {}).get(scenario)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if base.get(metric) and slower(result[metric], base[metric]):
+                regressions.append(f"{scenario}: {metric} {result[metric]} vs baseline {base[metric]}")
+        if base.get('peak_rss_mb') and result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{scenario}: peak_rss_mb {result['peak_rss_mb']} vs baseline {base['peak_rss_mb']}")
+        # Throughput as time per request per worker, so the noise floor applies to it too
+        if base.get('throughput_rps') and result['throughput_rps'] and slower(
+            concurrency * 1000 / result['throughput_rps'], concurrency * 1000 / base['throughput_rps']
+        ):
+            regressions.append(
+                f"{scenario}: throughput_rps {result['throughput_rps']} vs baseline {base['throughput_rps']}"
+            )
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{scenario}: {result['errors']} errors vs baseline {base.get('errors', 0)}")
+    return regressions
+
+
+async def run(args) -> int:
+    import httpx
+    import server
+    from corpus import load_corpus
+
+    sizes = tuple(int(size) for size in args.sizes.split(',') if size)
+    pages = load_corpus(sizes)
+    scenarios = SCENARIOS if args.scenario == 'all' else [args.scenario]
+    config = {
+        "requests": args.requests, "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "sizes": list(sizes),
+        "scenarios": scenarios, "provider": server.form_analyzer.provider.name,
+    }
+
+    print(f"Corpus: {len(pages)} pages; {args.requests} requests x {args.concurrency} concurrent; "
+          f"LLM latency {args.latency_ms:g}±{args.jitter_ms:g} ms via {server.form_analyzer.provider.name}\n")
+
+    await server.form_analyzer.initialize()
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench.local", timeout=None) as client:
+        for scenario in scenarios:
+            print(f"▶️ {scenario}")
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+                if scenario == 'analyze-form':
+                    results[scenario] = await analyze_form_scenario(client, pages, args, cached=False)
+                elif scenario == 'analyze-form-cached':
+                    results[scenario] = await analyze_form_scenario(client, pages, args, cached=True)
+                elif scenario == 'smart-dropdown':
+                    results[scenario] = await smart_dropdown_scenario(client, args)
+                else:
+                    results[scenario] = await ws_scenario(pages, args)
+
+    # Saves newly recorded answers when LLM_REPLAY_SOURCE is set
+    provider = server.form_analyzer.provider
+    await server.form_analyzer.close()
+
+    print(f"{'scenario':<22}{'rps':>9}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>9}{'errors':>8}")
+    for scenario, result in results.items():
+        print(f"{scenario:<22}{result['throughput_rps']:>9}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['peak_rss_mb']:>9}{result['errors']:>8}")
+    if 'replay' in provider.get_stats():
+        replay = provider.get_stats()['replay']
+        print(f"\nReplay: {replay}")
+        if replay['misses'] and not os.getenv('LLM_REPLAY_SOURCE'):
+            print(f"⚠️ {replay['misses']} prompts had no recording and got stub answers; "
+                  f"re-record {args.recordings} with LLM_REPLAY_SOURCE set")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"config": config, "scenarios": results}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline stored; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print(f"\n❌ Baseline was recorded with {baseline.get('config')}")
+        print(f"   this run used {config}")
+        print("   Re-run with the baseline's settings, or --save-baseline to replace it")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\n❌ Regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"\n✅ Within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+def main():
+    args = parse_args()
+
+    # Must be set before the server module builds its analyzer
+    os.environ.setdefault('LLM_PROVIDER', 'replay')
+    os.environ.setdefault('LLM_REPLAY_FILE', args.recordings)
+    os.environ['LLM_REPLAY_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['LLM_REPLAY_JITTER_MS'] = str(args.jitter_ms)
+    os.environ.setdefault('LLM_MAX_CONCURRENCY', str(max(8, args.concurrency)))
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: form parsing throughput and retained memory on large forms
+Compares the slotted FormField records with the previous per-field dicts on
+otherwise identical parsers, plus the current FormHTMLParser (labels resolved
+in the same pass) for reference
+
+Run from the backend directory:
+    python benchmarks/bench_parser.py [field_count]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from html.parser import HTMLParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from form_parser import FIELD_TAGS, MAX_LABEL_TEXT, FormField, FormHTMLParser
+
+
+class DictFieldParser(HTMLParser):
+    """
+    Previous behaviour: one 10-key dict per field
+    Self-contained (label handling as before in-pass label resolution) so later
+    parser changes can't break it; SlottedFieldParser differs only in the records
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self.current_form = None
+        self.current_label = None
+        self.field_labels = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs_dict = dict(attrs)
+
+        if tag == 'form':
+            self.current_form = {'tag': tag, 'attrs': attrs_dict, 'fields': []}
+
+        elif tag == 'label':
+            self.current_label = {'for': attrs_dict.get('for'), 'text': ''}
+
+        elif tag in FIELD_TAGS:
+            field = self._make_field(tag, attrs)
+            if self.current_form:
+                self.current_form['fields'].append(field)
+
+    def _make_field(self, tag: str, attrs):
+        attrs_dict = dict(attrs)
+        return {
+            'tag': tag,
+            'type': attrs_dict.get('type', 'text'),
+            'name': attrs_dict.get('name'),
+            'id': attrs_dict.get('id'),
+            'placeholder': attrs_dict.get('placeholder'),
+            'required': 'required' in attrs_dict,
+            'role': attrs_dict.get('role'),
+            'class': attrs_dict.get('class'),
+            'data_attrs': {k: v for k, v in attrs_dict.items() if k.startswith('data-')},
+            'aria_label': attrs_dict.get('aria-label'),
+        }
+
+    def handle_data(self, data):
+        if self.current_label and len(self.current_label['text']) < MAX_LABEL_TEXT:
+            self.current_label['text'] += data.strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self.current_form:
+            self.forms.append(self.current_form)
+            self.current_form = None
+        elif tag == 'label' and self.current_label:
+            if self.current_label['for']:
+                self.field_labels[self.current_label['for']] = self.current_label['text']
+            self.current_label = None
+
+
+class SlottedFieldParser(DictFieldParser):
+    """Same parser with slotted FormField records, built in one pass over the attributes"""
+
+    def _make_field(self, tag: str, attrs) -> FormField:
+        field = FormField(tag)
+        data_attrs = []
+
+        for key, value in attrs:
+            if key == 'type':
+                field.type = sys.intern(value or 'text')
+            elif key == 'name':
+                field.name = value
+            elif key == 'id':
+                field.id = value
+            elif key == 'placeholder':
+                field.placeholder = value
+            elif key == 'required':
+                field.required = True
+            elif key == 'role':
+                field.role = value
+            elif key == 'class':
+                field.css_class = value
+            elif key == 'aria-label':
+                field.aria_label = value
+            elif key.startswith('data-'):
+                data_attrs.append((key, value))
+
+        if data_attrs:
+            field._data_attrs = tuple(data_attrs)
+        return field
+
+
+def build_form(field_count: int) -> str:
+    """Synthetic ATS-style form with labels, data attributes and utility classes"""
+    rows = ['<form id="application">']
+    for i in range(field_count):
+        rows.append(
+            f'<div class="flex flex-col gap-2 px-4 py-2">'
+            f'<label for="field_{i}">Question {i}</label>'
+            f'<input type="text" id="field_{i}" name="answers[{i}]" placeholder="Answer {i}" '
+            f'class="w-full rounded-md border border-gray-300 px-3 py-2 text-sm focus:ring-2" '
+            f'data-automation-id="question-{i}" data-qa="q{i}" aria-label="Question {i}" required>'
+            f'</div>'
+        )
+    rows.append('</form>')
+    return '\n'.join(rows)
+
+
+def measure(parser_cls, html: str, rounds: int = 20):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parser = parser_cls()
+        parser.feed(html)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    parser = parser_cls()
+    parser.feed(html)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    fields = sum(len(form['fields']) for form in parser.forms)
+    return best, retained, fields
+
+
+def main():
+    field_count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    html = build_form(field_count)
+
+    print(f"Form with {field_count} fields ({len(html) / 1024:.0f} KB)")
+    print(f"{'parser':<16}{'best parse (ms)':>18}{'fields/s':>14}{'retained (KB)':>16}")
+
+    parsers = (
+        ('dict records', DictFieldParser),
+        ('slotted', SlottedFieldParser),
+        ('current', FormHTMLParser),
+    )
+    for label, parser_cls in parsers:
+        best, retained, fields = measure(parser_cls, html)
+        print(f"{label:<16}{best * 1000:>18.2f}{fields / best:>14.0f}{retained / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: analysis prompt size, verbose field blocks vs compact rows
+Counts tokens with tiktoken (cl100k_base) when installed, else ~4 chars per token;
+estimated runs are flagged in the output (pip install -r requirements-dev.txt)
+
+Run from the backend directory:
+    python benchmarks/bench_prompt.py
+    python benchmarks/bench_prompt.py --require-tokenizer   # fail instead of estimating
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from form_analyzer import FormAnalyzer
+from form_parser import parse_form_html
+from prompt_encoding import estimate_tokens, _ENCODING
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+SAMPLE_PAGES = ['test-form.html', 'smartrecruiters-test.html']
+
+PROFILE = {
+    "personalInfo": {
+        "firstName": "Jane", "lastName": "Doe", "email": "jane@example.com",
+        "phone": "+1 555 0100", "city": "Austin", "state": "TX", "country": "United States",
+    },
+    "professionalInfo": {
+        "currentTitle": "Software Engineer", "yearsExperience": "6",
+        "skills": ["Python", "TypeScript", "SQL"], "linkedin": "https://linkedin.com/in/janedoe",
+    },
+}
+
+LEGACY_SCHEMA = """TASK:
+1. Identify each form field's purpose (e.g., "first name", "email", "phone")
+2. Map each field to the appropriate user data
+3. For dropdowns/selects, suggest the best matching value
+4. Provide CSS selectors to locate each field
+5. Indicate confidence level (0.0-1.0) for each mapping
+
+Return your analysis as a JSON object with this structure:
+{
+  "form_type": "job_application" | "registration" | "profile" | "other",
+  "confidence": 0.0-1.0,
+  "field_mappings": [
+    {
+      "field_purpose": "first_name",
+      "selector": "input[name='firstName']",
+      "user_data_path": "personalInfo.firstName",
+      "value": "John",
+      "confidence": 0.95,
+      "field_type": "text" | "select" | "radio" | "checkbox" | "file" | "textarea"
+    }
+  ],
+  "instructions": [
+    {
+      "step": 1,
+      "action": "fill" | "select" | "click" | "upload",
+      "selector": "input[name='firstName']",
+      "value": "John",
+      "description": "Fill first name field"
+    }
+  ]
+}
+
+Provide ONLY the JSON response, no additional text."""
+
+
+def legacy_prompt(parser, url: str, profile) -> str:
+    """Prompt as built before compact encoding: indented blocks, raw classes, full schema"""
+    context = f"Form URL: {url}\n\n"
+    for idx, form in enumerate(parser.forms):
+        context += f"Form {idx + 1}:\n"
+        context += f"Fields ({len(form['fields'])}):\n"
+        for field in form['fields']:
+            context += f"  - Tag: {field['tag']}\n"
+            context += f"    Type: {field['type']}\n"
+            if field['name']:
+                context += f"    Name: {field['name']}\n"
+            if field['id']:
+                context += f"    ID: {field['id']}\n"
+            if field['placeholder']:
+                context += f"    Placeholder: {field['placeholder']}\n"
+            if field['aria_label']:
+                context += f"    Aria-label: {field['aria_label']}\n"
+            if field['class']:
+                context += f"    Class: {field['class']}\n"
+            if field['required']:
+                context += "    Required: Yes\n"
+            context += "\n"
+
+    data = "\n".join(
+        f"  - {key}: {', '.join(map(str, value)) if isinstance(value, list) else value}"
+        for section in profile.values() for key, value in section.items()
+    )
+    return (
+        "You are an intelligent form filling assistant. Analyze this form and provide field mappings.\n\n"
+        f"FORM STRUCTURE:\n{context}\nAVAILABLE USER DATA:\n{data}\n\n{LEGACY_SCHEMA}"
+    )
+
+
+def compact_prompts(analyzer, parser, url: str, profile):
+    forms = [[analyzer._describe_field(field) for field in form['fields']] for form in parser.forms]
+    contexts = analyzer._format_form_context(url, forms, profile)
+    return [analyzer._create_analysis_prompt(context, profile) for context in contexts]
+
+
+def tailwind_form(field_count: int) -> str:
+    """Synthetic page styled the way utility-CSS and CSS-in-JS sites emit markup"""
+    utility = ("mt-1 block w-full rounded-md border-gray-300 px-3 py-2 shadow-sm "
+               "focus:border-indigo-500 focus:ring-indigo-500 sm:text-sm css-1x9ab2c")
+    fields = ''.join(
+        f'<div class="flex flex-col gap-2"><label for="q{i}">Question {i}</label>'
+        f'<input type="text" id="q{i}" name="answers[{i}]" class="{utility} _field_k3j9x__{i}" '
+        f'placeholder="Your answer"></div>'
+        for i in range(field_count)
+    )
+    return f'<form class="space-y-6">{fields}</form>'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--require-tokenizer', action='store_true',
+                        help="exit with an error instead of falling back to the chars/4 estimate")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if _ENCODING is None:
+        message = ("tiktoken is not installed (or its cl100k_base data could not be loaded); "
+                   "install requirements-dev.txt for real token counts")
+        if args.require_tokenizer:
+            sys.exit(f"❌ {message}")
+        print(f"⚠️  ESTIMATED: {message}.")
+        print("⚠️  Counts below are len(text) / 4, not tokenizer output.\n")
+
+    analyzer = FormAnalyzer()
+    tokenizer = "tiktoken cl100k_base" if _ENCODING is not None else "chars/4 ESTIMATE (~)"
+    unit = '' if _ENCODING is not None else '~'
+    print(f"Token counts via {tokenizer}; budget {analyzer.prompt_token_budget}\n")
+    print(f"{'page':<30}{'fields':>8}{'legacy' + unit:>10}{'compact' + unit:>10}{'chunks':>8}{'saved':>8}")
+
+    pages = []
+    for name in SAMPLE_PAGES:
+        with open(os.path.join(REPO_ROOT, name), encoding='utf-8') as f:
+            pages.append((name, f.read()))
+    pages.append(("synthetic tailwind (40)", tailwind_form(40)))
+    pages.append(("synthetic tailwind (400)", tailwind_form(400)))
+
+    for name, html in pages:
+        parser = parse_form_html(html)
+        url = f"https://example.com/{name}"
+        field_count = sum(len(form['fields']) for form in parser.forms)
+
+        before = estimate_tokens(legacy_prompt(parser, url, PROFILE))
+        prompts = compact_prompts(analyzer, parser, url, PROFILE)
+        after = sum(estimate_tokens(prompt) for prompt in prompts)
+
+        print(f"{name:<30}{field_count:>8}{before:>10}{after:>10}{len(prompts):>8}"
+              f"{(1 - after / before) * 100:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: keyword classification cost as the purpose vocabulary grows
+Compares the compiled keyword trie with a per-purpose any() scan
+
+Run from the backend directory:
+    python benchmarks/bench_rules.py
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from field_rules import KeywordMatcher, normalize_hint
+
+
+def make_vocabulary(purpose_count: int, keywords_per_purpose: int = 6):
+    rng = random.Random(purpose_count)
+    vocabulary = []
+    for idx in range(purpose_count):
+        keywords = [
+            ' '.join(
+                ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 8)))
+                for _ in range(rng.randint(1, 3))
+            )
+            for _ in range(keywords_per_purpose)
+        ]
+        vocabulary.append((f"purpose_{idx}", keywords))
+    return vocabulary
+
+
+def make_hints(vocabulary, count: int = 2000):
+    rng = random.Random(7)
+    hints = []
+    for _ in range(count):
+        words = ['please', 'enter', 'your']
+        if rng.random() < 0.7:
+            words.append(rng.choice(rng.choice(vocabulary)[1]))
+        words.append('below')
+        hints.append(normalize_hint(' '.join(words)))
+    return hints
+
+
+def scan_chain(vocabulary, hint: str):
+    padded = f" {hint} "
+    for purpose, keywords in vocabulary:
+        if any(f" {kw} " in padded for kw in keywords):
+            return purpose
+    return None
+
+
+def scan_compiled(matcher, purposes, hint: str):
+    best = matcher.best(hint)
+    return purposes[best] if best is not None else None
+
+
+def main():
+    print(f"{'purposes':>10}{'any() chain (us/field)':>26}{'compiled (us/field)':>24}")
+
+    for purpose_count in (10, 50, 200, 500):
+        vocabulary = make_vocabulary(purpose_count)
+        hints = make_hints(vocabulary)
+
+        index = {}
+        for priority, (_, keywords) in enumerate(vocabulary):
+            for kw in keywords:
+                index.setdefault(kw, priority)
+        matcher = KeywordMatcher(index)
+        purposes = [purpose for purpose, _ in vocabulary]
+
+        start = time.perf_counter()
+        chain = [scan_chain(vocabulary, hint) for hint in hints]
+        chain_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled = [scan_compiled(matcher, purposes, hint) for hint in hints]
+        compiled_time = time.perf_counter() - start
+
+        assert chain == compiled, "matchers disagree"
+
+        print(f"{purpose_count:>10}{chain_time / len(hints) * 1e6:>26.1f}"
+              f"{compiled_time / len(hints) * 1e6:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
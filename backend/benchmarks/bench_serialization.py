@@ -0,0 +1,142 @@
+"""
+Benchmark: analysis response serialization, time and bytes per response
+Compares the pydantic response model + stdlib encoder path with plain dicts
+encoded by orjson (when installed), in the full and compact shapes, for forms
+of 200+ fields analyzed by the stub provider
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --sizes 200,1000,3000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('LLM_PROVIDER', 'stub')
+os.environ.setdefault('STUB_LLM_LATENCY_MS', '0')
+
+from corpus import SYNTHETIC
+from form_analyzer import FormAnalyzer
+from response_format import compact_analysis, dumps, orjson
+
+PROFILE = {
+    "personalInfo": {
+        "firstName": "Jane", "lastName": "Doe", "email": "jane@example.com",
+        "phone": "+1 555 0100", "city": "Austin", "country": "United States",
+    },
+    "professionalInfo": {"currentTitle": "Software Engineer", "yearsExperience": "6"},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='200,1000', help="synthetic form sizes (fields)")
+    parser.add_argument('--seconds', type=float, default=0.1, help="time budget per measurement")
+    return parser.parse_args()
+
+
+def model_path(body: Dict) -> bytes:
+    """What the endpoints did before: validate through the model, jsonable_encoder, json.dumps"""
+    from fastapi.encoders import jsonable_encoder
+    from server import FormAnalysisResponse
+
+    response = FormAnalysisResponse(**body)
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def _compact(body: Dict) -> Dict:
+    # As analysis_response(compact=True) builds it
+    return compact_analysis({key: value for key, value in body.items() if value is not None})
+
+
+def stdlib_compact(body: Dict) -> bytes:
+    return json.dumps(_compact(body), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def orjson_full(body: Dict) -> bytes:
+    return dumps(body)
+
+
+def orjson_compact(body: Dict) -> bytes:
+    return dumps(_compact(body))
+
+
+def measure(encode: Callable[[Dict], bytes], body: Dict, seconds: float) -> Tuple[float, int, int]:
+    """(best microseconds per encode over three runs, bytes, gzip bytes)"""
+    encoded = encode(body)
+    best = float('inf')
+    for _ in range(3):
+        rounds = 0
+        started = time.perf_counter()
+        while True:
+            encode(body)
+            rounds += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= seconds:
+                break
+        best = min(best, elapsed / rounds)
+    return best * 1e6, len(encoded), len(gzip.compress(encoded))
+
+
+async def analyses(sizes: List[int]) -> List[Tuple[str, Dict]]:
+    from server import analysis_body
+
+    analyzer = FormAnalyzer()
+    await analyzer.initialize()
+    results = []
+    try:
+        for style, build in SYNTHETIC:
+            for size in sizes:
+                analysis = await analyzer.analyze_form(build(size), f"https://bench.local/{style}", PROFILE)
+                results.append((f"{style}-{size}", analysis_body(analysis)))
+    finally:
+        await analyzer.close()
+    return results
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pages = asyncio.run(analyses(sizes))
+
+    encoders = [("model+json", model_path), ("json compact", stdlib_compact)]
+    if orjson is not None:
+        encoders += [("orjson full", orjson_full), ("orjson compact", orjson_compact)]
+    else:
+        print("orjson not installed; only the stdlib encoder is measured\n")
+
+    print(f"{'page':<18}{'maps':>6}" + ''.join(f"{name:>28}" for name, _ in encoders))
+    print(f"{'':<24}" + ''.join(f"{'us / bytes / gzip':>28}" for _ in encoders))
+    totals = {name: [0.0, 0, 0] for name, _ in encoders}
+    for name, body in pages:
+        cells = []
+        for encoder_name, encode in encoders:
+            micros, size, zipped = measure(encode, body, args.seconds)
+            total = totals[encoder_name]
+            total[0] += micros
+            total[1] += size
+            total[2] += zipped
+            cells.append(f"{micros:>10.0f} {size:>8} {zipped:>7}")
+        print(f"{name:<18}{len(body['field_mappings']):>6}" + ''.join(f"{cell:>28}" for cell in cells))
+
+    base = totals["model+json"]
+    print("\nRelative to model+json (time / bytes):")
+    for encoder_name, (micros, size, _) in totals.items():
+        print(f"  {encoder_name:<16}{micros / base[0]:>7.3f}x  {size / base[1]:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Form HTML corpus for the benchmarks
+The repo's own test pages plus deterministic synthetic forms in the markup
+styles real sites use (plain labels, utility CSS, ARIA, ATS widgets), at sizes
+up to a few thousand fields
+"""
+
+import os
+import random
+from typing import List, Tuple
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+REPO_PAGES = ['test-form.html', 'smartrecruiters-test.html', 'profile.html', 'settings.html', 'quick-test.html']
+
+COUNTRIES = [
+    "United States", "United Kingdom", "Canada", "Germany", "France", "India", "Japan",
+    "Australia", "Brazil", "Mexico", "Netherlands", "Spain", "Italy", "Sweden", "Singapore",
+    "South Korea", "Ireland", "Switzerland", "Poland", "Israel",
+]
+EXPERIENCE = ["0-1 years", "1-3 years", "3-5 years", "5-10 years", "10+ years"]
+QUESTIONS = [
+    "First Name", "Last Name", "Email Address", "Phone Number", "City", "Postal Code",
+    "LinkedIn Profile", "Current Company", "Current Title", "Expected Salary",
+    "Notice Period", "How did you hear about us?", "Portfolio URL", "Preferred Name",
+    "Are you legally authorized to work in this country?", "Will you require sponsorship?",
+]
+
+
+def _question(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(QUESTIONS)} {i}" if i >= len(QUESTIONS) else QUESTIONS[i]
+
+
+def labelled_form(field_count: int, seed: int = 1) -> str:
+    """Classic markup: <label for> next to each input"""
+    rng = random.Random(seed)
+    rows = ['<form id="apply" action="/submit" method="post">']
+    for i in range(field_count):
+        rows.append(
+            f'<div class="form-row"><label for="f{i}">{_question(rng, i)}</label>'
+            f'<input type="text" id="f{i}" name="field_{i}"></div>'
+        )
+    rows.append('<button type="submit">Submit</button></form>')
+    return '\n'.join(rows)
+
+
+def utility_css_form(field_count: int, seed: int = 2) -> str:
+    """Tailwind / CSS-in-JS markup with long generated class lists"""
+    rng = random.Random(seed)
+    utility = ("mt-1 block w-full rounded-md border-gray-300 px-3 py-2 shadow-sm "
+               "focus:border-indigo-500 focus:ring-indigo-500 sm:text-sm")
+    rows = ['<form class="space-y-6">']
+    for i in range(field_count):
+        rows.append(
+            f'<div class="flex flex-col gap-2"><label for="q{i}" class="text-sm font-medium">'
+            f'{_question(rng, i)}</label><input type="text" id="q{i}" name="answers[{i}]" '
+            f'class="{utility} css-{rng.getrandbits(24):06x} _field_{rng.getrandbits(20):05x}__{i}" '
+            f'placeholder="Your answer"></div>'
+        )
+    rows.append('</form>')
+    return '\n'.join(rows)
+
+
+def aria_form(field_count: int, seed: int = 3) -> str:
+    """Labels via aria-labelledby and wrapping <label> elements, no ids on inputs"""
+    rng = random.Random(seed)
+    rows = ['<form role="form">']
+    for i in range(field_count):
+        if i % 2:
+            rows.append(
+                f'<div><span id="lbl{i}">{_question(rng, i)}</span>'
+                f'<input aria-labelledby="lbl{i}" name="a{i}"></div>'
+            )
+        else:
+            rows.append(f'<label>{_question(rng, i)} <input name="a{i}" type="text"></label>')
+    rows.append('</form>')
+    return '\n'.join(rows)
+
+
+def ats_form(field_count: int, seed: int = 4) -> str:
+    """Workday/Greenhouse-style application: selects, radios, checkboxes, uploads, textareas"""
+    rng = random.Random(seed)
+    rows = ['<form data-automation-id="applyFlowPage">']
+    for i in range(field_count):
+        kind = i % 6
+        label = _question(rng, i)
+        automation = f'data-automation-id="formField-{i}"'
+        if kind == 0:
+            options = ''.join(f'<option value="{c}">{c}</option>' for c in COUNTRIES)
+            rows.append(f'<label for="s{i}">Country {i}</label><select id="s{i}" {automation}>{options}</select>')
+        elif kind == 1:
+            options = ''.join(f'<option>{e}</option>' for e in EXPERIENCE)
+            rows.append(f'<label for="s{i}">Experience {i}</label><select id="s{i}" {automation}>{options}</select>')
+        elif kind == 2:
+            rows.append(
+                f'<fieldset><legend>{label}</legend>'
+                f'<label><input type="radio" name="r{i}" value="yes"> Yes</label>'
+                f'<label><input type="radio" name="r{i}" value="no"> No</label></fieldset>'
+            )
+        elif kind == 3:
+            rows.append(f'<label><input type="checkbox" name="c{i}" {automation}> I agree to term {i}</label>')
+        elif kind == 4:
+            rows.append(f'<label for="t{i}">{label}</label><textarea id="t{i}" name="t{i}" {automation}></textarea>')
+        else:
+            rows.append(f'<label for="u{i}">Resume {i}</label><input type="file" id="u{i}" name="u{i}" {automation}>')
+    rows.append('</form>')
+    return '\n'.join(rows)
+
+
+def noisy_page(field_count: int, seed: int = 5) -> str:
+    """Several forms buried in scripts, inline SVG and layout markup"""
+    rng = random.Random(seed)
+    script = '<script>' + 'var x = "<form><input name=fake>";' * 50 + '</script>'
+    svg = '<svg viewBox="0 0 10 10">' + '<path d="M0 0L10 10"/>' * 100 + '</svg>'
+    parts = ['<html><head>', script, '</head><body>', svg]
+    per_form = max(1, field_count // 4)
+    for form in range(4):
+        parts.append(f'<nav>{svg}</nav><form id="form{form}">')
+        for i in range(per_form):
+            parts.append(
+                f'<label for="n{form}_{i}">{_question(rng, i)}</label>'
+                f'<input id="n{form}_{i}" name="n{form}_{i}" type="text">'
+            )
+        parts.append('</form>')
+    parts.append(script + '</body></html>')
+    return ''.join(parts)
+
+
+SYNTHETIC = [
+    ("labelled", labelled_form),
+    ("utility-css", utility_css_form),
+    ("aria", aria_form),
+    ("ats", ats_form),
+    ("noisy-page", noisy_page),
+]
+
+
+def load_corpus(sizes: Tuple[int, ...] = (50, 200, 1000)) -> List[Tuple[str, str]]:
+    """(name, html) for every repo page and every synthetic style at each size"""
+    pages = []
+    for name in REPO_PAGES:
+        path = os.path.join(REPO_ROOT, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                pages.append((name, f.read()))
+
+    for style, build in SYNTHETIC:
+        for size in sizes:
+            pages.append((f"{style}-{size}", build(size)))
+    return pages
+
+
+def dropdown_cases() -> List[Tuple[List[str], str, str]]:
+    """(options, desired value, context) covering exact, alias, fuzzy and unmatched values"""
+    return [
+        (COUNTRIES, "United States", "Country"),
+        (COUNTRIES, "USA", "Country"),
+        (COUNTRIES, "UK", "Country"),
+        (COUNTRIES, "Deutschland", "Country"),
+        (EXPERIENCE, "4 years", "Years of experience"),
+        (EXPERIENCE, "1-3 yrs", "Years of experience"),
+        (["Yes", "No"], "true", "Authorized to work"),
+        (["Male", "Female", "Non-binary", "Prefer not to say"], "decline", "Gender"),
+    ]
@@ -0,0 +1,118 @@
+"""
+CPU-bound work off the event loop
+Large pages are parsed, turned into prompts and their LLM output decoded in a
+thread or process pool so one multi-megabyte form doesn't stall every other
+request and WebSocket; small inputs stay inline where a hop would cost more
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from metrics import LOOP_LAG, LOOP_LAG_MAX, OFFLOADED
+
+
+class CPUExecutor:
+    """
+    Runs CPU-bound steps in a thread pool, a process pool or inline (mode).
+    Process mode needs picklable functions and arguments; callers mark steps that
+    use analyzer state with shareable=False and those go to a thread pool instead.
+    """
+
+    MODES = ('thread', 'process', 'inline')
+
+    def __init__(self, mode: str = 'thread', workers: Optional[int] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode '{mode}' (expected one of {', '.join(self.MODES)})")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 4
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self.stats = {"inline": 0, "thread": 0, "process": 0}
+
+    @classmethod
+    def from_env(cls) -> "CPUExecutor":
+        """Build executor from CPU_EXECUTOR* environment variables"""
+        return cls(
+            mode=os.getenv('CPU_EXECUTOR', 'thread').lower(),
+            workers=int(os.getenv('CPU_EXECUTOR_WORKERS', os.getenv('BATCH_PARSE_WORKERS', 0))) or None
+        )
+
+    async def run(self, fn: Callable, *args: Any, offload: bool = True, shareable: bool = True) -> Any:
+        """Call fn(*args) inline, or in the pool when offload is set"""
+        if not offload or self.mode == 'inline':
+            self.stats["inline"] += 1
+            return fn(*args)
+
+        kind = 'process' if self.mode == 'process' and shareable else 'thread'
+        self.stats[kind] += 1
+        OFFLOADED.inc(executor=kind)
+        if kind == 'thread':
+            # Keep the request's trace so timing spans inside fn still count
+            fn = functools.partial(contextvars.copy_context().run, fn)
+        return await asyncio.get_running_loop().run_in_executor(self._pool(kind), fn, *args)
+
+    def _pool(self, kind: str) -> Executor:
+        # Created on first use so inline-only deployments never start workers
+        if kind == 'process':
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='form-cpu')
+        return self._threads
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._threads = self._processes = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "mode": self.mode, "workers": self.workers}
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a short sleep.
+    Sustained lag means something is blocking the loop (CPU work run inline).
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "LoopLagMonitor":
+        return cls(interval=float(os.getenv('LOOP_LAG_INTERVAL_MS', 50)) / 1000)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            LOOP_LAG.observe(lag)
+
+    def take_max(self) -> float:
+        """Worst lag since the previous call (one scrape interval)"""
+        worst, self.max = self.max, self.last
+        LOOP_LAG_MAX.set(worst)
+        return worst
@@ -1,17 +1,88 @@
 """
 DeepL Translation Integration
+One translator (and one pooled keep-alive HTTP session) per application;
+repeat phrases come from a cache and concurrent ones share an upstream call
 """
 
 import os
 import aiohttp
-from typing import Optional
+from typing import Dict, List, Any, Optional, Tuple
+from micro_batcher import MicroBatcher
+from translation_cache import TranslationCache
 
 class DeepLTranslator:
     """DeepL API translator"""
 
-    def __init__(self):
-        self.api_key = os.getenv('DEEPL_API_KEY')
-        self.api_url = "https://api-free.deepl.com/v2/translate"  # Use api.deepl.com for pro
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: str = "https://api-free.deepl.com/v2/translate",  # Use api.deepl.com for pro
+        max_connections: int = 20,
+        max_connections_per_host: int = 10,
+        keepalive_timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        total_timeout: float = 15.0,
+        cache: Optional[TranslationCache] = None,
+        batch_window: float = 0.01,
+        max_batch: int = 50
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.total_timeout = total_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = cache
+        # DeepL accepts up to 50 text params per request; texts for the same
+        # language pair arriving within batch_window share one call
+        self._batcher = MicroBatcher(self._translate_batch, window=batch_window, max_batch=max_batch)
+
+    @classmethod
+    def from_env(cls) -> "DeepLTranslator":
+        """Build translator from DEEPL_* environment variables"""
+        return cls(
+            api_key=os.getenv('DEEPL_API_KEY'),
+            api_url=os.getenv('DEEPL_API_URL', "https://api-free.deepl.com/v2/translate"),
+            max_connections=int(os.getenv('DEEPL_MAX_CONNECTIONS', 20)),
+            max_connections_per_host=int(os.getenv('DEEPL_MAX_CONNECTIONS_PER_HOST', 10)),
+            keepalive_timeout=float(os.getenv('DEEPL_KEEPALIVE_TIMEOUT', 60)),
+            connect_timeout=float(os.getenv('DEEPL_CONNECT_TIMEOUT', 5)),
+            total_timeout=float(os.getenv('DEEPL_TIMEOUT', 15)),
+            cache=TranslationCache.from_env(),
+            batch_window=float(os.getenv('DEEPL_BATCH_WINDOW_MS', 10)) / 1000,
+            max_batch=int(os.getenv('DEEPL_BATCH_SIZE', 50))
+        )
+
+    async def start(self):
+        """Open the pooled session; call once on app startup"""
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout)
+        )
+        print(f"✅ DeepL session ready (pool {self.max_connections}, per host {self.max_connections_per_host})")
+
+    async def close(self):
+        """Close the session and its pooled connections; call on app shutdown"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Lazily open when used outside the app lifecycle (scripts, tests)
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
 
     async def translate(
         self,
@@ -35,31 +106,61 @@ class DeepLTranslator:
             print("⚠️ DEEPL_API_KEY not found in environment")
             return text  # Return original if no API key
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    data={
-                        'auth_key': self.api_key,
-                        'text': text,
-                        'source_lang': source_lang.upper(),
-                        'target_lang': target_lang.upper()
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        translated = data['translations'][0]['text']
-                        print(f"🌐 Translated: {text} ({source_lang}) → {translated} ({target_lang})")
-                        return translated
-                    else:
-                        error_text = await response.text()
-                        print(f"❌ DeepL API error {response.status}: {error_text}")
-                        return text
+        if not text or not text.strip():
+            return text
+
+        key = TranslationCache.make_key(text, source_lang, target_lang)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
 
+        try:
+            translated = await self._batcher.submit(key, key=key[1:])
         except Exception as e:
             print(f"❌ Translation error: {str(e)}")
             return text  # Return original on error
 
+        if translated is None:
+            return text
+
+        if self.cache is not None:
+            self.cache.put(key, translated)
+        print(f"🌐 Translated: {text} ({source_lang}) → {translated} ({target_lang})")
+        return translated
+
+    async def _translate_batch(self, items: List[Tuple[str, str, str]]) -> List[Optional[str]]:
+        """One DeepL request for many (text, source, target) items of one language pair"""
+
+        source_lang, target_lang = items[0][1], items[0][2]
+        unique_texts = list(dict.fromkeys(text for text, _, _ in items))
+
+        session = await self._get_session()
+        async with session.post(
+            self.api_url,
+            data=[
+                ('auth_key', self.api_key),
+                *(('text', text) for text in unique_texts),
+                ('source_lang', source_lang),
+                ('target_lang', target_lang)
+            ]
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                print(f"❌ DeepL API error {response.status}: {error_text}")
+                return [None] * len(items)
+            data = await response.json()
+
+        translated = dict(zip(unique_texts, (t['text'] for t in data['translations'])))
+        return [translated.get(text) for text, _, _ in items]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache counters plus how many texts shared each upstream request"""
+        return {
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "batching": dict(self._batcher.stats),
+        }
+
     async def detect_language(self, text: str) -> Optional[str]:
         """Detect language of text (not available in free tier)"""
         # DeepL auto-detects when source_lang is not provided
@@ -0,0 +1,358 @@
+"""
+Deterministic field classification rules
+Resolves standard fields (contact info, address, EEO, education) without calling the LLM
+
+Keywords are compiled once at import into a word trie and name/id patterns
+into a single regex, so each field is classified in one pass over its hints
+no matter how many purposes the table holds.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from form_parser import LABEL_TEXT
+
+
+# Confidence assigned by each signal, strongest first
+AUTOCOMPLETE_CONFIDENCE = 0.98
+INPUT_TYPE_CONFIDENCE = 0.95
+IDENTIFIER_CONFIDENCE = 0.9
+LABEL_CONFIDENCE = 0.88
+HINT_CONFIDENCE = 0.75
+
+# Input types the rules never fill (uploads, toggles, buttons)
+UNFILLABLE_TYPES = frozenset((
+    'hidden', 'submit', 'button', 'reset', 'image', 'file',
+    'checkbox', 'radio', 'password',
+))
+
+
+def _rule(purpose, path=None, autocomplete=(), input_types=(), identifier=None, keywords=()):
+    return {
+        'purpose': purpose,
+        'path': path,
+        'autocomplete': list(autocomplete),
+        'input_types': list(input_types),
+        'identifier': identifier,
+        'keywords': list(keywords),
+    }
+
+
+# Rule table: purpose -> profile path plus the signals that identify it.
+# Order is priority: when several purposes match, the earliest one wins.
+# Purposes without a profile path are still classified but left to the LLM.
+# Keywords are matched in any page language, so words that are also common
+# English (e.g. German "Handy", "Land", "Alter") are left out.
+FIELD_RULES: List[Dict] = [
+    # --- name -----------------------------------------------------------
+    _rule('first_name', 'personalInfo.firstName',
+          autocomplete=['given-name'],
+          identifier=r'\b(first ?name|fname|given ?name|forename)\b',
+          keywords=['first name', 'given name', 'forename', 'prénom', 'prenom',
+                    'vorname', 'nome']),
+    _rule('last_name', 'personalInfo.lastName',
+          autocomplete=['family-name'],
+          identifier=r'\b(last ?name|lname|family ?name|surname)\b',
+          keywords=['last name', 'family name', 'surname', 'apellido', 'apellidos',
+                    'nachname', 'nom de famille', 'cognome']),
+    _rule('middle_name',
+          autocomplete=['additional-name'],
+          identifier=r'\b(middle ?name|mname)\b',
+          keywords=['middle name', 'middle initial']),
+    _rule('preferred_name',
+          autocomplete=['nickname'],
+          identifier=r'\b(preferred ?name|nick ?name)\b',
+          keywords=['preferred name', 'nickname', 'goes by']),
+    _rule('pronouns',
+          identifier=r'\bpronouns?\b',
+          keywords=['pronouns', 'pronoun']),
+
+    # --- contact --------------------------------------------------------
+    _rule('email', 'personalInfo.email',
+          autocomplete=['email'],
+          input_types=['email'],
+          identifier=r'\b(e ?mail|email ?address)\b',
+          keywords=['email', 'e-mail', 'correo', 'courriel']),
+    _rule('phone', 'personalInfo.phone',
+          autocomplete=['tel', 'tel-national'],
+          input_types=['tel'],
+          identifier=r'\b(phone|mobile|tel|telephone|cell)( ?number)?\b',
+          keywords=['phone', 'mobile', 'telephone', 'teléfono', 'telefono',
+                    'telefon', 'téléphone']),
+    _rule('linkedin',
+          identifier=r'\blinked ?in\b',
+          keywords=['linkedin', 'linkedin profile', 'linkedin url']),
+    _rule('github',
+          identifier=r'\bgit ?hub\b',
+          keywords=['github', 'github profile']),
+    _rule('portfolio',
+          input_types=['url'],
+          identifier=r'\b(portfolio|website|personal ?site|homepage)\b',
+          keywords=['portfolio', 'website', 'personal website', 'homepage']),
+
+    # --- address --------------------------------------------------------
+    _rule('address_line2',
+          autocomplete=['address-line2'],
+          identifier=r'\b(address ?line ?2|addr2|apt|suite|unit)\b',
+          keywords=['address line 2', 'apartment', 'suite', 'apt']),
+    _rule('address', 'personalInfo.address',
+          autocomplete=['street-address', 'address-line1'],
+          identifier=r'\b(street|address( ?line)? ?1?|addr1?)\b',
+          keywords=['street address', 'address', 'dirección', 'direccion', 'adresse',
+                    'straße', 'strasse', 'indirizzo']),
+    _rule('city', 'personalInfo.city',
+          autocomplete=['address-level2'],
+          identifier=r'\b(city|town|locality)\b',
+          keywords=['city', 'town', 'ciudad', 'ville', 'stadt', 'città', 'citta']),
+    _rule('state', 'personalInfo.state',
+          autocomplete=['address-level1'],
+          identifier=r'\b(state|province|region)\b',
+          keywords=['state', 'province', 'estado', 'provincia', 'bundesland']),
+    _rule('postal_code', 'personalInfo.postalCode',
+          autocomplete=['postal-code'],
+          identifier=r'\b(zip( ?code)?|postal ?code|post ?code|plz)\b',
+          keywords=['zip', 'zip code', 'postal code', 'postcode', 'código postal',
+                    'codigo postal', 'code postal', 'postleitzahl']),
+    _rule('country', 'personalInfo.country',
+          autocomplete=['country', 'country-name'],
+          identifier=r'\b(country|nation)\b',
+          keywords=['country', 'país', 'pais', 'pays']),
+    _rule('location',
+          identifier=r'\b(location|current ?location)\b',
+          keywords=['location', 'current location', 'where are you based']),
+
+    # --- work authorization ---------------------------------------------
+    _rule('sponsorship',
+          identifier=r'\b(sponsor|sponsorship|visa ?sponsorship)\b',
+          keywords=['sponsorship', 'visa sponsorship', 'require sponsorship', 'sponsor']),
+    _rule('work_authorization',
+          identifier=r'\b(work ?auth(orization)?|authorized|legally ?authorized|right ?to ?work)\b',
+          keywords=['authorized to work', 'work authorization', 'legally authorized',
+                    'right to work', 'eligible to work', 'work permit']),
+    _rule('relocation',
+          identifier=r'\b(relocat(e|ion))\b',
+          keywords=['relocate', 'relocation', 'willing to relocate']),
+
+    # --- experience / education -----------------------------------------
+    _rule('current_company',
+          autocomplete=['organization'],
+          identifier=r'\b(current ?company|company|employer|organization|org)\b',
+          keywords=['current company', 'company', 'employer', 'organization', 'empresa']),
+    _rule('current_title',
+          autocomplete=['organization-title'],
+          identifier=r'\b(current ?title|job ?title|title|position|role)\b',
+          keywords=['current title', 'job title', 'position', 'puesto']),
+    _rule('experience', 'professionalInfo.experience',
+          identifier=r'\b(years? ?of ?experience|experience|yoe)\b',
+          keywords=['years of experience', 'experience', 'experiencia', 'berufserfahrung']),
+    _rule('field_of_study',
+          identifier=r'\b(major|discipline|field ?of ?study)\b',
+          keywords=['major', 'field of study', 'discipline']),
+    _rule('graduation_date',
+          identifier=r'\b(grad(uation)? ?(date|year)?)\b',
+          keywords=['graduation date', 'graduation year']),
+    _rule('gpa',
+          identifier=r'\bgpa\b',
+          keywords=['gpa', 'grade point average']),
+    # Only whole names/ids: school_name, degree_type etc. want part of the
+    # education string, not all of it
+    _rule('education', 'professionalInfo.education',
+          identifier=r'(?:^|(?<=\| ))(?:education(?: level)?|highest (?:degree|education)|degree)(?= \||$)',
+          keywords=['education', 'highest degree', 'highest level of education',
+                    'educación', 'ausbildung']),
+    _rule('skills', 'professionalInfo.skills',
+          identifier=r'\bskills?\b',
+          keywords=['skills', 'key skills', 'habilidades', 'compétences', 'kenntnisse']),
+    _rule('certifications', 'professionalInfo.certifications',
+          identifier=r'\b(certifications?|certificates?|licenses?)\b',
+          keywords=['certifications', 'certificates', 'licenses']),
+
+    # --- compensation / availability ------------------------------------
+    _rule('salary',
+          identifier=r'\b(salary|compensation|pay|desired ?pay)\b',
+          keywords=['salary', 'desired salary', 'salary expectations', 'compensation',
+                    'salario', 'gehalt', 'salaire']),
+    _rule('start_date',
+          identifier=r'\b(start ?date|available ?from|availability|notice ?period)\b',
+          keywords=['start date', 'earliest start date', 'availability', 'notice period']),
+    _rule('referral_source',
+          identifier=r'\b(referr(al|er)|source|how ?did ?you ?hear)\b',
+          keywords=['how did you hear', 'referral', 'referred by', 'source']),
+    _rule('cover_letter',
+          identifier=r'\bcover ?letter\b',
+          keywords=['cover letter']),
+
+    # --- voluntary self-identification (EEO) ----------------------------
+    _rule('gender', 'personalInfo.gender',
+          autocomplete=['sex'],
+          identifier=r'\b(gender|sex)\b',
+          keywords=['gender', 'sex', 'género', 'genero', 'geschlecht']),
+    _rule('race', 'personalInfo.race',
+          identifier=r'\b(race|ethnicity|ethnic)\b',
+          keywords=['race', 'ethnicity', 'hispanic or latino']),
+    _rule('veteran_status', 'personalInfo.veteranStatus',
+          identifier=r'\b(veteran|military)\b',
+          keywords=['veteran', 'veteran status', 'protected veteran']),
+    _rule('disability_status', 'personalInfo.disabilityStatus',
+          identifier=r'\b(disability|disabled)\b',
+          keywords=['disability', 'disability status']),
+    _rule('age', 'personalInfo.age',
+          identifier=r'\b(age|birth ?year)\b',
+          keywords=['age', 'edad']),
+    _rule('date_of_birth',
+          autocomplete=['bday'],
+          identifier=r'\b(dob|birth ?date|date ?of ?birth|birthday)\b',
+          keywords=['date of birth', 'birthday', 'fecha de nacimiento']),
+
+    # --- generic catch-alls, lowest priority ----------------------------
+    _rule('full_name',
+          autocomplete=['name'],
+          identifier=r'\b(full ?name|name)\b',
+          keywords=['full name', 'name', 'your name', 'nombre completo']),
+]
+
+_CAMEL_RE = re.compile(r'([a-z0-9])([A-Z])')
+_SEPARATOR_RE = re.compile(r'[^0-9a-zA-ZÀ-ɏ]+')
+
+
+def normalize_hint(text: Optional[str]) -> str:
+    """'job_application[firstName]' -> 'job application first name'"""
+    if not text:
+        return ''
+    text = _CAMEL_RE.sub(r'\1 \2', text)
+    return _SEPARATOR_RE.sub(' ', text).strip().lower()
+
+
+PROFILE_PATHS: Dict[str, str] = {
+    rule['purpose']: rule['path'] for rule in FIELD_RULES if rule['path']
+}
+
+_PRIORITY: Dict[str, int] = {rule['purpose']: idx for idx, rule in enumerate(FIELD_RULES)}
+_PURPOSE_BY_PRIORITY: List[str] = [rule['purpose'] for rule in FIELD_RULES]
+
+_AUTOCOMPLETE_INDEX: Dict[str, str] = {}
+_INPUT_TYPE_INDEX: Dict[str, str] = {}
+_KEYWORD_INDEX: Dict[str, int] = {}
+for _rule_entry in FIELD_RULES:
+    for _token in _rule_entry['autocomplete']:
+        _AUTOCOMPLETE_INDEX.setdefault(_token, _rule_entry['purpose'])
+    for _input_type in _rule_entry['input_types']:
+        _INPUT_TYPE_INDEX.setdefault(_input_type, _rule_entry['purpose'])
+    for _keyword in _rule_entry['keywords']:
+        # Keywords are matched against normalized hints, so normalize them the same way
+        _KEYWORD_INDEX.setdefault(normalize_hint(_keyword), _PRIORITY[_rule_entry['purpose']])
+
+
+class KeywordMatcher:
+    """
+    Word-level trie over keyword phrases
+    Each hint is scanned once from every word start; lookups are dict hops,
+    so the cost depends on the hint length, not on the vocabulary size.
+    """
+
+    _PRIORITY_KEY = ''  # words are never empty, so this marks a terminal node
+
+    def __init__(self, keyword_priorities: Dict[str, int]):
+        self._root: Dict = {}
+        for keyword, priority in keyword_priorities.items():
+            node = self._root
+            for word in keyword.split():
+                node = node.setdefault(word, {})
+            node.setdefault(self._PRIORITY_KEY, priority)
+
+    def best(self, text: str) -> Optional[int]:
+        """Lowest priority value of any keyword occurring as whole words in text"""
+        words = text.split()
+        root = self._root
+        best = None
+        for start in range(len(words)):
+            node = root
+            for word in words[start:]:
+                node = node.get(word)
+                if node is None:
+                    break
+                priority = node.get(self._PRIORITY_KEY)
+                if priority is not None and (best is None or priority < best):
+                    best = priority
+        return best
+
+
+def _compile_identifiers() -> re.Pattern:
+    """One lookahead regex with a named group per purpose's name/id pattern"""
+    groups = [
+        f"(?P<p{_PRIORITY[rule['purpose']]}>{rule['identifier']})"
+        for rule in FIELD_RULES if rule['identifier']
+    ]
+    return re.compile(r'(?=' + '|'.join(groups) + r')')
+
+
+_KEYWORDS = KeywordMatcher(_KEYWORD_INDEX)
+_IDENTIFIER_RE = _compile_identifiers()
+
+def _match_keywords(text: str) -> Optional[str]:
+    """Highest-priority purpose whose keyword appears as whole words in text"""
+    if not text:
+        return None
+    best = _KEYWORDS.best(text)
+    return _PURPOSE_BY_PRIORITY[best] if best is not None else None
+
+
+def _match_identifiers(text: str) -> Optional[str]:
+    """Highest-priority purpose whose name/id pattern matches text"""
+    best = None
+    for match in _IDENTIFIER_RE.finditer(text):
+        priority = int(match.lastgroup[1:])
+        if best is None or priority < best:
+            best = priority
+    return _PURPOSE_BY_PRIORITY[best] if best is not None else None
+
+
+def classify_field(field, label: Optional[str] = None) -> Tuple[Optional[str], float]:
+    """
+    Classify a parsed field by its strongest signal
+    Returns (purpose, confidence); purpose is None when nothing matched.
+    Without an explicit label the parser-resolved one is used; text that merely
+    precedes the field counts as a weak hint rather than a label.
+    """
+
+    if field['type'] in UNFILLABLE_TYPES:
+        return None, 0.0
+
+    nearby_text = None
+    if label is None:
+        label = field.get('label')
+        if field.get('label_source') == LABEL_TEXT:
+            label, nearby_text = None, label
+
+    # 1. autocomplete tokens are explicit, e.g. "shipping given-name"
+    autocomplete = field.get('autocomplete')
+    if autocomplete:
+        for token in autocomplete.lower().split():
+            purpose = _AUTOCOMPLETE_INDEX.get(token)
+            if purpose:
+                return purpose, AUTOCOMPLETE_CONFIDENCE
+
+    # 2. dedicated input types
+    purpose = _INPUT_TYPE_INDEX.get(field['type'])
+    if purpose:
+        return purpose, INPUT_TYPE_CONFIDENCE
+
+    # 3. name/id conventions
+    purpose = _match_identifiers(
+        f"{normalize_hint(field['name'])} | {normalize_hint(field['id'])}"
+    )
+    if purpose:
+        return purpose, IDENTIFIER_CONFIDENCE
+
+    # 4. visible label text, any supported language
+    purpose = _match_keywords(normalize_hint(label))
+    if purpose:
+        return purpose, LABEL_CONFIDENCE
+
+    # 5. weaker hints: placeholder and aria-label
+    hints = f"{normalize_hint(field['placeholder'])} {normalize_hint(field['aria_label'])}"
+    purpose = _match_keywords(hints.strip()) or _match_keywords(normalize_hint(nearby_text))
+    if purpose:
+        return purpose, HINT_CONFIDENCE
+
+    return None, 0.0
@@ -0,0 +1,118 @@
+"""
+Server-held form fill sessions
+analyze_form creates a session when the analysis starts and adds each field
+mapping as it is streamed; later messages only send what changed (fields just
+filled) instead of the whole form state
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional
+
+
+class FillSession:
+    """Fill progress for one analyzed form: pending fields in fill order plus the filled set"""
+
+    def __init__(self, session_id: str, field_mappings: Iterable[Dict[str, Any]] = ()):
+        self.session_id = session_id
+        self.pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.filled = set()
+        self.add(field_mappings)
+
+    def add(self, field_mappings: Iterable[Dict[str, Any]]):
+        """Queue mappings in fill order; fields already pending or filled are skipped"""
+        for mapping in field_mappings:
+            selector = mapping.get('selector')
+            if selector and selector not in self.pending and selector not in self.filled:
+                self.pending[selector] = mapping
+
+    def mark_filled(self, selectors: Iterable[str]):
+        """Move fields from pending to filled"""
+        for selector in selectors:
+            self.pending.pop(selector, None)
+            self.filled.add(selector)
+
+    def next_action(self) -> Dict[str, Any]:
+        """First field still pending, in the same shape get_next_filling_action returns"""
+        for selector, mapping in self.pending.items():
+            return {
+                "action": "fill",
+                "selector": selector,
+                "value": mapping.get('value'),
+                "field_type": mapping.get('field_type', 'text')
+            }
+
+        return {
+            "action": "complete",
+            "message": "All fields filled"
+        }
+
+    def progress(self) -> Dict[str, int]:
+        return {"filled": len(self.filled), "pending": len(self.pending)}
+
+
+class FillSessionStore:
+    """Sessions by id; idle ones expire after ttl_seconds and the oldest go past max_sessions"""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # Least recently used first, so expiry only looks at the front
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "FillSessionStore":
+        """Build store from FILL_SESSION_* environment variables"""
+        return cls(
+            max_sessions=int(os.getenv('FILL_SESSION_MAX', 1000)),
+            ttl_seconds=float(os.getenv('FILL_SESSION_TTL', 1800))
+        )
+
+    def create(self, field_mappings: Iterable[Dict[str, Any]] = ()) -> FillSession:
+        session = FillSession(uuid.uuid4().hex, field_mappings)
+
+        with self._lock:
+            self._expire(time.monotonic())
+            self._sessions[session.session_id] = (time.monotonic(), session)
+            self.stats["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evictions"] += 1
+        return session
+
+    def get(self, session_id: Optional[str]) -> Optional[FillSession]:
+        """Return a live session and refresh its idle timer, or None"""
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id) if session_id else None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def remove(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl_seconds:
+                return
+            del self._sessions[session_id]
+            self.stats["expired"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current size"""
+        with self._lock:
+            return {**self.stats, "active": len(self._sessions)}
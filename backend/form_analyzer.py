@@ -1,155 +1,670 @@
 """
-LLM-Powered Form Analysis using Dedalus
+LLM-Powered Form Analysis
+Model calls go through a pluggable provider (llm_providers.py) chosen by LLM_PROVIDER
 Intelligently analyzes any form structure and provides filling instructions
 """
 
 import asyncio
-from dedalus_labs import AsyncDedalus, DedalusRunner
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterable, AsyncIterator, Awaitable, Callable, Tuple, Union
 import json
 import re
-from html.parser import HTMLParser
+import os
+from form_parser import FormHTMLParser, StreamingFormParser, parse_field_descriptors, parse_form_html
+from json_stream import JSONArrayStreamer
+from ats_detector import ATSRegistry, ATSTemplate
+from form_cache import FingerprintIndex, FormStructureCache, checkbox_state, profile_path_refs, render_profile_path
+from field_rules import classify_field, PROFILE_PATHS
+from llm_dispatcher import LLMDispatcher, Priority
+from llm_providers import LLMProvider, create_provider
+from micro_batcher import MicroBatcher
+from metrics import FINGERPRINT_LOOKUPS, span, record_cache_lookup, record_tiers
+from cpu_offload import CPUExecutor
+from option_matcher import OptionIndexCache, is_decisive
+from prompt_encoding import encode_field, chunk_forms, estimate_tokens
 
 
-class FormHTMLParser(HTMLParser):
-    """Parse HTML to extract form structure"""
+class FormAnalyzer:
+    """LLM-powered form analyzer on top of a Dedalus, OpenAI or stub provider"""
+
+    ANALYSIS_SYSTEM_PROMPT = (
+        "You are an intelligent form filling assistant. "
+        "Analyze forms and provide field mappings in JSON format."
+    )
+
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self.provider = provider or create_provider()
+        self.dispatcher = LLMDispatcher.from_env(self.provider.generate, stream=self.provider.stream)
+        self.cache = FormStructureCache.from_env()
+        # Descriptor fingerprints seen before, so returning clients skip the upload
+        self.fingerprints = FingerprintIndex.from_env()
+        # Recognized ATS pages map their fields from a template before the rules tier
+        self.ats = ATSRegistry.from_env()
+        # Rule-classified fields at or above this confidence skip the LLM
+        self.rules_threshold = float(os.getenv('RULES_CONFIDENCE_THRESHOLD', 0.85))
+        # Analysis prompts larger than this are split and analyzed concurrently
+        self.prompt_token_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', 6000))
+        # Dropdown selections arriving within a short window share one LLM call
+        self.dropdown_batcher = MicroBatcher(
+            self._select_dropdowns_llm,
+            window=float(os.getenv('DROPDOWN_BATCH_WINDOW_MS', 15)) / 1000,
+            max_batch=int(os.getenv('DROPDOWN_BATCH_SIZE', 20))
+        )
+        # Matches this confident and this far ahead of the runner-up skip the LLM
+        self.dropdown_min_confidence = float(os.getenv('DROPDOWN_MATCH_CONFIDENCE', 0.75))
+        self.dropdown_min_margin = float(os.getenv('DROPDOWN_MATCH_MARGIN', 0.1))
+        # Built option-list indexes and past selections, shared across requests
+        self.option_index = OptionIndexCache.from_env()
+        # Batch analysis: concurrent LLM-bound analyses
+        self.batch_concurrency = int(os.getenv('BATCH_LLM_CONCURRENCY', 4))
+        # Parsing, prompt building and output decoding for pages or outputs at least
+        # this large run in a worker pool instead of blocking the event loop
+        self.cpu = CPUExecutor.from_env()
+        self.offload_min_bytes = int(os.getenv('OFFLOAD_MIN_BYTES', 256 * 1024))
+        self.offload_min_fields = int(os.getenv('OFFLOAD_MIN_FIELDS', 300))
 
-    def __init__(self):
-        super().__init__()
-        self.forms = []
-        self.current_form = None
-        self.current_label = None
-        self.field_labels = {}
+    async def initialize(self):
+        """Start the LLM provider client"""
+        await self.provider.start()
 
-    def handle_starttag(self, tag, attrs):
-        attrs_dict = dict(attrs)
+    async def close(self):
+        """Release the provider client and worker pools"""
+        await self.provider.close()
+        self.cpu.shutdown()
 
-        if tag == 'form':
-            self.current_form = {
-                'tag': tag,
-                'attrs': attrs_dict,
-                'fields': []
-            }
+    async def analyze_form(
+        self,
+        html: Optional[str],
+        url: str,
+        user_profile: Dict[str, Any],
+        screenshot: Optional[str] = None,
+        fields: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze form structure using LLM
+        Returns intelligent field mappings
+        """
 
-        elif tag == 'label':
-            self.current_label = {
-                'for': attrs_dict.get('for'),
-                'text': ''
-            }
+        parser, fingerprint = await self._parse_input(html, fields)
+        analysis = await self._analyze_parsed(parser, url, user_profile)
+        if fingerprint:
+            analysis['fingerprint'] = fingerprint
+        return analysis
 
-        elif tag in ['input', 'select', 'textarea']:
-            field = {
-                'tag': tag,
-                'type': attrs_dict.get('type', 'text'),
-                'name': attrs_dict.get('name'),
-                'id': attrs_dict.get('id'),
-                'placeholder': attrs_dict.get('placeholder'),
-                'required': 'required' in attrs_dict,
-                'role': attrs_dict.get('role'),
-                'class': attrs_dict.get('class'),
-                'data_attrs': {k: v for k, v in attrs_dict.items() if k.startswith('data-')},
-                'aria_label': attrs_dict.get('aria-label'),
-            }
+    async def _parse_input(
+        self,
+        html: Optional[str],
+        fields: Optional[Dict[str, Any]]
+    ) -> Tuple[FormHTMLParser, Optional[str]]:
+        """
+        Form records from field descriptors when sent, else parsed from the HTML
+        Descriptor payloads are registered under their fingerprint for lookup_form
+        """
 
-            if self.current_form:
-                self.current_form['fields'].append(field)
+        if fields is not None:
+            # Already field records; no HTML to parse
+            with span('descriptors'):
+                parser = parse_field_descriptors(fields)
+                fingerprint = FingerprintIndex.fingerprint(fields)
+            self.fingerprints.put(fingerprint, parser)
+            return parser, fingerprint
+        if html is None:
+            raise ValueError("Request needs either 'fields' or 'html'")
 
-    def handle_data(self, data):
-        if self.current_label:
-            self.current_label['text'] += data.strip()
+        # Parse HTML to extract form structure
+        with span('parse'):
+            parser = await self.cpu.run(parse_form_html, html, offload=len(html) >= self.offload_min_bytes)
+        return parser, None
 
-    def handle_endtag(self, tag):
-        if tag == 'form' and self.current_form:
-            self.forms.append(self.current_form)
-            self.current_form = None
-        elif tag == 'label' and self.current_label:
-            if self.current_label['for']:
-                self.field_labels[self.current_label['for']] = self.current_label['text']
-            self.current_label = None
+    async def lookup_form(self, fingerprint: str, profile_paths: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Hash-first lookup for a client that sent only its form fingerprint and the
+        profile paths it has values for. Returns the cached analysis with
+        user_data_path slots for the client to fill, or None when it must upload.
+        """
 
+        parser = self.fingerprints.get(fingerprint)
+        if parser is None:
+            FINGERPRINT_LOOKUPS.inc(result='unknown')
+            return None
 
-class FormAnalyzer:
-    """LLM-powered form analyzer using Dedalus"""
+        cached = await self.cache.aget(
+            self.cache.make_schema_key(parser, sorted(set(profile_paths))), self.ats.is_current
+        )
+        record_cache_lookup(cached is not None)
+        if cached is None:
+            FINGERPRINT_LOOKUPS.inc(result='miss')
+            return None
 
-    def __init__(self):
-        self.client = None
-        self.runner = None
+        FINGERPRINT_LOOKUPS.inc(result='hit')
+        analysis = self.cache.fill(cached, parser, None)
+        self._with_stats(analysis, cache=len(analysis['field_mappings']))
+        analysis['fingerprint'] = fingerprint
+        return analysis
 
-    async def initialize(self):
-        """Initialize Dedalus client"""
-        self.client = AsyncDedalus()
-        self.runner = DedalusRunner(self.client)
-        print("✅ Dedalus client initialized")
+    async def analyze_form_stream(
+        self,
+        chunks: AsyncIterable[Union[bytes, str]],
+        url: str,
+        user_profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Analyze a form while the page body is still arriving
+        Script/style/svg subtrees are dropped unbuffered and fields are triaged
+        as each form closes, so memory stays flat for very large pages
+        """
 
-    async def analyze_form(
+        parser = StreamingFormParser()
+        # Fields are triaged before the page is complete, so only the URL can identify the ATS
+        triage = self._new_triage(self.ats.detect(url))
+
+        async for chunk in chunks:
+            for form_idx, field in parser.feed_chunk(chunk):
+                self._triage_field(triage, form_idx, field, parser, user_profile)
+
+        for form_idx, field in parser.finish():
+            self._triage_field(triage, form_idx, field, parser, user_profile)
+
+        return await self._analyze_parsed(parser, url, user_profile, triage)
+
+    async def analyze_forms_batch(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Analyze many pages in one call
+        Yields (index, analysis) in completion order; a failed item yields its exception.
+        Pages with identical structure are analyzed once and the rest reuse the cache.
+        """
+
+        llm_slots = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+
+        # Parse everything (or read its field descriptors) first so structures can be grouped
+        parsed = await asyncio.gather(
+            *(self._parse_input(item.get('html'), item.get('fields')) for item in items),
+            return_exceptions=True
+        )
+
+        leaders: Dict[str, asyncio.Task] = {}
+
+        async def analyze(
+            index: int,
+            parser: FormHTMLParser,
+            fingerprint: Optional[str],
+            leader: Optional[asyncio.Task]
+        ):
+            item = items[index]
+            try:
+                if leader:
+                    # Wait for the first copy of this structure; it fills the cache
+                    await asyncio.wait([leader])
+                async with llm_slots:
+                    result = await self._analyze_parsed(
+                        parser, item['url'], item['user_profile'], priority=Priority.BULK
+                    )
+                if fingerprint:
+                    result['fingerprint'] = fingerprint
+                return index, result
+            except Exception as e:
+                return index, e
+
+        tasks = []
+        for index, result in enumerate(parsed):
+            if isinstance(result, Exception):
+                tasks.append(asyncio.ensure_future(self._batch_error(index, result)))
+                continue
+
+            parser, fingerprint = result
+            key = self.cache.make_key(parser, items[index]['user_profile'])
+            task = asyncio.ensure_future(analyze(index, parser, fingerprint, leaders.get(key)))
+            leaders.setdefault(key, task)
+            tasks.append(task)
+
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+
+    async def _batch_error(self, index: int, error: Exception) -> Tuple[int, Exception]:
+        return index, error
+
+    async def _analyze_parsed(
         self,
-        html: str,
+        parser: FormHTMLParser,
         url: str,
         user_profile: Dict[str, Any],
-        screenshot: Optional[str] = None
+        triage: Optional[Dict[str, Any]] = None,
+        priority: Priority = Priority.STANDARD,
+        emit: Optional[Callable[[str, Any], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
-        Analyze form structure using LLM
-        Returns intelligent field mappings
+        Run cache lookup, rules tier and LLM analysis on an already parsed form
+        With emit, every mapping and instruction is passed to it as soon as it is
+        known, and the LLM output is streamed instead of awaited whole
         """
 
-        # Parse HTML to extract form structure
-        parser = FormHTMLParser()
-        parser.feed(html)
+        # Identical structures reuse the cached mappings with this user's values
+        cache_key = self.cache.make_key(parser, user_profile)
+        cached = await self.cache.aget(cache_key, self.ats.is_current)
+        record_cache_lookup(cached is not None)
+        if cached:
+            analysis = self.cache.fill(cached, parser, user_profile)
+            if emit:
+                for mapping in analysis['field_mappings']:
+                    await emit("field_mapping", mapping)
+                for instruction in analysis['instructions']:
+                    await emit("instruction", instruction)
+            return self._with_stats(analysis, cache=len(analysis['field_mappings']))
+
+        # ATS templates and deterministic rules resolve known fields; only the rest goes to the LLM
+        if triage is None:
+            triage = await self._triage_offloaded(parser, user_profile, self.ats.detect(url, parser))
+
+        seen = set()
+        step = 0
+
+        async def deliver(mapping: Dict[str, Any]):
+            nonlocal step
+            if emit is None or mapping.get('selector') in seen:
+                return
+            seen.add(mapping.get('selector'))
+            step += 1
+            await emit("field_mapping", mapping)
+            await emit("instruction", {**self._instruction_for(mapping), "step": step})
+
+        for mapping in triage['mappings']:
+            await deliver(mapping)
+
+        llm_count = 0
+        if not triage['blocks']:
+            analysis = self._merge_analysis(triage['mappings'], None)
+        else:
+            prompts = await self.cpu.run(
+                self._analysis_prompts, url, triage, user_profile,
+                offload=sum(map(len, triage['blocks'].values())) >= self.offload_min_fields,
+                shareable=False
+            )
 
-        # Build form context for LLM
-        form_context = self._build_form_context(parser, url)
+            # Get LLM analysis, one concurrent request per chunk; when streaming,
+            # llm_wait includes the time spent delivering each mapping to the consumer
+            try:
+                with span('llm_wait'):
+                    if emit is None:
+                        llm_outputs = await asyncio.gather(
+                            *(self._request_analysis(prompt, priority) for prompt in prompts)
+                        )
+                    else:
+                        llm_outputs = [''] * len(prompts)
+                        async for mapping in self._stream_analyses(prompts, llm_outputs, priority):
+                            mapping.setdefault('source', 'llm')
+                            await deliver(mapping)
+            except Exception as e:
+                print(f"Error in LLM analysis: {str(e)}")
+                # Fallback to basic analysis
+                with span('fallback'):
+                    analysis = self._fallback_analysis(parser, user_profile)
+                return self._with_stats(analysis, fallback=len(analysis['field_mappings']))
+
+            # Parse LLM responses
+            with span('json_parse'):
+                llm_analysis = await self._decode_outputs(llm_outputs)
+            analysis = self._merge_analysis(triage['mappings'], llm_analysis)
+            llm_count = len(analysis['field_mappings']) - len(triage['mappings'])
+
+        self._annotate_ats(analysis, triage)
+        if analysis.get('field_mappings'):
+            await self.cache.aput(cache_key, parser, analysis, user_profile)
+
+        return self._with_stats(analysis, template=triage['template'], rules=triage['rules'], llm=llm_count)
+
+    @staticmethod
+    def _with_stats(
+        analysis: Dict[str, Any],
+        cache: int = 0,
+        template: int = 0,
+        rules: int = 0,
+        llm: int = 0,
+        fallback: int = 0
+    ) -> Dict[str, Any]:
+        """Attach and record how many fields each tier resolved"""
+        analysis['stats'] = {"cache": cache, "template": template, "rules": rules, "llm": llm, "fallback": fallback}
+        record_tiers(analysis['stats'])
+        return analysis
 
-        # Create LLM prompt
-        prompt = self._create_analysis_prompt(form_context, user_profile)
+    async def analyze_form_events(
+        self,
+        html: Optional[str],
+        url: str,
+        user_profile: Dict[str, Any],
+        fields: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analyze a form, yielding ("field_mapping", mapping) and ("instruction", instruction)
+        as each becomes known, then ("form_analysis", analysis) with the full result.
+        Rules-tier fields come first; LLM fields follow while the model is still generating.
+        """
+
+        parser, fingerprint = await self._parse_input(html, fields)
+
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def emit(event_type: str, data: Any):
+            # Wait until the consumer has taken it, so the pipeline never runs ahead
+            await events.put((event_type, data))
+            await events.join()
+
+        pipeline = asyncio.ensure_future(self._analyze_parsed(parser, url, user_profile, emit=emit))
+        pipeline.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+                events.task_done()
+            analysis = pipeline.result()
+        finally:
+            pipeline.cancel()
+
+        if fingerprint:
+            analysis['fingerprint'] = fingerprint
+        yield "form_analysis", analysis
+
+    async def _stream_analyses(
+        self,
+        prompts: List[str],
+        outputs: List[str],
+        priority: Priority = Priority.STANDARD
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream every chunk prompt concurrently, yielding each field mapping as soon
+        as its JSON object is complete. Full raw outputs are written into outputs.
+        """
 
-        # Get LLM analysis
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run(index: int, prompt: str):
+            streamer = JSONArrayStreamer(keys=('field_mappings',))
+            try:
+                async for piece in self.dispatcher.stream(
+                    prompt, priority=priority, system=self.ANALYSIS_SYSTEM_PROMPT, max_tokens=2000
+                ):
+                    for _, mapping in streamer.feed(piece):
+                        if isinstance(mapping, dict):
+                            await queue.put(mapping)
+                outputs[index] = streamer.text
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.ensure_future(run(index, prompt)) for index, prompt in enumerate(prompts)]
         try:
-            response = await self.runner.run(
-                input=prompt,
-                model="openai/gpt-4o-mini"  # Fast and cost-effective
+            remaining = len(tasks)
+            while remaining:
+                mapping = await queue.get()
+                if mapping is None:
+                    remaining -= 1
+                    continue
+                yield mapping
+            for task in tasks:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request_analysis(self, prompt: str, priority: Priority = Priority.STANDARD) -> str:
+        """Send the analysis prompt to the LLM and return its raw output"""
+
+        return await self.dispatcher.submit(
+            prompt,
+            priority=priority,
+            system=self.ANALYSIS_SYSTEM_PROMPT,
+            max_tokens=2000
+        )
+
+    async def _triage_offloaded(
+        self,
+        parser: FormHTMLParser,
+        user_profile: Dict[str, Any],
+        template: Optional[ATSTemplate] = None
+    ) -> Dict[str, Any]:
+        """Triage in the worker pool when the page has many fields"""
+
+        field_count = sum(len(form['fields']) for form in parser.forms)
+        return await self.cpu.run(
+            self._triage_parser, parser, user_profile, template,
+            offload=field_count >= self.offload_min_fields, shareable=False
+        )
+
+    async def _decode_outputs(self, outputs: List[str]) -> Dict[str, Any]:
+        """Parse and combine chunk outputs, off the event loop when they are large"""
+
+        return await self.cpu.run(
+            self._combine_outputs, outputs,
+            offload=sum(len(output) for output in outputs) >= self.offload_min_bytes, shareable=False
+        )
+
+    def _combine_outputs(self, outputs: List[str]) -> Dict[str, Any]:
+        return self._combine_chunk_analyses([self._parse_llm_response(output) for output in outputs])
+
+    def _triage_parser(
+        self,
+        parser: FormHTMLParser,
+        user_profile: Dict[str, Any],
+        template: Optional[ATSTemplate] = None
+    ) -> Dict[str, Any]:
+        """Triage every field of an already parsed page"""
+
+        with span('triage'):
+            triage = self._new_triage(template)
+            for form_idx, form in enumerate(parser.forms):
+                for field in form['fields']:
+                    self._triage_field(triage, form_idx, field, parser, user_profile)
+        return triage
+
+    def _analysis_prompts(self, url: str, triage: Dict[str, Any], user_profile: Dict[str, Any]) -> List[str]:
+        """LLM prompts for the fields the rules tier left over"""
+
+        # Build form context for LLM from the ambiguous fields only,
+        # split into chunks that each fit the prompt token budget
+        with span('context_build'):
+            form_contexts = self._format_form_context(
+                url, [blocks for _, blocks in sorted(triage['blocks'].items())], user_profile
             )
 
-            # Parse LLM response
-            analysis = self._parse_llm_response(response.final_output)
+        with span('prompt_build'):
+            return [self._create_analysis_prompt(context, user_profile) for context in form_contexts]
 
-            return analysis
+    def _new_triage(self, template: Optional[ATSTemplate] = None) -> Dict[str, Any]:
+        """Accumulator for template/rule-resolved mappings and ambiguous field context"""
+        return {"mappings": [], "blocks": {}, "template": 0, "rules": 0, "ats": template}
 
-        except Exception as e:
-            print(f"Error in LLM analysis: {str(e)}")
-            # Fallback to basic analysis
-            return self._fallback_analysis(parser, user_profile)
-
-    def _build_form_context(self, parser: FormHTMLParser, url: str) -> str:
-        """Build structured context from parsed form"""
-
-        if not parser.forms:
-            return "No forms detected in HTML"
-
-        context = f"Form URL: {url}\n\n"
-
-        for idx, form in enumerate(parser.forms):
-            context += f"Form {idx + 1}:\n"
-            context += f"Fields ({len(form['fields'])}):\n"
-
-            for field in form['fields']:
-                context += f"  - Tag: {field['tag']}\n"
-                context += f"    Type: {field['type']}\n"
-                if field['name']:
-                    context += f"    Name: {field['name']}\n"
-                if field['id']:
-                    context += f"    ID: {field['id']}\n"
-                if field['placeholder']:
-                    context += f"    Placeholder: {field['placeholder']}\n"
-                if field['aria_label']:
-                    context += f"    Aria-label: {field['aria_label']}\n"
-                if field['class']:
-                    context += f"    Class: {field['class']}\n"
-                if field['required']:
-                    context += f"    Required: Yes\n"
-                context += "\n"
-
-        return context
+    def _triage_field(
+        self,
+        triage: Dict[str, Any],
+        form_idx: int,
+        field: Dict,
+        parser: FormHTMLParser,
+        user_profile: Dict
+    ):
+        """Resolve a field with the page's ATS template or the rules tier, or queue it for the LLM"""
+
+        template = triage['ats']
+        if template is not None:
+            rule = template.match(field)
+            mapping = self._template_mapping(rule, field, user_profile) if rule is not None else None
+            if mapping is not None:
+                triage['template'] += 1
+                triage['mappings'].append(mapping)
+                return
+            # A template field without a profile value is left to the rules tier and the LLM
+
+        purpose, confidence = classify_field(field)
+
+        if purpose in PROFILE_PATHS and confidence >= self.rules_threshold:
+            triage['rules'] += 1
+            value = self._get_user_value(purpose, user_profile)
+            if value:
+                triage['mappings'].append({
+                    "field_purpose": purpose,
+                    "selector": self._build_selector(field),
+                    "user_data_path": PROFILE_PATHS[purpose],
+                    "value": value,
+                    "confidence": confidence,
+                    "field_type": 'select' if field['tag'] == 'select' else field['type'],
+                    "source": "rules"
+                })
+            return
+
+        triage['blocks'].setdefault(form_idx, []).append(self._describe_field(field))
+
+    def _template_mapping(self, rule: Dict[str, Any], field: Dict, user_profile: Dict) -> Optional[Dict[str, Any]]:
+        """Mapping for a field covered by an ATS template rule; None when the profile has no value for it"""
+
+        path = rule['path']
+        if not path:
+            return None
+        field_type = 'select' if field['tag'] == 'select' else field['type']
+        if field_type == 'checkbox':
+            # Booleans set the box's state rather than being typed in as "True"
+            state = checkbox_state(self._profile_lookup(path, user_profile))
+            if state is None:
+                return None
+            value = 'true' if state else 'false'
+        else:
+            value = self._get_profile_value(path, user_profile)
+            if not value:
+                return None
+
+        return {
+            "field_purpose": rule['purpose'],
+            "selector": self._build_selector(field),
+            "user_data_path": path,
+            "value": value,
+            "confidence": rule['confidence'],
+            "field_type": field_type,
+            "source": "template"
+        }
+
+    def _merge_analysis(
+        self,
+        rule_mappings: List[Dict[str, Any]],
+        llm_analysis: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Combine rules-tier mappings with the LLM's analysis of the remaining fields"""
+
+        field_mappings = list(rule_mappings)
+        instructions = [self._instruction_for(mapping) for mapping in rule_mappings]
+        seen = {mapping['selector'] for mapping in rule_mappings}
+
+        if llm_analysis:
+            llm_mappings = [
+                mapping for mapping in llm_analysis.get('field_mappings', [])
+                if isinstance(mapping, dict) and mapping.get('selector') not in seen
+            ]
+            for mapping in llm_mappings:
+                mapping.setdefault('source', 'llm')
+                field_mappings.append(mapping)
+
+            # The compact prompt doesn't ask for instructions; derive them from mappings
+            llm_instructions = llm_analysis.get('instructions')
+            if llm_instructions is None:
+                llm_instructions = [self._instruction_for(mapping) for mapping in llm_mappings]
+            for instruction in llm_instructions:
+                if instruction.get('selector') not in seen:
+                    instructions.append(instruction)
+
+        for step, instruction in enumerate(instructions, start=1):
+            instruction['step'] = step
+
+        if llm_analysis:
+            form_type = llm_analysis.get('form_type', 'unknown')
+            confidence = llm_analysis.get('confidence', 0.0)
+        else:
+            form_type = "unknown"
+            confidence = min((m['confidence'] for m in rule_mappings), default=0.0)
+
+        return {
+            "form_type": form_type,
+            "confidence": confidence,
+            "field_mappings": field_mappings,
+            "instructions": instructions
+        }
+
+    def _annotate_ats(self, analysis: Dict[str, Any], triage: Dict[str, Any]):
+        """Record which ATS template resolved the page"""
+
+        template = triage['ats']
+        if template is None:
+            return
+        analysis['ats'] = template.describe()
+        if analysis.get('form_type', 'unknown') == 'unknown':
+            analysis['form_type'] = template.form_type
+
+    def _instruction_for(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill instruction for a field mapping"""
+
+        field_type = mapping.get('field_type')
+        if field_type == 'select':
+            action = "select"
+        elif field_type == 'file':
+            action = "upload"
+        elif field_type == 'checkbox' and checkbox_state(mapping.get('value')) is not None:
+            action = "check" if checkbox_state(mapping.get('value')) else "uncheck"
+        elif field_type in ('checkbox', 'radio'):
+            action = "click"
+        else:
+            action = "fill"
+
+        return {
+            "action": action,
+            "selector": mapping.get('selector'),
+            "value": mapping.get('value'),
+            "description": f"Fill {mapping.get('field_purpose', 'field')}"
+        }
+
+    def _combine_chunk_analyses(self, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge the LLM analyses of a form that was split into chunks"""
+
+        if len(analyses) == 1:
+            return analyses[0]
+
+        form_types = [
+            a.get('form_type') for a in analyses
+            if a.get('form_type') not in (None, 'unknown', 'other')
+        ]
+        combined = {
+            "form_type": form_types[0] if form_types else analyses[0].get('form_type', 'unknown'),
+            "confidence": min((a.get('confidence', 0.0) for a in analyses), default=0.0),
+            "field_mappings": [m for a in analyses for m in a.get('field_mappings', [])],
+        }
+        # Otherwise _merge_analysis derives instructions from the mappings
+        if all('instructions' in a for a in analyses):
+            combined['instructions'] = [i for a in analyses for i in a['instructions']]
+        return combined
+
+    def _build_form_context(self, parser: FormHTMLParser, url: str, user_profile: Dict) -> List[str]:
+        """Build structured context chunks from parsed form"""
+
+        return self._format_form_context(
+            url,
+            [[self._describe_field(field) for field in form['fields']] for form in parser.forms],
+            user_profile
+        )
+
+    def _format_form_context(self, url: str, forms: List[List[str]], user_profile: Dict) -> List[str]:
+        """Join per-field rows into LLM form contexts that fit the prompt token budget"""
+
+        if not forms:
+            return ["No forms detected in HTML"]
+
+        # Whatever the rest of the prompt (instructions, profile) uses comes off the budget
+        overhead = estimate_tokens(self._create_analysis_prompt('', user_profile))
+        budget = max(self.prompt_token_budget - overhead, 256)
+
+        return chunk_forms(url, forms, budget)
+
+    def _describe_field(self, field: Dict) -> str:
+        """Describe a single field for the LLM form context"""
+
+        return encode_field(field)
 
     def _create_analysis_prompt(self, form_context: str, user_profile: Dict) -> str:
         """Create LLM prompt for form analysis"""
@@ -171,47 +686,18 @@ class FormAnalyzer:
 
         available_data_str = "\n".join(available_data)
 
-        prompt = f"""You are an intelligent form filling assistant. Analyze this form and provide field mappings.
+        prompt = f"""You are an intelligent form filling assistant. Map each form field to the user's data.
 
-FORM STRUCTURE:
+FORM FIELDS (one row per field):
 {form_context}
 
 AVAILABLE USER DATA:
 {available_data_str}
 
-TASK:
-1. Identify each form field's purpose (e.g., "first name", "email", "phone")
-2. Map each field to the appropriate user data
-3. For dropdowns/selects, suggest the best matching value
-4. Provide CSS selectors to locate each field
-5. Indicate confidence level (0.0-1.0) for each mapping
+For each field that has matching data, give its purpose, a CSS selector built from its id or name, the user_data_path and the value to enter (for selects, the best matching option text), field_type (text|select|radio|checkbox|file|textarea) and confidence 0.0-1.0.
 
-Return your analysis as a JSON object with this structure:
-{{
-  "form_type": "job_application" | "registration" | "profile" | "other",
-  "confidence": 0.0-1.0,
-  "field_mappings": [
-    {{
-      "field_purpose": "first_name",
-      "selector": "input[name='firstName']",
-      "user_data_path": "personalInfo.firstName",
-      "value": "John",
-      "confidence": 0.95,
-      "field_type": "text" | "select" | "radio" | "checkbox" | "file" | "textarea"
-    }}
-  ],
-  "instructions": [
-    {{
-      "step": 1,
-      "action": "fill" | "select" | "click" | "upload",
-      "selector": "input[name='firstName']",
-      "value": "John",
-      "description": "Fill first name field"
-    }}
-  ]
-}}
-
-Provide ONLY the JSON response, no additional text."""
+Return ONLY JSON like:
+{{"form_type":"job_application|registration|profile|other","confidence":0.9,"field_mappings":[{{"field_purpose":"first_name","selector":"#firstName","user_data_path":"personalInfo.firstName","value":"John","confidence":0.95,"field_type":"text"}}]}}"""
 
         return prompt
 
@@ -281,40 +767,10 @@ Provide ONLY the JSON response, no additional text."""
         }
 
     def _guess_field_purpose(self, field: Dict) -> Optional[str]:
-        """Simple heuristic to guess field purpose"""
+        """Best rule-table guess for a field's purpose, at any confidence"""
 
-        # Check all available hints
-        hints = []
-        if field['name']:
-            hints.append(field['name'].lower())
-        if field['id']:
-            hints.append(field['id'].lower())
-        if field['placeholder']:
-            hints.append(field['placeholder'].lower())
-        if field['aria_label']:
-            hints.append(field['aria_label'].lower())
-
-        hint_text = ' '.join(hints)
-
-        # Simple keyword matching
-        if any(kw in hint_text for kw in ['first', 'fname', 'firstname']):
-            return 'first_name'
-        elif any(kw in hint_text for kw in ['last', 'lname', 'lastname']):
-            return 'last_name'
-        elif 'email' in hint_text or field['type'] == 'email':
-            return 'email'
-        elif 'phone' in hint_text or 'tel' in hint_text or field['type'] == 'tel':
-            return 'phone'
-        elif 'address' in hint_text:
-            return 'address'
-        elif 'city' in hint_text:
-            return 'city'
-        elif 'state' in hint_text:
-            return 'state'
-        elif 'zip' in hint_text or 'postal' in hint_text:
-            return 'postal_code'
-
-        return None
+        purpose, _ = classify_field(field)
+        return purpose
 
     def _build_selector(self, field: Dict) -> str:
         """Build CSS selector for field"""
@@ -329,35 +785,145 @@ Provide ONLY the JSON response, no additional text."""
     def _get_user_value(self, field_purpose: str, user_profile: Dict) -> Optional[str]:
         """Get value from user profile"""
 
-        mapping = {
-            'first_name': 'personalInfo.firstName',
-            'last_name': 'personalInfo.lastName',
-            'email': 'personalInfo.email',
-            'phone': 'personalInfo.phone',
-            'address': 'personalInfo.address',
-            'city': 'personalInfo.city',
-            'state': 'personalInfo.state',
-            'postal_code': 'personalInfo.postalCode'
-        }
-
-        path = mapping.get(field_purpose)
+        path = PROFILE_PATHS.get(field_purpose)
         if not path:
             return None
+        return self._get_profile_value(path, user_profile)
 
-        parts = path.split('.')
-        value = user_profile
-        for part in parts:
-            value = value.get(part, {})
-            if not value:
-                return None
+    def _profile_lookup(self, path: str, user_profile: Dict) -> Any:
+        """Raw value at a dotted profile path, or None"""
 
-        return str(value)
+        value = user_profile
+        for part in path.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+    def _get_profile_value(self, path: str, user_profile: Dict) -> Optional[str]:
+        """Value at a dotted profile path or composite ("{a.b} {a.c}"); None when any part is missing"""
+
+        values = {}
+        for ref in profile_path_refs(path):
+            value = user_profile
+            for part in ref.split('.'):
+                value = value.get(part, {}) if isinstance(value, dict) else None
+                if not value:
+                    return None
+            values[ref] = value
+        return render_profile_path(path, values)
 
     async def select_dropdown_option(
         self,
         options: List[str],
         desired_value: str,
         context: str
+    ) -> Dict[str, Any]:
+        """
+        Select best dropdown option
+        The vector matcher answers clear cases; close calls go to the LLM, where
+        concurrent calls within DROPDOWN_BATCH_WINDOW_MS are coalesced into one prompt
+        """
+
+        selection = self._match_dropdown(options, desired_value)
+        if selection is not None:
+            return selection
+
+        return await self.dropdown_batcher.submit({
+            "options": options,
+            "desired_value": desired_value,
+            "context": context
+        })
+
+    async def select_dropdown_options(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Resolve many dropdowns; only the ones the matcher can't settle reach the LLM
+        Each item has options, desired_value and context; returns one selection per item
+        """
+
+        selections: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        ambiguous = []
+        for idx, item in enumerate(items):
+            selections[idx] = self._match_dropdown(item['options'], item['desired_value'])
+            if selections[idx] is None:
+                ambiguous.append(idx)
+
+        if ambiguous:
+            llm_selections = await self._select_dropdowns_llm([items[idx] for idx in ambiguous])
+            for idx, selection in zip(ambiguous, llm_selections):
+                selections[idx] = selection
+
+        return selections
+
+    async def _select_dropdowns_llm(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Resolve many dropdowns with a single LLM round-trip"""
+
+        if len(items) == 1:
+            item = items[0]
+            return [await self._select_single_dropdown(
+                item['options'], item['desired_value'], item.get('context', '')
+            )]
+
+        dropdowns = []
+        for number, item in enumerate(items, start=1):
+            options_list = chr(10).join(f"  {i+1}. {opt}" for i, opt in enumerate(item['options']))
+            dropdowns.append(
+                f"DROPDOWN {number}\n"
+                f"CONTEXT: {item.get('context', '')}\n"
+                f"DESIRED VALUE: {item['desired_value']}\n"
+                f"OPTIONS:\n{options_list}"
+            )
+        dropdowns_str = "\n\n".join(dropdowns)
+
+        prompt = f"""Select the best matching option for each dropdown below.
+
+{dropdowns_str}
+
+For each dropdown, which option best matches the desired value? Consider:
+- Exact matches
+- Abbreviations (e.g., "USA" for "United States")
+- Synonyms (e.g., "Yes" for "I am authorized")
+- Common conventions
+
+Return JSON with one entry per dropdown:
+{{
+  "selections": [
+    {{
+      "dropdown": 1,
+      "selected_option": "exact option text",
+      "confidence": 0.0-1.0,
+      "reasoning": "why this option was selected"
+    }}
+  ]
+}}"""
+
+        try:
+            llm_output = await self.dispatcher.submit(
+                prompt,
+                priority=Priority.STANDARD,
+                system="You are a dropdown selection assistant.",
+                max_tokens=max(500, 120 * len(items))
+            )
+
+            result = self._parse_llm_response(llm_output)
+            by_number = {
+                selection.get('dropdown'): selection
+                for selection in result.get('selections', [])
+                if isinstance(selection, dict)
+            }
+
+        except Exception as e:
+            print(f"Error in batched dropdown selection: {e}")
+            by_number = {}
+
+        return [
+            self._normalize_selection(by_number.get(number), item['options'], item['desired_value'])
+            for number, item in enumerate(items, start=1)
+        ]
+
+    async def _select_single_dropdown(
+        self,
+        options: List[str],
+        desired_value: str,
+        context: str
     ) -> Dict[str, Any]:
         """Use LLM to select best dropdown option"""
 
@@ -382,47 +948,74 @@ Return JSON:
 }}"""
 
         try:
-            response = await self.runner.run(
-                input=prompt,
-                model="openai/gpt-4o-mini"
+            llm_output = await self.dispatcher.submit(
+                prompt,
+                priority=Priority.STANDARD,
+                system="You are a dropdown selection assistant."
             )
-
-            result = self._parse_llm_response(response.final_output)
-            return result
+            result = self._parse_llm_response(llm_output)
+            return self._normalize_selection(result, options, desired_value)
 
         except Exception as e:
             print(f"Error in dropdown selection: {e}")
             # Fallback to fuzzy matching
             return self._fuzzy_match_option(options, desired_value)
 
+    def _normalize_selection(
+        self,
+        result: Optional[Dict[str, Any]],
+        options: List[str],
+        desired_value: str
+    ) -> Dict[str, Any]:
+        """Validate an LLM selection against the real options; fuzzy match if it is unusable"""
+
+        result = result or {}
+        selected = result.get('selected_option', result.get('option'))
+        if isinstance(selected, str):
+            if selected not in options:
+                # Tolerate case/whitespace drift in the model's answer
+                lookup = {opt.strip().lower(): opt for opt in options}
+                selected = lookup.get(selected.strip().lower())
+            if selected is not None:
+                try:
+                    confidence = float(result.get('confidence', 0.5))
+                except (TypeError, ValueError):
+                    confidence = 0.5
+                selection = {
+                    "option": selected,
+                    "confidence": confidence,
+                    "reasoning": result.get('reasoning', '')
+                }
+                # Remembered picks are reused for every user, so only keep confident ones
+                if confidence >= self.dropdown_min_confidence:
+                    self.option_index.remember(options, desired_value, selection)
+                return selection
+
+        return self._fuzzy_match_option(options, desired_value)
+
     def _fuzzy_match_option(self, options: List[str], desired: str) -> Dict[str, Any]:
         """Fallback fuzzy matching for dropdown"""
 
-        desired_lower = desired.lower()
+        if not options:
+            return {"option": "", "confidence": 0.0, "reasoning": "No options"}
+        return self._selection_from_match(self.option_index.match(options, desired))
 
-        # Try exact match
-        for opt in options:
-            if opt.lower() == desired_lower:
-                return {
-                    "option": opt,
-                    "confidence": 1.0,
-                    "reasoning": "Exact match"
-                }
+    def _match_dropdown(self, options: List[str], desired: str) -> Optional[Dict[str, Any]]:
+        """Selection from the option index if it is decisive, else None (needs the LLM)"""
 
-        # Try substring match
-        for opt in options:
-            if desired_lower in opt.lower() or opt.lower() in desired_lower:
-                return {
-                    "option": opt,
-                    "confidence": 0.8,
-                    "reasoning": "Substring match"
-                }
+        match = self.option_index.match(options, desired)
+        if not is_decisive(match, self.dropdown_min_confidence, self.dropdown_min_margin):
+            return None
+        if not match.get('remembered'):
+            self.option_index.remember(options, desired, match)
+        return self._selection_from_match(match)
 
-        # Return first option as fallback
+    @staticmethod
+    def _selection_from_match(match: Dict[str, Any]) -> Dict[str, Any]:
         return {
-            "option": options[0] if options else "",
-            "confidence": 0.3,
-            "reasoning": "No match found, using first option"
+            "option": match['option'],
+            "confidence": match['confidence'],
+            "reasoning": match['reasoning']
         }
 
     async def get_next_filling_action(
@@ -432,13 +1025,11 @@ Return JSON:
     ) -> Dict[str, Any]:
         """Determine next action in form filling process"""
 
-        # This can be enhanced with LLM to handle multi-step forms
-        # For now, return next unfilled field
-
         all_fields = current_state.get('field_mappings', [])
+        filled = set(filled_fields)
 
         for field in all_fields:
-            if field['selector'] not in filled_fields:
+            if field['selector'] not in filled:
                 return {
                     "action": "fill",
                     "selector": field['selector'],
@@ -475,12 +1066,12 @@ Suggest an alternative strategy to fill this field. Return JSON:
 }}"""
 
         try:
-            response = await self.runner.run(
-                input=prompt,
-                model="openai/gpt-4o-mini"
+            llm_output = await self.dispatcher.submit(
+                prompt,
+                priority=Priority.STANDARD,
+                system="You are a form filling troubleshooter."
             )
-
-            return self._parse_llm_response(response.final_output)
+            return self._parse_llm_response(llm_output)
 
         except Exception as e:
             return {
@@ -514,12 +1105,12 @@ What value from the user data should fill this field? Return JSON:
 }}"""
 
         try:
-            response = await self.runner.run(
-                input=prompt,
-                model="openai/gpt-4o-mini"
+            llm_output = await self.dispatcher.submit(
+                prompt,
+                priority=Priority.STANDARD,
+                system="You are a field mapping assistant."
             )
-
-            return self._parse_llm_response(response.final_output)
+            return self._parse_llm_response(llm_output)
 
         except Exception as e:
             return {
@@ -551,12 +1142,12 @@ Provide a helpful, concise response. If the user wants to fill a form, tell them
 Your response (plain text, no JSON):"""
 
         try:
-            response = await self.runner.run(
-                input=prompt,
-                model="openai/gpt-4o-mini"
+            llm_output = await self.dispatcher.submit(
+                prompt,
+                priority=Priority.INTERACTIVE,
+                system="You are a helpful web page assistant."
             )
-
-            return response.final_output.strip()
+            return llm_output.strip()
 
         except Exception as e:
             return f"I'm having trouble right now. Error: {str(e)}"
@@ -0,0 +1,496 @@
+"""
+Content-addressed cache for form analysis results
+Keys on the normalized form structure so repeat visits skip the LLM
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Field names that carry per-session values (CSRF tokens, nonces, captchas)
+VOLATILE_NAME_RE = re.compile(
+    r'csrf|xsrf|authenticity|token|nonce|captcha|requestverification|session',
+    re.IGNORECASE
+)
+
+# Random-looking fragments inside ids/names (hex runs, long numbers, uuids)
+RANDOM_FRAGMENT_RE = re.compile(
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    r'|(?=[0-9a-f]*\d)[0-9a-f]{6,}'
+    r'|\d{3,}',
+    re.IGNORECASE
+)
+
+# {profile.path} references inside a composite user_data_path
+PATH_REF_RE = re.compile(r'\{([^{}]+)\}')
+
+# The id in "#id" and the value in "[name='value']", the parts of a selector built from a field
+SELECTOR_REF_RE = re.compile(r"""#([^\s#.\[\]:>+~,'"]+)|=(['"])(.*?)\2""")
+
+# Boolean-like values that set a checkbox's state
+CHECKED_VALUES = {'true', 'yes', 'on', 'checked', '1'}
+UNCHECKED_VALUES = {'false', 'no', 'off', 'unchecked', '0'}
+
+
+def _normalize_identifier(value: Optional[str]) -> str:
+    """Strip random fragments from an id or name"""
+    if not value:
+        return ''
+    return RANDOM_FRAGMENT_RE.sub('#', value.strip().lower())
+
+
+def _is_volatile_field(field: Dict) -> bool:
+    """Hidden per-session fields should not affect the cache key"""
+    if field['type'] != 'hidden':
+        return False
+    return bool(VOLATILE_NAME_RE.search(f"{field['name'] or ''} {field['id'] or ''}"))
+
+
+def _flatten_profile(user_profile: Dict, prefix: str = '') -> Dict[str, Any]:
+    """Flatten nested profile dicts into dotted paths"""
+    flat = {}
+    for key, value in user_profile.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten_profile(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+
+def _render_value(value: Any) -> str:
+    """Render a profile value the same way the analysis prompt does"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ', '.join(map(str, value))
+    return str(value)
+
+
+def profile_path_refs(path: str) -> List[str]:
+    """Profile paths a user_data_path reads: itself, or each {ref} of a composite such as {a.b} {a.c}"""
+    return PATH_REF_RE.findall(path) or [path]
+
+
+def render_profile_path(path: str, values: Dict[str, Any]) -> Optional[str]:
+    """Value of a user_data_path given {profile path: value}; None when any part is missing"""
+    refs = profile_path_refs(path)
+    if not all(values.get(ref) or values.get(ref) is False for ref in refs):
+        return None
+    if refs == [path]:
+        return _render_value(values[path])
+    return PATH_REF_RE.sub(lambda match: _render_value(values[match.group(1)]), path)
+
+
+def _rewrite_selector(selector: str, replacements: Dict[str, str]) -> str:
+    """Swap whole ids and quoted attribute values only; never text inside other ids or classes"""
+    def swap(match: "re.Match") -> str:
+        if match.group(1) is not None:
+            return '#' + replacements.get(match.group(1), match.group(1))
+        quote = match.group(2)
+        return f"={quote}{replacements.get(match.group(3), match.group(3))}{quote}"
+    return SELECTOR_REF_RE.sub(swap, selector)
+
+
+def checkbox_state(value: Any) -> Optional[bool]:
+    """Checked (True) or unchecked (False) for a boolean-like value; None for anything else"""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower() if value is not None else ''
+    if text in CHECKED_VALUES:
+        return True
+    if text in UNCHECKED_VALUES:
+        return False
+    return None
+
+
+class FormStructureCache:
+    """
+    LRU/TTL cache of LLM field mappings with an optional SQLite tier
+    aget/aput are the event-loop entry points: memory hits stay inline and
+    SQLite reads/writes run in a worker thread, serialized by a lock
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        db_path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "stale": 0,  # entries rejected by get()'s is_current check
+            "dropped_values": 0,  # mapped values not traceable to a profile path
+            "purged": 0,  # expired rows deleted from the SQLite tier
+        }
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db_lock:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS form_cache ("
+                    "key TEXT PRIMARY KEY, entry TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS form_cache_created ON form_cache (created)")
+                self._purge_expired()
+                self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "FormStructureCache":
+        """Build cache from FORM_CACHE_* environment variables"""
+        return cls(
+            max_entries=int(os.getenv('FORM_CACHE_SIZE', 1024)),
+            ttl_seconds=float(os.getenv('FORM_CACHE_TTL', 86400)),
+            db_path=os.getenv('FORM_CACHE_DB') or None
+        )
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def structure_signature(self, parser) -> List[List[Tuple]]:
+        """Normalized (tag, type, name, id, label) rows for every form"""
+        signature = []
+        for form in parser.forms:
+            rows = []
+            for field in form['fields']:
+                if _is_volatile_field(field):
+                    continue
+                label = field.get('label') or ''
+                rows.append((
+                    field['tag'],
+                    field['type'],
+                    _normalize_identifier(field['name']),
+                    _normalize_identifier(field['id']),
+                    label.strip().lower(),
+                ))
+            signature.append(rows)
+        return signature
+
+    def profile_schema(self, user_profile: Dict) -> List[str]:
+        """Profile paths that carry a value (what the LLM can map to)"""
+        return sorted(
+            path for path, value in _flatten_profile(user_profile).items() if value
+        )
+
+    def make_key(self, parser, user_profile: Dict) -> str:
+        """Hash of form structure plus profile schema"""
+        return self.make_schema_key(parser, self.profile_schema(user_profile))
+
+    def make_schema_key(self, parser, profile_schema: List[str]) -> str:
+        """make_key for a client that sent only its profile paths"""
+        payload = json.dumps(
+            [self.structure_signature(parser), profile_schema],
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, is_current: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
+        """
+        Return a cached template or None
+        is_current can reject an entry built from inputs that have since changed
+        (an older ATS template version); rejected entries are deleted
+        """
+        entry, source = self._get_memory(key)
+        if entry is None and self._db is not None:
+            entry, source = self._get_disk(key)
+        if entry is not None and is_current is not None and not is_current(entry):
+            self._drop_stale(key)
+            self._delete_disk(key)
+            entry = None
+        return self._count_lookup(entry, source)
+
+    async def aget(self, key: str, is_current: Optional[Callable[[Dict], bool]] = None) -> Optional[Dict]:
+        """get() without blocking the event loop on SQLite"""
+        entry, source = self._get_memory(key)
+        if entry is None and self._db is not None:
+            entry, source = await asyncio.to_thread(self._get_disk, key)
+        if entry is not None and is_current is not None and not is_current(entry):
+            self._drop_stale(key)
+            if self._db is not None:
+                await asyncio.to_thread(self._delete_disk, key)
+            entry = None
+        return self._count_lookup(entry, source)
+
+    def _get_memory(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if not cached:
+                return None, None
+            created, entry = cached
+            if time.time() - created > self.ttl_seconds:
+                del self._entries[key]
+                return None, None
+            self._entries.move_to_end(key)
+            return entry, "memory_hits"
+
+    def _get_disk(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT entry, created FROM form_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.ttl_seconds:
+            return None, None
+        entry = json.loads(row[0])
+        with self._lock:
+            self._store_memory(key, row[1], entry)
+        return entry, "disk_hits"
+
+    def _drop_stale(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.stats["stale"] += 1
+
+    def _count_lookup(self, entry: Optional[Dict], source: Optional[str]) -> Optional[Dict]:
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+                self.stats[source] += 1
+        return entry
+
+    def put(self, key: str, parser, analysis: Dict[str, Any], user_profile: Dict):
+        """Store an LLM analysis with its user values turned into slots"""
+        entry, created = self._put_memory(key, parser, analysis, user_profile)
+        if self._db is not None:
+            self._write_disk(key, entry, created)
+
+    async def aput(self, key: str, parser, analysis: Dict[str, Any], user_profile: Dict):
+        """put() without blocking the event loop on SQLite"""
+        entry, created = self._put_memory(key, parser, analysis, user_profile)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, entry, created)
+
+    def _put_memory(self, key: str, parser, analysis: Dict[str, Any], user_profile: Dict) -> Tuple[Dict, float]:
+        entry = self._make_template(parser, analysis, user_profile)
+        created = time.time()
+        with self._lock:
+            self._store_memory(key, created, entry)
+        return entry, created
+
+    def _write_disk(self, key: str, entry: Dict, created: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO form_cache (key, entry, created) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), created)
+            )
+            self._purge_expired()
+            self._db.commit()
+
+    def _delete_disk(self, key: str):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("DELETE FROM form_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _purge_expired(self):
+        """Delete expired rows; callers hold _db_lock and commit"""
+        deleted = self._db.execute(
+            "DELETE FROM form_cache WHERE created < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        if deleted > 0:
+            with self._lock:
+                self.stats["purged"] += deleted
+
+    def _store_memory(self, key: str, created: float, entry: Dict):
+        self._entries[key] = (created, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current size"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "disk_enabled": self._db is not None,
+            }
+
+    # ------------------------------------------------------------------
+    # Templates
+    # ------------------------------------------------------------------
+
+    def _field_refs(self, parser) -> List[List[Optional[str]]]:
+        return [
+            [field['id'], field['name']]
+            for form in parser.forms
+            for field in form['fields']
+            if not _is_volatile_field(field)
+        ]
+
+    def _make_template(self, parser, analysis: Dict, user_profile: Dict) -> Dict:
+        """
+        Replace user values with profile paths so the entry is user-agnostic
+        Only the LLM's own user_data_path is trusted: a value without a path that
+        exists in this profile (a name the LLM composed, a free-text or constant
+        answer) may be this user's data, so that field is left out
+        """
+        flat = _flatten_profile(user_profile)
+
+        mappings = []
+        slots_by_selector = {}
+        dropped = set()
+        for mapping in analysis.get('field_mappings', []):
+            mapping = dict(mapping)
+            path = mapping.get('user_data_path')
+            if path and all(ref in flat for ref in profile_path_refs(path)):
+                mapping.pop('value', None)
+                slots_by_selector[mapping.get('selector')] = path
+            elif mapping.get('value'):
+                dropped.add(mapping.get('selector'))
+                continue
+            else:
+                mapping.pop('user_data_path', None)
+            mappings.append(mapping)
+
+        instructions = []
+        for instruction in analysis.get('instructions', []):
+            instruction = dict(instruction)
+            path = slots_by_selector.get(instruction.get('selector'))
+            if path:
+                instruction['user_data_path'] = path
+                instruction.pop('value', None)
+            elif instruction.get('selector') in dropped or instruction.get('value'):
+                continue
+            instructions.append(instruction)
+        for step, instruction in enumerate(instructions, start=1):
+            instruction['step'] = step
+
+        if dropped:
+            with self._lock:
+                self.stats["dropped_values"] += len(dropped)
+
+        return {
+            "form_type": analysis.get('form_type', 'unknown'),
+            "confidence": analysis.get('confidence', 0.0),
+            "field_mappings": mappings,
+            "instructions": instructions,
+            "field_refs": self._field_refs(parser),
+            "ats": analysis.get('ats'),
+        }
+
+    def fill(self, entry: Dict, parser, user_profile: Optional[Dict]) -> Dict[str, Any]:
+        """
+        Fill a cached template with the current user's values
+        With no profile the user_data_path slots are left for the client to fill
+        """
+        flat = _flatten_profile(user_profile) if user_profile is not None else None
+
+        # Ids/names with random fragments differ between page loads
+        replacements = {}
+        for old, new in zip(entry.get('field_refs', []), self._field_refs(parser)):
+            for old_value, new_value in zip(old, new):
+                if old_value and new_value and old_value != new_value:
+                    replacements[old_value] = new_value
+
+        def fill_item(item: Dict) -> Dict:
+            item = dict(item)
+            path = item.get('user_data_path')
+            if path and 'value' not in item and flat is not None:
+                item['value'] = render_profile_path(path, flat) or ''
+            if replacements and item.get('selector'):
+                item['selector'] = _rewrite_selector(item['selector'], replacements)
+            return item
+
+        instructions = []
+        for instruction in entry['instructions']:
+            instruction = fill_item(instruction)
+            if flat is not None:
+                if instruction.get('action') in ('check', 'uncheck') and instruction.get('user_data_path'):
+                    # The cached action was another user's state; this user's value decides
+                    state = checkbox_state(instruction['value'])
+                    if state is None:
+                        continue
+                    instruction['action'] = 'check' if state else 'uncheck'
+                instruction.pop('user_data_path', None)
+            instructions.append(instruction)
+        if len(instructions) < len(entry['instructions']):
+            for step, instruction in enumerate(instructions, start=1):
+                instruction['step'] = step
+
+        analysis = {
+            "form_type": entry['form_type'],
+            "confidence": entry['confidence'],
+            "field_mappings": [fill_item(m) for m in entry['field_mappings']],
+            "instructions": instructions,
+        }
+        if entry.get('ats'):
+            analysis['ats'] = entry['ats']
+        return analysis
+
+
+class FingerprintIndex:
+    """
+    LRU of client-computed form fingerprints -> parsed field records
+    Lets a returning client send only the fingerprint; the records are what
+    the structure cache key and selector rewriting need
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "registered": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "FingerprintIndex":
+        return cls(max_entries=int(os.getenv('FORM_FINGERPRINT_SIZE', 4096)))
+
+    @staticmethod
+    def fingerprint(fields: Dict) -> str:
+        """SHA-256 of the descriptor payload as JSON.stringify would write it"""
+        payload = json.dumps(fields, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, fingerprint: str):
+        with self._lock:
+            forms = self._entries.get(fingerprint)
+            if forms is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self.stats["hits"] += 1
+            return forms
+
+    def put(self, fingerprint: str, forms):
+        with self._lock:
+            if fingerprint not in self._entries:
+                self.stats["registered"] += 1
+            self._entries[fingerprint] = forms
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "size": len(self._entries)}
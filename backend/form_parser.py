@@ -0,0 +1,586 @@
+"""
+HTML form structure parsing
+Shared by the analyzers; includes a chunked streaming mode for large pages
+"""
+
+import codecs
+import re
+import sys
+from collections import deque
+from html.parser import HTMLParser
+from typing import Iterator, List, Tuple, Union, Dict, Optional
+
+
+# Subtrees that never contain form fields and can be dropped unparsed
+SKIPPED_SUBTREES = ('script', 'style', 'svg', 'noscript', 'template')
+
+SKIP_OPEN_RE = re.compile(
+    r'<(' + '|'.join(SKIPPED_SUBTREES) + r')(?=[\s/>])', re.IGNORECASE
+)
+
+# "</tag" for each skipped subtree, matched case-insensitively in place
+SKIP_CLOSE_RE = {
+    tag: re.compile('</' + tag, re.IGNORECASE) for tag in SKIPPED_SUBTREES
+}
+
+# Longest partial "<tag" / "</tag>" that can straddle a chunk boundary
+_MAX_TAG_TAIL = max(len(tag) for tag in SKIPPED_SUBTREES) + 3
+
+# Label text beyond this is noise for field matching
+MAX_LABEL_TEXT = 200
+
+
+# Elements named by aria-labelledby ids are remembered up to this many
+MAX_ID_TEXTS = 10000
+MAX_OPEN_CAPTURES = 32
+
+FIELD_TAGS = frozenset(('input', 'select', 'textarea'))
+
+# Fields whose inner text (options, default value) must not become a label
+OPAQUE_FIELD_TAGS = frozenset(('select', 'textarea'))
+
+# Text after a checkbox/radio is its label up to the next of these
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset', 'footer',
+    'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'legend', 'li', 'main',
+    'nav', 'ol', 'p', 'section', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+))
+CHOICE_TYPES = frozenset(('checkbox', 'radio'))
+
+VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+))
+
+# Where a field's label came from, strongest first
+LABEL_ARIA = 'aria'    # aria-labelledby
+LABEL_FOR = 'for'      # <label for="id">
+LABEL_WRAP = 'wrap'    # <label>Text <input></label>
+LABEL_TEXT = 'text'    # nearest preceding text node (following, for checkboxes/radios)
+_LABEL_RANK = {LABEL_ARIA: 0, LABEL_FOR: 1, LABEL_WRAP: 2, LABEL_TEXT: 3}
+
+# Field-descriptor payloads (clients that read the DOM send these instead of HTML).
+# A field is either a row in DESCRIPTOR_KEYS order, trailing nulls omitted, or an
+# object with those keys; data_attrs is a {"data-*": value} object.
+FIELD_DESCRIPTOR_VERSION = 1
+DESCRIPTOR_KEYS = (
+    'tag', 'type', 'name', 'id', 'placeholder', 'required', 'role',
+    'class', 'aria_label', 'autocomplete', 'label', 'label_source', 'data_attrs',
+)
+MAX_DESCRIPTOR_FIELDS = 20000
+
+
+class FormField:
+    """
+    Compact, slotted record for a single form field
+    Supports field['name'] style access so it reads like the old dict records
+    """
+
+    __slots__ = (
+        'tag', 'type', 'name', 'id', 'placeholder', 'required',
+        'role', 'css_class', 'aria_label', 'autocomplete', '_data_attrs',
+        'label', 'label_source',
+    )
+
+    # dict-style key -> slot name
+    _KEYS = {
+        'tag': 'tag',
+        'type': 'type',
+        'name': 'name',
+        'id': 'id',
+        'placeholder': 'placeholder',
+        'required': 'required',
+        'role': 'role',
+        'class': 'css_class',
+        'aria_label': 'aria_label',
+        'autocomplete': 'autocomplete',
+        'data_attrs': 'data_attrs',
+        'label': 'label',
+        'label_source': 'label_source',
+    }
+
+    def __init__(
+        self,
+        tag: str,
+        type: str = 'text',
+        name: Optional[str] = None,
+        id: Optional[str] = None,
+        placeholder: Optional[str] = None,
+        required: bool = False,
+        role: Optional[str] = None,
+        css_class: Optional[str] = None,
+        aria_label: Optional[str] = None,
+        autocomplete: Optional[str] = None,
+        data_attrs: Optional[Tuple[Tuple[str, str], ...]] = None,
+        label: Optional[str] = None,
+        label_source: Optional[str] = None
+    ):
+        # Tags/types repeat on every field, so share one string object each
+        self.tag = sys.intern(tag)
+        self.type = sys.intern(type)
+        self.name = name
+        self.id = id
+        self.placeholder = placeholder
+        self.required = required
+        self.role = role
+        self.css_class = css_class
+        self.aria_label = aria_label
+        self.autocomplete = autocomplete
+        self._data_attrs = data_attrs
+        self.label = label
+        self.label_source = label_source
+
+    def set_label(self, text: str, source: str):
+        """Keep the label from the strongest source seen so far"""
+        text = ' '.join(text.split())[:MAX_LABEL_TEXT]
+        if not text:
+            return
+        if self.label_source is None or _LABEL_RANK[source] < _LABEL_RANK[self.label_source]:
+            self.label = text
+            self.label_source = source
+
+    @property
+    def data_attrs(self) -> Dict[str, str]:
+        return dict(self._data_attrs) if self._data_attrs else {}
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, self._KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        slot = self._KEYS.get(key)
+        if slot is None:
+            return default
+        return getattr(self, slot)
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, slot) for key, slot in self._KEYS.items()}
+
+    def __repr__(self):
+        return f"FormField({self.tag!r}, type={self.type!r}, name={self.name!r}, id={self.id!r})"
+
+
+class FormHTMLParser(HTMLParser):
+    """
+    Parse HTML to extract form structure
+    Labels are resolved in the same pass from <label for>, wrapping <label>,
+    aria-labelledby and, failing those, nearby text: the text right after a
+    checkbox/radio in the same block, else the nearest preceding text
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self.current_form = None
+        self.current_label = None
+        self.field_labels = {}
+        self._fields_by_id: Dict[str, FormField] = {}
+        self._labelledby: Dict[str, List[FormField]] = {}
+        self._id_text: Dict[str, str] = {}
+        self._captures: List[List] = []  # [tag, id, parts, length] of open id'd elements
+        self._opaque = None
+        self._text_run: List[str] = []
+        self._text_length = 0
+        self._last_text = ''
+        self._choice: Optional[FormField] = None  # checkbox/radio waiting for trailing text
+
+    def handle_starttag(self, tag, attrs):
+        self._end_text_run()
+        if tag in BLOCK_TAGS:
+            self._choice = None
+        if tag in FIELD_TAGS:
+            if self.current_form:
+                field = self._make_field(tag, attrs)
+                self._resolve_label(field)
+                self.current_form['fields'].append(field)
+                self.handle_field(field)
+            if tag in OPAQUE_FIELD_TAGS:
+                self._opaque = tag
+            return
+
+        if tag == 'form':
+            self.current_form = {
+                'tag': tag,
+                'attrs': dict(attrs),
+                'fields': []
+            }
+            self._text_run, self._text_length, self._last_text = [], 0, ''
+            self._choice = None
+
+        elif tag == 'label':
+            self.current_label = {
+                'for': dict(attrs).get('for'),
+                'parts': [],
+                'length': 0,
+                'fields': []
+            }
+
+        if tag not in VOID_TAGS and len(self._captures) < MAX_OPEN_CAPTURES:
+            for key, value in attrs:
+                if key == 'id' and value:
+                    self._captures.append([tag, value, [], 0])
+                    break
+
+    def _make_field(self, tag: str, attrs) -> FormField:
+        """Build a field record in a single pass over the attributes"""
+        field = FormField(tag)
+        data_attrs = []
+
+        for key, value in attrs:
+            if key == 'type':
+                field.type = sys.intern(value or 'text')
+            elif key == 'name':
+                field.name = value
+            elif key == 'id':
+                field.id = value
+            elif key == 'placeholder':
+                field.placeholder = value
+            elif key == 'required':
+                field.required = True
+            elif key == 'role':
+                field.role = value
+            elif key == 'class':
+                field.css_class = value
+            elif key == 'aria-label':
+                field.aria_label = value
+            elif key == 'aria-labelledby':
+                self._link_labelledby(field, value)
+            elif key == 'autocomplete':
+                field.autocomplete = value
+            elif key.startswith('data-'):
+                data_attrs.append((key, value))
+
+        if data_attrs:
+            field._data_attrs = tuple(data_attrs)
+        return field
+
+    def _link_labelledby(self, field: FormField, refs: Optional[str]):
+        """Label from already-seen elements now; unseen ones apply when they close"""
+        known = []
+        for ref in (refs or '').split():
+            text = self._id_text.get(ref)
+            if text is None:
+                self._labelledby.setdefault(ref, []).append(field)
+            elif text:
+                known.append(text)
+        if known:
+            field.set_label(' '.join(known), LABEL_ARIA)
+
+    def _resolve_label(self, field: FormField):
+        """Apply every label association known when the field starts"""
+        if field.id:
+            self._fields_by_id[field.id] = field
+            text = self.field_labels.get(field.id)
+            if text:
+                field.set_label(text, LABEL_FOR)
+
+        label = self.current_label
+        if label is not None and (not label['for'] or label['for'] == field.id):
+            label['fields'].append(field)
+
+        if self._last_text:
+            field.set_label(self._last_text, LABEL_TEXT)
+            self._last_text = ''
+        self._choice = field if field.type in CHOICE_TYPES else None
+
+    def handle_field(self, field: FormField):
+        """Hook called for every field added to a form"""
+        pass
+
+    def handle_form(self, form_idx: int, form: Dict):
+        """Hook called when a form closes; its fields' labels are final by then"""
+        pass
+
+    def handle_data(self, data):
+        # Text nodes may arrive split across feeds, so keep raw pieces and join later
+        if self._opaque:
+            return
+
+        if self.current_form is not None and self._text_length < MAX_LABEL_TEXT:
+            self._text_run.append(data)
+            self._text_length += len(data)
+
+        label = self.current_label
+        if label is not None and label['length'] < MAX_LABEL_TEXT:
+            label['parts'].append(data)
+            label['length'] += len(data)
+
+        for capture in self._captures:
+            if capture[3] < MAX_LABEL_TEXT:
+                capture[2].append(data)
+                capture[3] += len(data)
+
+    def _end_text_run(self):
+        """A tag ends the current text node; remember it if it has content"""
+        if self._text_run:
+            text = ''.join(self._text_run).strip()
+            if text and self._choice is not None:
+                # "<input type=checkbox> I agree": the text names the box, not the next field
+                choice, self._choice = self._choice, None
+                if choice.label_source in (None, LABEL_TEXT):
+                    choice.label, choice.label_source = None, None
+                    choice.set_label(text, LABEL_TEXT)
+            elif text:
+                self._last_text = text
+            self._text_run = []
+            self._text_length = 0
+
+    def handle_endtag(self, tag):
+        self._end_text_run()
+        if tag in BLOCK_TAGS:
+            self._choice = None
+        if tag == self._opaque:
+            self._opaque = None
+
+        if tag == 'form' and self.current_form:
+            self.forms.append(self.current_form)
+            self.current_form = None
+            self.handle_form(len(self.forms) - 1, self.forms[-1])
+        elif tag == 'label' and self.current_label:
+            self._close_label(self.current_label)
+            self.current_label = None
+
+        if self._captures:
+            self._close_capture(tag)
+
+    def _close_label(self, label: Dict):
+        text = ''.join(label['parts']).strip()
+        if label['for']:
+            self.field_labels[label['for']] = text
+            field = self._fields_by_id.get(label['for'])
+            if field is not None:
+                field.set_label(text, LABEL_FOR)
+        for field in label['fields']:
+            field.set_label(text, LABEL_WRAP)
+        if label['fields'] or label['for']:
+            # A label's text belongs to its own field, not the next one
+            self._last_text = ''
+
+    def _close_capture(self, tag: str):
+        # Tolerate unclosed children: pop back to the nearest matching open tag
+        for depth in range(len(self._captures) - 1, -1, -1):
+            if self._captures[depth][0] == tag:
+                break
+        else:
+            return
+
+        _, element_id, parts, _ = self._captures[depth]
+        del self._captures[depth:]
+        text = ' '.join(''.join(parts).split())[:MAX_LABEL_TEXT]
+
+        waiting = self._labelledby.pop(element_id, None)
+        if waiting:
+            for field in waiting:
+                field.set_label(text, LABEL_ARIA)
+        elif len(self._id_text) < MAX_ID_TEXTS:
+            self._id_text[element_id] = text
+
+
+class _SubtreeFilter:
+    """Strips script/style/svg/... subtrees from a chunk stream without buffering them"""
+
+    def __init__(self):
+        self._skipping = None
+        self._tail = ''
+
+    def feed(self, chunk: str) -> str:
+        data = self._tail + chunk
+        self._tail = ''
+        out = []
+        pos = 0
+
+        while pos < len(data):
+            if self._skipping:
+                found = SKIP_CLOSE_RE[self._skipping].search(data, pos)
+                if found is None:
+                    # Keep only enough to detect an end tag split across chunks
+                    self._tail = data[max(pos, len(data) - _MAX_TAG_TAIL):]
+                    return ''.join(out)
+                end = found.start()
+                close = data.find('>', end)
+                if close < 0:
+                    self._tail = data[end:]
+                    return ''.join(out)
+                self._skipping = None
+                pos = close + 1
+                continue
+
+            match = SKIP_OPEN_RE.search(data, pos)
+            if not match:
+                # A "<scr" at the very end could be the start of a skipped tag
+                cut = data.rfind('<', max(pos, len(data) - _MAX_TAG_TAIL))
+                if cut >= 0 and '>' not in data[cut:]:
+                    out.append(data[pos:cut])
+                    self._tail = data[cut:]
+                else:
+                    out.append(data[pos:])
+                return ''.join(out)
+
+            out.append(data[pos:match.start()])
+            self._skipping = match.group(1).lower()
+            pos = match.end()
+
+        return ''.join(out)
+
+    def flush(self) -> str:
+        tail, self._tail = self._tail, ''
+        return '' if self._skipping else tail
+
+
+class StreamingFormParser(FormHTMLParser):
+    """
+    Incremental form parser for multi-megabyte pages
+    Feed raw body chunks as they arrive; a form's fields are yielded as soon as
+    the form closes, once labels that follow their inputs have been seen
+    """
+
+    def __init__(self, encoding: str = 'utf-8'):
+        super().__init__()
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._filter = _SubtreeFilter()
+        self._ready = deque()
+
+    def handle_form(self, form_idx: int, form: Dict):
+        self._ready.extend((form_idx, field) for field in form['fields'])
+
+    def feed_chunk(self, chunk: Union[bytes, str]) -> Iterator[Tuple[int, FormField]]:
+        """Parse one chunk and yield (form_index, field) for new fields"""
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self.feed(self._filter.feed(chunk))
+        while self._ready:
+            yield self._ready.popleft()
+
+    def finish(self) -> Iterator[Tuple[int, FormField]]:
+        """Flush buffered input and yield any remaining fields"""
+        self.feed(self._filter.feed(self._decoder.decode(b'', final=True)))
+        self.feed(self._filter.flush())
+        self.close()
+        if self.current_form:
+            # Truncated body: keep the fields parsed so far
+            self.forms.append(self.current_form)
+            self.current_form = None
+            self.handle_form(len(self.forms) - 1, self.forms[-1])
+        while self._ready:
+            yield self._ready.popleft()
+
+
+def parse_form_html(html: str) -> FormHTMLParser:
+    """Parse a complete HTML document (safe to run in a worker thread)"""
+    parser = FormHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class FieldDescriptorForms:
+    """Forms built from a field-descriptor payload; same .forms shape as FormHTMLParser"""
+
+    def __init__(self, forms: List[Dict]):
+        self.forms = forms
+
+
+def _descriptor_string(value, key: str) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value or None
+    raise ValueError(f"Field descriptor '{key}' must be a string")
+
+
+def _descriptor_field(row: Union[List, Dict]) -> FormField:
+    """One descriptor row or object -> FormField"""
+    if isinstance(row, list):
+        if len(row) > len(DESCRIPTOR_KEYS):
+            raise ValueError(f"Field descriptor has {len(row)} values, expected at most {len(DESCRIPTOR_KEYS)}")
+        values = dict(zip(DESCRIPTOR_KEYS, row))
+    elif isinstance(row, dict):
+        values = row
+    else:
+        raise ValueError("Field descriptor must be a list or an object")
+
+    tag = values.get('tag')
+    if tag not in FIELD_TAGS:
+        raise ValueError(f"Unsupported field tag {tag!r}")
+
+    field = FormField(
+        tag,
+        type=_descriptor_string(values.get('type'), 'type') or 'text',
+        name=_descriptor_string(values.get('name'), 'name'),
+        id=_descriptor_string(values.get('id'), 'id'),
+        placeholder=_descriptor_string(values.get('placeholder'), 'placeholder'),
+        required=bool(values.get('required')),
+        role=_descriptor_string(values.get('role'), 'role'),
+        css_class=_descriptor_string(values.get('class'), 'class'),
+        aria_label=_descriptor_string(values.get('aria_label'), 'aria_label'),
+        autocomplete=_descriptor_string(values.get('autocomplete'), 'autocomplete'),
+    )
+
+    data_attrs = values.get('data_attrs')
+    if data_attrs:
+        if not isinstance(data_attrs, dict):
+            raise ValueError("Field descriptor 'data_attrs' must be an object")
+        field._data_attrs = tuple(
+            (key, _descriptor_string(value, key) or '')
+            for key, value in data_attrs.items() if key.startswith('data-')
+        ) or None
+
+    label = _descriptor_string(values.get('label'), 'label')
+    if label:
+        source = values.get('label_source') or LABEL_TEXT
+        if source not in _LABEL_RANK:
+            raise ValueError(f"Unknown label source {source!r}")
+        field.set_label(label, source)
+    return field
+
+
+def parse_field_descriptors(payload: Dict) -> FieldDescriptorForms:
+    """
+    Build form records from a versioned field-descriptor payload:
+    {"v": 1, "forms": [{"attrs": {...}, "fields": [row, ...]}]}
+    Raises ValueError for unknown versions or malformed fields
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Field descriptors must be an object")
+    version = payload.get('v')
+    if version != FIELD_DESCRIPTOR_VERSION:
+        raise ValueError(
+            f"Unsupported field descriptor version {version!r} (expected {FIELD_DESCRIPTOR_VERSION})"
+        )
+
+    raw_forms = payload.get('forms')
+    if not isinstance(raw_forms, list):
+        raise ValueError("Field descriptors need a 'forms' list")
+
+    forms = []
+    total = 0
+    for raw in raw_forms:
+        rows = raw.get('fields') if isinstance(raw, dict) else None
+        if not isinstance(rows, list):
+            raise ValueError("Each descriptor form needs a 'fields' list")
+        total += len(rows)
+        if total > MAX_DESCRIPTOR_FIELDS:
+            raise ValueError(f"Too many fields (limit {MAX_DESCRIPTOR_FIELDS})")
+        attrs = raw.get('attrs') or {}
+        forms.append({
+            'tag': 'form',
+            'attrs': dict(attrs) if isinstance(attrs, dict) else {},
+            'fields': [_descriptor_field(row) for row in rows]
+        })
+    return FieldDescriptorForms(forms)
+
+
+def encode_field_descriptors(parser) -> Dict:
+    """Inverse of parse_field_descriptors: compact rows for already parsed forms"""
+    forms = []
+    for form in parser.forms:
+        rows = []
+        for field in form['fields']:
+            row = [field[key] for key in DESCRIPTOR_KEYS]
+            row[DESCRIPTOR_KEYS.index('required')] = 1 if field.required else None
+            row[-1] = field.data_attrs or None
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(row)
+        forms.append({'fields': rows})
+    return {'v': FIELD_DESCRIPTOR_VERSION, 'forms': forms}
@@ -0,0 +1,109 @@
+"""
+Incremental JSON parsing of streamed LLM output
+Emits each element of selected top-level arrays as soon as it is complete,
+while the rest of the document is still being generated
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class JSONArrayStreamer:
+    """
+    Feed text chunks of a JSON object; get back (key, element) for every
+    finished element of the watched top-level arrays, e.g. "field_mappings".
+    Leading prose or markdown fences before the first '{' are skipped.
+    Each character is scanned once and only the unfinished element or string
+    is carried over between chunks, so total work is linear in the output.
+    """
+
+    def __init__(self, keys: Iterable[str] = ('field_mappings', 'instructions')):
+        self.keys = frozenset(keys)
+        self._chunks: List[str] = []
+        # Unscanned and still-needed text: from the open element or string onward
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        # Open containers: [kind, key]; kind is '{' or '['
+        self._stack: List[List[Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return elements completed by it"""
+        self._chunks.append(chunk)
+        text = self._buffer + chunk
+        completed = []
+
+        pos = self._pos
+        end = len(text)
+        while pos < end:
+            ch = text[pos]
+
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._stack.append(['{', None])
+                pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:pos]
+                pos += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos + 1
+            elif ch == ':':
+                if self._stack and self._stack[-1][0] == '{':
+                    self._pending_key = self._last_string
+            elif ch in '{[':
+                parent = self._stack[-1] if self._stack else None
+                key = self._pending_key if parent and parent[0] == '{' else None
+                self._pending_key = None
+                if (ch == '{' and parent and parent[0] == '[' and len(self._stack) == 2
+                        and parent[1] in self.keys):
+                    self._element_start = pos
+                self._stack.append([ch, key])
+            elif ch in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if (ch == '}' and self._element_start is not None and len(self._stack) == 2):
+                    element_text = text[self._element_start:pos + 1]
+                    self._element_start = None
+                    try:
+                        completed.append((self._stack[-1][1], json.loads(element_text)))
+                    except json.JSONDecodeError:
+                        pass
+            pos += 1
+
+        # Keep only what an open element or string will still slice out
+        keep = pos
+        if self._element_start is not None:
+            keep = min(keep, self._element_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if self._element_start is not None:
+            self._element_start -= keep
+        self._string_start -= keep
+        self._buffer = text[keep:]
+        self._pos = pos - keep
+        return completed
@@ -0,0 +1,213 @@
+"""
+Bounded-concurrency dispatcher for LLM calls
+Every model request goes through one place: a priority-ordered concurrency
+limit, a token-bucket rate limiter and coalescing of identical in-flight prompts
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0  # user is waiting on a chat reply
+    STANDARD = 1     # single-form analysis, dropdowns, error recovery
+    BULK = 2         # batch analysis
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; rate <= 0 disables it"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _SharedCall:
+    """An in-flight LLM call and the number of callers awaiting it"""
+
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class LLMDispatcher:
+    """Routes LLM calls through a shared concurrency limit and rate limiter"""
+
+    def __init__(
+        self,
+        call: Callable[..., Awaitable[str]],
+        max_concurrency: int = 8,
+        rate_per_second: float = 0.0,
+        burst: int = 1,
+        stream: Optional[Callable[..., AsyncIterator[str]]] = None
+    ):
+        self._call = call
+        self._stream = stream
+        self.max_concurrency = max(1, max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = 0  # waiters not yet served or cancelled
+        self._sequence = itertools.count()
+        self._in_flight: Dict[Tuple, _SharedCall] = {}
+        self.stats = {"calls": 0, "coalesced": 0, "errors": 0}
+
+    @classmethod
+    def from_env(
+        cls,
+        call: Callable[..., Awaitable[str]],
+        stream: Optional[Callable[..., AsyncIterator[str]]] = None
+    ) -> "LLMDispatcher":
+        """Build dispatcher from LLM_* environment variables"""
+        return cls(
+            call,
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+            rate_per_second=float(os.getenv('LLM_RATE_LIMIT', 0)),
+            burst=int(os.getenv('LLM_RATE_BURST', 4)),
+            stream=stream
+        )
+
+    async def submit(
+        self,
+        prompt: str,
+        priority: Priority = Priority.STANDARD,
+        **kwargs: Any
+    ) -> str:
+        """
+        Run one LLM call and return its text output
+        Callers submitting an identical prompt while it is in flight share its result.
+        The call runs as its own task: a caller that is cancelled only stops
+        waiting, and the call itself is cancelled once no caller is left.
+        """
+
+        key = (prompt, tuple(sorted(kwargs.items())))
+        shared = self._in_flight.get(key)
+        if shared is None:
+            shared = _SharedCall(asyncio.ensure_future(self._run(prompt, priority, kwargs)))
+            self._in_flight[key] = shared
+            shared.task.add_done_callback(lambda task: self._call_done(key, shared))
+        else:
+            self.stats["coalesced"] += 1
+
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        except asyncio.CancelledError:
+            if shared.waiters == 1 and not shared.task.done():
+                # Last one waiting: nobody else wants the result
+                self._forget(key, shared)
+                shared.task.cancel()
+            raise
+        finally:
+            shared.waiters -= 1
+
+    def _call_done(self, key: Tuple, shared: _SharedCall):
+        self._forget(key, shared)
+        if not shared.task.cancelled():
+            # Mark retrieved so failures nobody awaited don't log "never retrieved"
+            shared.task.exception()
+
+    def _forget(self, key: Tuple, shared: _SharedCall):
+        # A cancelled call is dropped before its task finishes; don't remove its successor
+        if self._in_flight.get(key) is shared:
+            del self._in_flight[key]
+
+    async def stream(
+        self,
+        prompt: str,
+        priority: Priority = Priority.STANDARD,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """
+        Run one LLM call and yield its output as it is generated
+        Holds a concurrency slot until the stream ends; streams are never coalesced.
+        """
+
+        if self._stream is None:
+            yield await self.submit(prompt, priority, **kwargs)
+            return
+
+        await self._acquire(priority)
+        try:
+            await self._bucket.acquire()
+            self.stats["calls"] += 1
+            async for piece in self._stream(prompt, **kwargs):
+                yield piece
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._release()
+
+    async def _run(self, prompt: str, priority: Priority, kwargs: Dict[str, Any]) -> str:
+        await self._acquire(priority)
+        try:
+            await self._bucket.acquire()
+            self.stats["calls"] += 1
+            return await self._call(prompt, **kwargs)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority):
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), waiter))
+        self._queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled; pass it on
+                self._release()
+            else:
+                self._queued -= 1
+            raise
+
+    def _release(self):
+        # Hand the slot straight to the highest-priority live waiter
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                self._queued -= 1
+                return
+        self._active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self._active,
+            "queued": self._queued,
+            "max_concurrency": self.max_concurrency,
+        }
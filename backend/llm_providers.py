@@ -0,0 +1,443 @@
+"""
+LLM providers behind one interface
+FormAnalyzer talks to a provider chosen by LLM_PROVIDER (dedalus, openai, stub);
+timeouts, retries and call metrics are handled here for all of them.
+SDKs are imported lazily so only the selected provider's package is needed.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, Any, AsyncIterator, Optional, Type
+from metrics import record_tokens
+from prompt_encoding import estimate_tokens
+
+
+class LLMProvider:
+    """Base provider: subclasses implement _complete, callers use generate"""
+
+    name = "base"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        timeout: float = 60.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5
+    ):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "total_latency_ms": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "LLMProvider":
+        """Build provider from LLM_* environment variables"""
+        return cls(**cls._env_settings())
+
+    @staticmethod
+    def _env_settings() -> Dict[str, Any]:
+        return {
+            "model": os.getenv('LLM_MODEL') or None,
+            "timeout": float(os.getenv('LLM_TIMEOUT', 60)),
+            "max_retries": int(os.getenv('LLM_MAX_RETRIES', 2)),
+            "retry_backoff": float(os.getenv('LLM_RETRY_BACKOFF', 0.5)),
+        }
+
+    async def start(self):
+        """Create the SDK client once; it is reused for every call"""
+        pass
+
+    async def close(self):
+        pass
+
+    async def generate(self, prompt: str, system: Optional[str] = None, max_tokens: int = 500) -> str:
+        """
+        Run one completion with a per-attempt timeout and retries on failure
+        Returns the model's text output
+        """
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self._complete(prompt, system, max_tokens), timeout=self.timeout
+                )
+                self.stats["calls"] += 1
+                self.stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+                self._record_tokens(prompt, system, result or '')
+                return result
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                error: Exception = TimeoutError(f"{self.name} call timed out after {self.timeout}s")
+            except Exception as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                self.stats["errors"] += 1
+                raise error
+
+            attempt += 1
+            self.stats["retries"] += 1
+            print(f"⚠️ {self.name} call failed ({error}); retry {attempt}/{self.max_retries}")
+            await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+
+    async def stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        max_tokens: int = 500
+    ) -> AsyncIterator[str]:
+        """
+        Yield the model's output in pieces as it is generated
+        The timeout applies to the wait for each piece; partial output can't be
+        retried, so a failed stream raises to the caller
+        """
+
+        started = time.perf_counter()
+        pieces = self._stream(prompt, system, max_tokens)
+        output = []
+        try:
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                output.append(piece)
+                yield piece
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.stats["errors"] += 1
+            raise TimeoutError(f"{self.name} stream stalled for {self.timeout}s") from None
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            await pieces.aclose()
+
+        self.stats["calls"] += 1
+        self.stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+        self._record_tokens(prompt, system, ''.join(output))
+
+    def _record_tokens(self, prompt: str, system: Optional[str], output: str):
+        prompt_tokens = estimate_tokens(prompt) + (estimate_tokens(system) if system else 0)
+        record_tokens(self.name, prompt_tokens, estimate_tokens(output))
+
+    async def _complete(self, prompt: str, system: Optional[str], max_tokens: int) -> str:
+        raise NotImplementedError
+
+    async def _stream(self, prompt: str, system: Optional[str], max_tokens: int) -> AsyncIterator[str]:
+        # Providers without native streaming deliver the whole output as one piece
+        yield await self._complete(prompt, system, max_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "provider": self.name,
+            "model": self.model,
+            "avg_latency_ms": self.stats["total_latency_ms"] / calls if calls else 0.0,
+        }
+
+
+class DedalusProvider(LLMProvider):
+    """Dedalus runner; uses its own defaults for system prompt and output length"""
+
+    name = "dedalus"
+
+    def __init__(self, model: Optional[str] = None, **kwargs):
+        super().__init__(model=model or "openai/gpt-4o-mini", **kwargs)  # Fast and cost-effective
+        self.client = None
+        self.runner = None
+
+    async def start(self):
+        """Initialize Dedalus client"""
+        from dedalus_labs import AsyncDedalus, DedalusRunner
+
+        self.client = AsyncDedalus()
+        self.runner = DedalusRunner(self.client)
+        print("✅ Dedalus client initialized")
+
+    async def _complete(self, prompt: str, system: Optional[str], max_tokens: int) -> str:
+        response = await self.runner.run(
+            input=prompt,
+            model=self.model
+        )
+        return response.final_output
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions called directly"""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None, **kwargs):
+        super().__init__(model=model or "gpt-4o-mini", **kwargs)
+        self.client = None
+
+    async def start(self):
+        """Initialize OpenAI client"""
+        from openai import AsyncOpenAI
+
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment")
+
+        # Retries and timeouts are handled by LLMProvider.generate
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        print("✅ OpenAI client initialized")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def _complete(self, prompt: str, system: Optional[str], max_tokens: int) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    async def _stream(self, prompt: str, system: Optional[str], max_tokens: int) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt, system),
+            temperature=0.3,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for event in response:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+    def _messages(self, prompt: str, system: Optional[str]) -> list:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return messages
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic offline provider for tests and benchmarks
+    Answers each prompt kind with well-formed JSON derived from the prompt itself,
+    after an optional simulated latency (STUB_LLM_LATENCY_MS)
+    """
+
+    name = "stub"
+
+    _OPTION_RE = re.compile(r'^\s+\d+\. (.+)$', re.MULTILINE)
+
+    # Characters per streamed piece, roughly a few tokens; long outputs use
+    # bigger pieces so simulated latency isn't spent on thousands of sleeps
+    STREAM_PIECE = 16
+    MAX_STREAM_PIECES = 64
+
+    def __init__(self, model: Optional[str] = None, latency: float = 0.0, **kwargs):
+        super().__init__(model=model or "stub", **kwargs)
+        self.latency = latency
+
+    @classmethod
+    def from_env(cls) -> "StubProvider":
+        return cls(latency=float(os.getenv('STUB_LLM_LATENCY_MS', 0)) / 1000, **cls._env_settings())
+
+    async def _complete(self, prompt: str, system: Optional[str], max_tokens: int) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def _stream(self, prompt: str, system: Optional[str], max_tokens: int) -> AsyncIterator[str]:
+        """Same output as _complete, in small pieces spread over the simulated latency"""
+        async for piece in self._paced(self._respond(prompt), self.latency):
+            yield piece
+
+    async def _paced(self, output: str, latency: float) -> AsyncIterator[str]:
+        size = max(self.STREAM_PIECE, -(-len(output) // self.MAX_STREAM_PIECES))
+        pieces = [output[i:i + size] for i in range(0, len(output), size)]
+        for piece in pieces:
+            if latency:
+                await asyncio.sleep(latency / len(pieces))
+            yield piece
+
+    def _respond(self, prompt: str) -> str:
+        if "FORM FIELDS" in prompt:
+            return json.dumps(self._analysis(prompt))
+        if "DROPDOWN 1" in prompt:
+            return json.dumps({"selections": [
+                {"dropdown": number, **self._pick(block)}
+                for number, block in enumerate(prompt.split("DROPDOWN ")[1:], start=1)
+            ]})
+        if "DESIRED VALUE" in prompt:
+            return json.dumps(self._pick(prompt))
+        if "alternative strategy" in prompt:
+            return json.dumps({"alternative_selector": None, "alternative_action": "fill", "reasoning": "stub"})
+        if "FIELD LABEL" in prompt:
+            return json.dumps({"value": "", "confidence": 0.0, "user_data_path": None, "reasoning": "stub"})
+        return "This is a stub response."
+
+    def _pick(self, text: str) -> Dict[str, Any]:
+        options = self._OPTION_RE.findall(text)
+        return {
+            "selected_option": options[0] if options else "",
+            "confidence": 0.5,
+            "reasoning": "stub: first option"
+        }
+
+    def _analysis(self, prompt: str) -> Dict[str, Any]:
+        """One mapping per encoded field row, selector from its id or name"""
+        mappings = []
+        for line in prompt.splitlines():
+            cells = line.split('|')
+            if len(cells) != 8 or cells[0] == 'Columns: kind':
+                continue
+            kind, label, name, field_id = cells[0], cells[1], cells[2], cells[3]
+            if field_id:
+                selector = f"#{field_id}"
+            elif name:
+                selector = f"[name='{name}']"
+            else:
+                continue
+            mappings.append({
+                "field_purpose": (label or name or field_id).lower().replace(' ', '_'),
+                "selector": selector,
+                "user_data_path": None,
+                "value": "",
+                "confidence": 0.5,
+                "field_type": kind if kind in ('select', 'textarea', 'file', 'checkbox', 'radio') else 'text'
+            })
+        return {"form_type": "other", "confidence": 0.5, "field_mappings": mappings}
+
+
+class ReplayProvider(StubProvider):
+    """
+    Offline provider that answers with recorded LLM responses
+    Recordings are a JSON file of prompt hash -> output (LLM_REPLAY_FILE); prompts
+    without a recording get the stub's answer. Each call waits LLM_REPLAY_LATENCY_MS
+    +/- LLM_REPLAY_JITTER_MS. With LLM_REPLAY_SOURCE set (e.g. openai) misses are sent
+    to that provider and its answers are added to the file on close.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        recordings_path: Optional[str] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        source: Optional[LLMProvider] = None,
+        seed: int = 0,
+        **kwargs
+    ):
+        super().__init__(model=model or "replay", latency=latency, **kwargs)
+        self.recordings_path = recordings_path
+        self.jitter = jitter
+        self.source = source
+        self._random = random.Random(seed)
+        self.recordings: Dict[str, str] = {}
+        self.replay_stats = {"hits": 0, "misses": 0, "recorded": 0}
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, encoding='utf-8') as f:
+                self.recordings = json.load(f)
+
+    @classmethod
+    def from_env(cls) -> "ReplayProvider":
+        source_name = os.getenv('LLM_REPLAY_SOURCE')
+        return cls(
+            recordings_path=os.getenv('LLM_REPLAY_FILE') or None,
+            latency=float(os.getenv('LLM_REPLAY_LATENCY_MS', 0)) / 1000,
+            jitter=float(os.getenv('LLM_REPLAY_JITTER_MS', 0)) / 1000,
+            source=create_provider(source_name) if source_name else None,
+            **cls._env_settings()
+        )
+
+    @staticmethod
+    def recording_key(prompt: str, system: Optional[str]) -> str:
+        return hashlib.sha256(f"{system or ''}\0{prompt}".encode('utf-8')).hexdigest()
+
+    async def start(self):
+        if self.source is not None:
+            await self.source.start()
+
+    async def close(self):
+        if self.source is not None:
+            await self.source.close()
+            self.save()
+
+    def save(self):
+        """Write recordings back to LLM_REPLAY_FILE"""
+        if self.recordings_path:
+            with open(self.recordings_path, 'w', encoding='utf-8') as f:
+                json.dump(self.recordings, f, indent=1, sort_keys=True)
+
+    async def _complete(self, prompt: str, system: Optional[str], max_tokens: int) -> str:
+        output = await self._lookup(prompt, system, max_tokens)
+        if output is None:
+            output = self._respond(prompt)
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return output
+
+    async def _stream(self, prompt: str, system: Optional[str], max_tokens: int) -> AsyncIterator[str]:
+        output = await self._lookup(prompt, system, max_tokens)
+        if output is None:
+            output = self._respond(prompt)
+        async for piece in self._paced(output, self._delay()):
+            yield piece
+
+    async def _lookup(self, prompt: str, system: Optional[str], max_tokens: int) -> Optional[str]:
+        key = self.recording_key(prompt, system)
+        output = self.recordings.get(key)
+        if output is not None:
+            self.replay_stats["hits"] += 1
+            return output
+
+        self.replay_stats["misses"] += 1
+        if self.source is None:
+            return None
+        output = await self.source.generate(prompt, system=system, max_tokens=max_tokens)
+        self.recordings[key] = output
+        self.replay_stats["recorded"] += 1
+        return output
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "replay": dict(self.replay_stats)}
+
+
+PROVIDERS: Dict[str, Type[LLMProvider]] = {
+    DedalusProvider.name: DedalusProvider,
+    OpenAIProvider.name: OpenAIProvider,
+    StubProvider.name: StubProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """Provider named by the argument or LLM_PROVIDER (default: dedalus)"""
+    name = (name or os.getenv('LLM_PROVIDER', 'dedalus')).lower()
+    try:
+        provider_cls = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}' (expected one of {', '.join(PROVIDERS)})") from None
+    return provider_cls.from_env()
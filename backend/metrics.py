@@ -0,0 +1,251 @@
+"""
+Request-level instrumentation
+Phase timing spans, token counts, cache hits and per-tier field counts are
+kept as Prometheus counters/histograms (rendered as text at /metrics) and,
+for the current request, as a trace that can be returned in Server-Timing
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; LLM waits dominate, so the upper buckets go well past a second
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    """Point-in-time value, set when /metrics is scraped"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, '')) for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = _format_labels(self.labels, key, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                inf = _format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    """All metrics of the process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    'form_analyzer_phase_seconds', 'Time spent in each analysis phase', ('phase',)
+)
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Estimated LLM tokens sent (prompt) and received (completion)', ('provider', 'kind')
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'form_cache_lookups_total', 'Form structure cache lookups', ('result',)
+)
+FIELDS_RESOLVED = REGISTRY.counter(
+    'form_fields_resolved_total', 'Fields resolved per tier', ('tier',)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'path', 'status')
+)
+LLM_QUEUE = REGISTRY.gauge(
+    'llm_dispatcher_requests', 'LLM requests in flight or waiting for a slot', ('state',)
+)
+LOOP_LAG = REGISTRY.histogram(
+    'event_loop_lag_seconds', 'How late the event loop woke from a short sleep',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+LOOP_LAG_MAX = REGISTRY.gauge(
+    'event_loop_lag_max_seconds', 'Worst event loop lag since the previous scrape'
+)
+OFFLOADED = REGISTRY.counter(
+    'cpu_offloaded_calls_total', 'CPU-bound steps run in a worker pool', ('executor',)
+)
+REQUEST_BODY_BYTES = REGISTRY.counter(
+    'http_request_body_bytes_total', 'Compressed request body sizes before and after inflating',
+    ('encoding', 'kind')
+)
+FINGERPRINT_LOOKUPS = REGISTRY.counter(
+    'form_fingerprint_lookups_total', 'Hash-first lookups by outcome', ('result',)
+)
+ATS_DETECTIONS = REGISTRY.counter(
+    'ats_detections_total', 'Pages recognized as an ATS platform, by how', ('platform', 'via')
+)
+
+
+class RequestTrace:
+    """Phase durations and counts for one request"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: durations in ms, counts as descriptions"""
+        entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.timings.items()]
+        entries.extend(f'{name};desc="{value:g}"' for name, value in self.counts.items())
+        return ', '.join(entries)
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    'request_trace', default=None
+)
+
+
+def start_trace() -> Tuple[RequestTrace, contextvars.Token]:
+    """Begin collecting spans for the current request (tasks it spawns share the trace)"""
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+
+@contextmanager
+def span(phase: str) -> Iterator[None]:
+    """Time a phase into the histogram and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PHASE_SECONDS.observe(elapsed, phase=phase)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.timings[phase] = trace.timings.get(phase, 0.0) + elapsed
+
+
+def count(name: str, amount: float = 1.0):
+    """Add to a per-request count (no-op outside a traced request)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0.0) + amount
+
+
+def record_tokens(provider: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens, provider=provider, kind='prompt')
+    LLM_TOKENS.inc(completion_tokens, provider=provider, kind='completion')
+    count('prompt-tokens', prompt_tokens)
+    count('completion-tokens', completion_tokens)
+
+
+def record_cache_lookup(hit: bool):
+    CACHE_LOOKUPS.inc(result='hit' if hit else 'miss')
+    count('cache-hit' if hit else 'cache-miss')
+
+
+def record_tiers(stats: Dict[str, int]):
+    """Per-tier field counts from an analysis' stats"""
+    for tier, fields in stats.items():
+        if fields:
+            FIELDS_RESOLVED.inc(fields, tier=tier)
+            count(f"fields-{tier}", fields)
@@ -0,0 +1,74 @@
+"""
+Micro-batching of concurrent requests
+Calls that arrive within a short window are flushed together as one batch
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class MicroBatcher:
+    """
+    Collects submitted items for up to `window` seconds (or `max_batch` items)
+    and resolves them all with a single call to `flush(items) -> results`.
+    Items submitted under different keys are never mixed in one batch.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Awaitable[List[Any]]],
+        window: float = 0.015,
+        max_batch: int = 32
+    ):
+        self._flush = flush
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # The loop only keeps weak references to tasks; hold flushes until they finish
+        self._flushing: Set[asyncio.Task] = set()
+        self.stats = {"items": 0, "batches": 0}
+
+    async def submit(self, item: Any, key: Optional[Hashable] = None) -> Any:
+        """Queue one item and wait for its result from the batched call"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((item, future))
+        self.stats["items"] += 1
+
+        if len(pending) >= self.max_batch:
+            self._start_flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._start_flush, key)
+
+        return await future
+
+    def _start_flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self.stats["batches"] += 1
+        try:
+            results = await self._flush([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch flush returned {len(results)} results for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Cancelled or a BaseException: never leave a submitter waiting forever
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
@@ -0,0 +1,299 @@
+"""
+Vectorized fuzzy matching of a desired value against dropdown options
+Scores every option at once with NumPy so long lists (countries, states,
+universities) resolve without an LLM round-trip
+"""
+
+import hashlib
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+
+
+# Hashed feature sizes; collisions are rare at these widths for option-sized strings
+CHAR_DIM = 512
+WORD_DIM = 256
+NGRAM = 3
+
+# Weight of character n-gram similarity vs whole-word containment
+CHAR_WEIGHT = 0.6
+WORD_WEIGHT = 0.4
+
+# Abbreviations and common alternate spellings -> canonical option text
+ALIASES: Dict[str, List[str]] = {
+    'usa': ['united states', 'united states of america'],
+    'us': ['united states', 'united states of america'],
+    'u s': ['united states'],
+    'u s a': ['united states'],
+    'america': ['united states'],
+    'united states of america': ['united states'],
+    'uk': ['united kingdom'],
+    'u k': ['united kingdom'],
+    'gb': ['united kingdom'],
+    'great britain': ['united kingdom'],
+    'england': ['united kingdom'],
+    'uae': ['united arab emirates'],
+    'south korea': ['korea republic of', 'korea south'],
+    'korea': ['korea republic of', 'south korea'],
+    'russia': ['russian federation'],
+    'vietnam': ['viet nam'],
+    'holland': ['netherlands'],
+    'the netherlands': ['netherlands'],
+    'czech republic': ['czechia'],
+    'prc': ['china'],
+    'true': ['yes'],
+    'false': ['no'],
+    'y': ['yes'],
+    'n': ['no'],
+    'm': ['male'],
+    'f': ['female'],
+    'man': ['male'],
+    'woman': ['female'],
+    'bachelors': ["bachelor's degree", 'bachelor'],
+    'masters': ["master's degree", 'master'],
+    'phd': ['doctorate', 'doctoral degree', 'ph d'],
+    'mit': ['massachusetts institute of technology'],
+    'ucla': ['university of california los angeles'],
+    'nyu': ['new york university'],
+}
+
+US_STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas',
+    'ca': 'california', 'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware',
+    'dc': 'district of columbia', 'fl': 'florida', 'ga': 'georgia', 'hi': 'hawaii',
+    'id': 'idaho', 'il': 'illinois', 'in': 'indiana', 'ia': 'iowa',
+    'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana', 'me': 'maine',
+    'md': 'maryland', 'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota',
+    'ms': 'mississippi', 'mo': 'missouri', 'mt': 'montana', 'ne': 'nebraska',
+    'nv': 'nevada', 'nh': 'new hampshire', 'nj': 'new jersey', 'nm': 'new mexico',
+    'ny': 'new york', 'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio',
+    'ok': 'oklahoma', 'or': 'oregon', 'pa': 'pennsylvania', 'ri': 'rhode island',
+    'sc': 'south carolina', 'sd': 'south dakota', 'tn': 'tennessee', 'tx': 'texas',
+    'ut': 'utah', 'vt': 'vermont', 'va': 'virginia', 'wa': 'washington',
+    'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming',
+}
+for _code, _state in US_STATES.items():
+    ALIASES.setdefault(_code, []).append(_state)
+    ALIASES.setdefault(_state, []).append(_code)
+
+# Range markers stay: "5+ years" and "<1 year" are not "5 years" and "1 year"
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z+<>]+')
+
+
+def normalize_option(text: str) -> str:
+    """'  Côte d'Ivoire ' -> 'cote d ivoire'; '5+ Years' -> '5+ years'"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM_RE.sub(' ', text.lower()).strip()
+
+
+def _char_features(text: str) -> List[int]:
+    padded = f"  {text} "
+    return [hash(padded[i:i + NGRAM]) % CHAR_DIM for i in range(len(padded) - NGRAM + 1)]
+
+
+def _word_features(text: str) -> List[int]:
+    return [hash(word) % WORD_DIM for word in set(text.split())]
+
+
+def _char_vector(text: str) -> np.ndarray:
+    vector = np.zeros(CHAR_DIM, dtype=np.float32)
+    np.add.at(vector, _char_features(text), 1.0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _word_vector(text: str) -> np.ndarray:
+    vector = np.zeros(WORD_DIM, dtype=np.float32)
+    vector[_word_features(text)] = 1.0
+    return vector
+
+
+class OptionIndex:
+    """Precomputed n-gram and word vectors for one option list"""
+
+    def __init__(self, options: List[str]):
+        self.options = list(options)
+        self.normalized = [normalize_option(opt) for opt in self.options]
+
+        # First option wins when several normalize to the same text
+        self.exact: Dict[str, int] = {}
+        for idx, text in enumerate(self.normalized):
+            self.exact.setdefault(text, idx)
+
+        count = len(self.options)
+        self.char_matrix = np.zeros((count, CHAR_DIM), dtype=np.float32)
+        self.word_matrix = np.zeros((count, WORD_DIM), dtype=np.float32)
+
+        rows, cols = [], []
+        for idx, text in enumerate(self.normalized):
+            features = _char_features(text)
+            rows.extend([idx] * len(features))
+            cols.extend(features)
+            self.word_matrix[idx, _word_features(text)] = 1.0
+        np.add.at(self.char_matrix, (rows, cols), 1.0)
+
+        norms = np.linalg.norm(self.char_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.char_matrix /= norms
+
+    def _queries(self, desired: str) -> List[str]:
+        normalized = normalize_option(desired)
+        queries = [normalized]
+        for alias in ALIASES.get(normalized, []):
+            if alias not in queries:
+                queries.append(alias)
+        return queries
+
+    def scores(self, desired: str) -> np.ndarray:
+        """Similarity of every option to the desired value (best over aliases)"""
+        best = np.zeros(len(self.options), dtype=np.float32)
+
+        for rank, query in enumerate(self._queries(desired)):
+            if not query:
+                continue
+            char_sim = self.char_matrix @ _char_vector(query)
+            word_query = _word_vector(query)
+            word_sim = (self.word_matrix @ word_query) / max(word_query.sum(), 1.0)
+            combined = CHAR_WEIGHT * char_sim + WORD_WEIGHT * word_sim
+
+            exact_idx = self.exact.get(query)
+            if exact_idx is not None:
+                # Literal match beats everything; alias matches just below it
+                combined[exact_idx] = 1.0 if rank == 0 else 0.99
+
+            np.maximum(best, combined, out=best)
+
+        return best
+
+    def match(self, desired: str) -> Dict[str, Any]:
+        """Best option with its score and the runner-up score"""
+        if not self.options:
+            return {"option": "", "confidence": 0.0, "runner_up": 0.0, "reasoning": "No options"}
+
+        scores = self.scores(desired)
+        if len(scores) > 1:
+            top_two = np.argpartition(-scores, 1)[:2]
+            top_two = top_two[np.argsort(-scores[top_two])]
+            best_idx, runner_up = int(top_two[0]), float(scores[top_two[1]])
+        else:
+            best_idx, runner_up = 0, 0.0
+
+        confidence = float(scores[best_idx])
+        if confidence >= 1.0:
+            reasoning = "Exact match"
+        elif confidence >= 0.99:
+            reasoning = "Alias match"
+        else:
+            reasoning = f"Fuzzy match (score {confidence:.2f}, runner-up {runner_up:.2f})"
+
+        return {
+            "option": self.options[best_idx],
+            "confidence": round(confidence, 3),
+            "runner_up": round(runner_up, 3),
+            "reasoning": reasoning,
+        }
+
+
+def match_option(options: List[str], desired: str) -> Dict[str, Any]:
+    """One-off match without keeping the index"""
+    return OptionIndex(options).match(desired)
+
+
+def option_list_hash(options: List[str]) -> str:
+    """Stable identity of an option list (order-sensitive, exact text)"""
+    digest = hashlib.sha1()
+    for option in options:
+        digest.update(str(option).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+class OptionIndexCache:
+    """
+    Bounded LRU of built OptionIndex objects keyed by option-list hash, plus an
+    LRU of (list hash, normalized desired value) -> selection decisions.
+    Decisions ignore dropdown context, so they are shared across users and pages.
+    """
+
+    def __init__(self, max_lists: int = 256, max_decisions: int = 20000):
+        self.max_lists = max_lists
+        self.max_decisions = max_decisions
+        self._indexes: "OrderedDict[str, OptionIndex]" = OrderedDict()
+        self._decisions: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.stats = {
+            "index_hits": 0,
+            "index_builds": 0,
+            "decision_hits": 0,
+            "decision_misses": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "OptionIndexCache":
+        """Build cache from OPTION_* environment variables"""
+        return cls(
+            max_lists=int(os.getenv('OPTION_INDEX_CACHE_SIZE', 256)),
+            max_decisions=int(os.getenv('OPTION_DECISION_CACHE_SIZE', 20000))
+        )
+
+    def index_for(self, options: List[str], list_hash: Optional[str] = None) -> OptionIndex:
+        """Cached index for this option list, building it on first sight"""
+        list_hash = list_hash or option_list_hash(options)
+        index = self._indexes.get(list_hash)
+        if index is not None:
+            self._indexes.move_to_end(list_hash)
+            self.stats["index_hits"] += 1
+            return index
+
+        index = OptionIndex(options)
+        self.stats["index_builds"] += 1
+        self._indexes[list_hash] = index
+        if len(self._indexes) > self.max_lists:
+            self._indexes.popitem(last=False)
+        return index
+
+    def remember(self, options: List[str], desired: str, decision: Dict[str, Any]):
+        """
+        Store a decision (e.g. an LLM pick) for reuse on the same list and value
+        Its confidence is kept, so is_decisive still judges it when it is recalled
+        """
+        key = (option_list_hash(options), normalize_option(desired))
+        self._decisions[key] = {**decision, "runner_up": decision.get('runner_up', 0.0), "remembered": True}
+        self._decisions.move_to_end(key)
+        if len(self._decisions) > self.max_decisions:
+            self._decisions.popitem(last=False)
+
+    def match(self, options: List[str], desired: str) -> Dict[str, Any]:
+        """Remembered decision if present, otherwise score against the cached index"""
+        list_hash = option_list_hash(options)
+        key = (list_hash, normalize_option(desired))
+        decision = self._decisions.get(key)
+        if decision is not None:
+            self._decisions.move_to_end(key)
+            self.stats["decision_hits"] += 1
+            return dict(decision)
+
+        self.stats["decision_misses"] += 1
+        return self.index_for(options, list_hash).match(desired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current sizes"""
+        lookups = self.stats["decision_hits"] + self.stats["decision_misses"]
+        return {
+            **self.stats,
+            "indexes": len(self._indexes),
+            "decisions": len(self._decisions),
+            "decision_hit_rate": self.stats["decision_hits"] / lookups if lookups else 0.0,
+        }
+
+
+def is_decisive(match: Dict[str, Any], min_confidence: float, min_margin: float) -> bool:
+    """True when the top candidate is good enough and clearly ahead of the runner-up"""
+    return (
+        match['confidence'] >= min_confidence
+        and match['confidence'] - match['runner_up'] >= min_margin
+    )
@@ -0,0 +1,161 @@
+"""
+Compact, token-budgeted encoding of form fields for LLM prompts
+One pipe-separated row per field with utility/hashed CSS classes stripped,
+split into chunks that each fit the prompt budget
+"""
+
+import re
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its data can't be loaded
+    _ENCODING = None
+
+
+FIELD_COLUMNS = "kind|label|name|id|placeholder|aria|class|req"
+
+# Max semantic class tokens kept per field and max length of any cell
+MAX_CLASS_TOKENS = 3
+MAX_CELL_CHARS = 60
+
+# Tailwind/Bootstrap-style utilities: optional variant prefixes then a utility root
+_UTILITY_CLASS_RE = re.compile(
+    r'^(?:[a-z0-9-]+:)*-?(?:'
+    r'[pm][xytblrse]?|w|h|min-w|max-w|min-h|max-h|size|inset|top|left|right|bottom|z|'
+    r'text|font|leading|tracking|bg|from|via|to|border|divide|rounded|shadow|ring|outline|'
+    r'opacity|flex|grid|gap|space|items|justify|content|self|place|order|col|row|basis|grow|shrink|'
+    r'float|clear|overflow|overscroll|object|display|d|align|transition|duration|ease|delay|'
+    r'animate|transform|scale|rotate|translate|skew|origin|cursor|select|pointer-events|resize|'
+    r'appearance|placeholder|fill|stroke|sr|not-sr|decoration|underline|uppercase|lowercase|'
+    r'capitalize|truncate|whitespace|break|list|table|aspect|columns|container|block|inline|'
+    r'inline-block|inline-flex|hidden|visible|invisible|static|fixed|absolute|relative|sticky|'
+    r'antialiased|italic|shadow|blur|brightness|contrast|grayscale|invert|saturate|sepia|'
+    r'accent|caret|scroll|snap|touch|will-change|isolate|mix-blend|bg-blend|'
+    r'btn|form-control|form-input|form-select|form-check|form-group|'
+    r'is|has|js|sm|md|lg|xl|xxl|dark|light|active|disabled|focus|hover|error|valid|invalid'
+    r')(?:-[\w./\[\]#%()]+)*$'
+)
+
+# Bare structural names that say nothing about the field's purpose
+_GENERIC_CLASSES = frozenset({
+    'input', 'field', 'control', 'form', 'row', 'col', 'wrapper', 'container', 'required',
+})
+
+# CSS-in-JS prefixes: css-1x2y3z, sc-AxjAm, jsx-123, svelte-xyz
+_GENERATED_PREFIX_RE = re.compile(r'^(?:css|sc|jsx|emotion|svelte|astro|tw)-')
+
+
+def _is_generated_class(token: str) -> bool:
+    """Hashed class names from CSS modules / CSS-in-JS"""
+    if _GENERATED_PREFIX_RE.match(token):
+        return True
+    if '__' in token:
+        # CSS modules: Component_field__a1B2c
+        suffix = token.rsplit('__', 1)[1]
+        if any(ch.isdigit() for ch in suffix):
+            return True
+    bare = token.lstrip('_')
+    return (
+        len(bare) >= 5 and bare.isalnum()
+        and any(ch.isdigit() for ch in bare) and any(ch.isalpha() for ch in bare)
+    )
+
+
+_CELL_BREAK_RE = re.compile(r'[|\r\n]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken when available, else ~4 characters per token"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def filter_classes(css_class: Optional[str]) -> str:
+    """Drop utility and generated class names, keep a few meaningful ones"""
+    if not css_class:
+        return ''
+
+    kept = []
+    for token in css_class.split():
+        if (token.lower() in _GENERIC_CLASSES or _UTILITY_CLASS_RE.match(token)
+                or _is_generated_class(token)):
+            continue
+        if token not in kept:
+            kept.append(token)
+            if len(kept) == MAX_CLASS_TOKENS:
+                break
+    return ' '.join(kept)
+
+
+def _cell(value: Optional[str]) -> str:
+    if not value:
+        return ''
+    value = _CELL_BREAK_RE.sub(' ', str(value)).strip()
+    return value[:MAX_CELL_CHARS]
+
+
+def encode_field(field: Dict) -> str:
+    """One FIELD_COLUMNS row for a parsed field"""
+    tag = field['tag']
+    kind = field['type'] if tag == 'input' else tag
+    if tag == 'button':
+        kind = f"button:{field['type']}"
+
+    return '|'.join((
+        kind,
+        _cell(field.get('label')),
+        _cell(field['name']),
+        _cell(field['id']),
+        _cell(field['placeholder'] if field['placeholder'] != field.get('label') else None),
+        _cell(field['aria_label']),
+        _cell(filter_classes(field['class'])),
+        '*' if field['required'] else '',
+    ))
+
+
+def chunk_forms(
+    url: str,
+    forms: List[List[str]],
+    token_budget: int
+) -> List[str]:
+    """
+    Render encoded rows into one or more form contexts, each at most token_budget
+    tokens. Forms are kept whole when they fit; larger forms are split by rows.
+    """
+
+    header = f"Form URL: {url}\nColumns: {FIELD_COLUMNS} (* = required)\n"
+    header_tokens = estimate_tokens(header)
+
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = header_tokens
+    rows_in_chunk = 0
+
+    for form_idx, rows in enumerate(forms):
+        title = f"Form {form_idx + 1}:\n"
+        title_tokens = estimate_tokens(title)
+        if rows_in_chunk and used + title_tokens > token_budget:
+            chunks.append(current)
+            current, used, rows_in_chunk = [], header_tokens, 0
+
+        current.append(title)
+        used += title_tokens
+        for row in rows:
+            line = row + '\n'
+            # Token counts of lines are close to additive; counting per line keeps this linear
+            line_tokens = estimate_tokens(line)
+            if rows_in_chunk and used + line_tokens > token_budget:
+                chunks.append(current)
+                title = f"Form {form_idx + 1} (continued):\n"
+                current, used, rows_in_chunk = [title], header_tokens + estimate_tokens(title), 0
+            current.append(line)
+            used += line_tokens
+            rows_in_chunk += 1
+
+    if current:
+        chunks.append(current)
+
+    return [header + ''.join(parts) for parts in chunks]
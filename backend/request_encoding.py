@@ -0,0 +1,150 @@
+"""
+Compressed request bodies
+Clients that have to upload a form (fingerprint miss) may send the body
+gzip/deflate-compressed, or zstd when the zstandard package is installed;
+it is inflated here before FastAPI parses it
+"""
+
+import json
+import zlib
+from typing import Optional
+
+from metrics import REQUEST_BODY_BYTES
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd bodies are rejected with 415 without it
+    zstandard = None
+
+_DECODE_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+_READ_SIZE = 64 * 1024
+
+
+def supported_encodings() -> tuple:
+    return ('gzip', 'deflate', 'zstd') if zstandard is not None else ('gzip', 'deflate')
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+def decompress(body: bytes, encoding: str, max_size: int) -> bytes:
+    """Inflate body, refusing output beyond max_size bytes"""
+    if encoding == 'zstd':
+        parts, size = [], 0
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            while size <= max_size:
+                chunk = reader.read(_READ_SIZE)
+                if not chunk:
+                    break
+                parts.append(chunk)
+                size += len(chunk)
+        data = b''.join(parts)
+    else:
+        # wbits: 16+ for a gzip header, plain for zlib-wrapped deflate
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+        data = inflater.decompress(body, max_size + 1)
+        if not inflater.eof and len(data) <= max_size:
+            raise zlib.error("truncated stream")
+    if len(data) > max_size:
+        raise BodyTooLarge(f"Decompressed body exceeds {max_size} bytes")
+    return data
+
+
+class DecompressRequestMiddleware:
+    """
+    ASGI middleware inflating request bodies sent with Content-Encoding
+    Compressed bodies are bounded by max_compressed_size as they are read (and
+    up front from Content-Length), inflated ones by max_size (zip bombs)
+    """
+
+    def __init__(self, app, max_size: int = 32 * 1024 * 1024, max_compressed_size: int = 8 * 1024 * 1024):
+        self.app = app
+        self.max_size = max_size
+        self.max_compressed_size = max_compressed_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        encoding = self._content_encoding(scope)
+        if encoding in (None, 'identity'):
+            return await self.app(scope, receive, send)
+
+        if encoding not in supported_encodings():
+            return await self._error(send, 415, f"Unsupported Content-Encoding '{encoding}'")
+
+        too_large = f"Compressed body exceeds {self.max_compressed_size} bytes"
+        declared = self._header(scope, b'content-length')
+        if declared is not None:
+            try:
+                declared_size = int(declared)
+            except ValueError:
+                return await self._error(send, 400, "Invalid Content-Length")
+            if declared_size > self.max_compressed_size:
+                return await self._error(send, 413, too_large)
+
+        # Content-Length can be absent (chunked) or wrong, so count what arrives too
+        chunks, received = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunk = message.get('body', b'')
+            received += len(chunk)
+            if received > self.max_compressed_size:
+                return await self._error(send, 413, too_large)
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        body = b''.join(chunks)
+
+        try:
+            data = decompress(body, encoding, self.max_size)
+        except BodyTooLarge as e:
+            return await self._error(send, 413, str(e))
+        except _DECODE_ERRORS as e:
+            return await self._error(send, 400, f"Invalid {encoding} body: {e}")
+
+        REQUEST_BODY_BYTES.inc(len(body), encoding=encoding, kind='compressed')
+        REQUEST_BODY_BYTES.inc(len(data), encoding=encoding, kind='decompressed')
+
+        headers = [
+            (name, value) for name, value in scope['headers']
+            if name not in (b'content-encoding', b'content-length')
+        ]
+        headers.append((b'content-length', str(len(data)).encode('latin-1')))
+        scope = {**scope, 'headers': headers}
+
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {'type': 'http.request', 'body': data, 'more_body': False}
+
+        await self.app(scope, replay, send)
+
+    @classmethod
+    def _content_encoding(cls, scope) -> Optional[str]:
+        value = cls._header(scope, b'content-encoding')
+        return value.lower() if value is not None else None
+
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope['headers']:
+            if key == name:
+                return value.decode('latin-1').strip()
+        return None
+
+    @staticmethod
+    async def _error(send, status: int, message: str):
+        body = json.dumps({"success": False, "error": message}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,131 @@
+"""
+Response encoding for analysis results
+orjson when installed (stdlib json otherwise), and a compact analysis shape:
+field mappings as rows under one column list, instructions as references to
+the mapping they fill instead of repeating its selector and value
+"""
+
+import json
+from typing import Any, Dict, List
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+COMPACT_FORMAT = 'compact-1'
+
+# Mapping columns in the order clients expect; unknown keys are appended
+MAPPING_COLUMNS = (
+    'field_purpose', 'selector', 'user_data_path', 'value',
+    'confidence', 'field_type', 'source',
+)
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_text(data: Any) -> str:
+    return dumps(data).decode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _derived_instruction(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """The instruction fields a client rebuilds from the mapping it points to"""
+    derived = {"selector": mapping.get('selector')}
+    if 'value' in mapping:
+        derived['value'] = mapping['value']
+    elif 'user_data_path' in mapping:
+        # Lookup templates: the client fills the value from its profile
+        derived['user_data_path'] = mapping['user_data_path']
+    derived['description'] = f"Fill {mapping.get('field_purpose', 'field')}"
+    return derived
+
+
+def compact_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compact form of an analysis response:
+      "mapping_columns": [...], "field_mappings": [[...], ...] (one row per mapping)
+      "instructions": [[mapping_index, action], ...] with an extras object as a third
+      item when the instruction differs from its mapping, or the full instruction
+      object when it refers to no mapping; step is the position in the list
+    Other keys are passed through unchanged.
+    """
+    mappings = analysis.get('field_mappings') or []
+
+    # Standard columns that are used, then any others in first-seen order
+    used = {key for mapping in mappings for key in mapping}
+    columns: List[str] = [column for column in MAPPING_COLUMNS if column in used]
+    for mapping in mappings:
+        for key in mapping:
+            if key not in MAPPING_COLUMNS and key not in columns:
+                columns.append(key)
+
+    rows = []
+    index_by_selector: Dict[Any, int] = {}
+    for index, mapping in enumerate(mappings):
+        rows.append([mapping.get(column) for column in columns])
+        index_by_selector.setdefault(mapping.get('selector'), index)
+
+    instructions = []
+    for instruction in analysis.get('instructions') or []:
+        index = index_by_selector.get(instruction.get('selector'))
+        if index is None:
+            instructions.append(instruction)
+            continue
+        derived = _derived_instruction(mappings[index])
+        extras = {
+            key: value for key, value in instruction.items()
+            if key not in ('action', 'step') and (key not in derived or derived[key] != value)
+        }
+        row = [index, instruction.get('action')]
+        if extras:
+            row.append(extras)
+        instructions.append(row)
+
+    compact = {key: value for key, value in analysis.items() if key not in ('field_mappings', 'instructions')}
+    compact.update({
+        "format": COMPACT_FORMAT,
+        "mapping_columns": columns,
+        "field_mappings": rows,
+        "instructions": instructions,
+    })
+    return compact
+
+
+def expand_analysis(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of compact_analysis (what the extension does client-side)"""
+    columns = compact['mapping_columns']
+    mappings = [
+        {column: value for column, value in zip(columns, row) if value is not None}
+        for row in compact['field_mappings']
+    ]
+
+    instructions = []
+    for step, item in enumerate(compact['instructions'], start=1):
+        if isinstance(item, dict):
+            instructions.append(item)
+            continue
+        instruction = {"action": item[1], **_derived_instruction(mappings[item[0]])}
+        if len(item) > 2:
+            instruction.update(item[2])
+        instruction['step'] = step
+        instructions.append(instruction)
+
+    analysis = {key: value for key, value in compact.items() if key not in ('format', 'mapping_columns')}
+    analysis['field_mappings'] = mappings
+    analysis['instructions'] = instructions
+    return analysis
@@ -1,21 +1,39 @@
 """
 Dynamic Form Filler Backend Server
-Uses Dedalus for LLM-powered form analysis
+LLM-powered form analysis via the provider selected by LLM_PROVIDER
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import asyncio
 import json
 from dotenv import load_dotenv
 import os
+import time
 from form_analyzer import FormAnalyzer
+from deepl_translator import DeepLTranslator
+from ws_dispatch import ConnectionDispatcher
+from fill_session import FillSessionStore
+from metrics import REGISTRY, REQUEST_SECONDS, LLM_QUEUE, start_trace, end_trace
+from cpu_offload import LoopLagMonitor
+from request_encoding import DecompressRequestMiddleware
+from response_format import FastJSONResponse, compact_analysis, dumps_text
 
 load_dotenv()
 
-app = FastAPI(title="Dynamic Form Filler Backend")
+# Responses are serialized with orjson when it is installed
+app = FastAPI(title="Dynamic Form Filler Backend", default_response_class=FastJSONResponse)
+
+# gzip/deflate (zstd with zstandard installed) request bodies for form uploads;
+# added before CORS so its 4xx replies still carry CORS headers
+app.add_middleware(
+    DecompressRequestMiddleware,
+    max_size=int(os.getenv('MAX_DECOMPRESSED_BODY', 32 * 1024 * 1024)),
+    max_compressed_size=int(os.getenv('MAX_COMPRESSED_BODY', 8 * 1024 * 1024))
+)
 
 # Enable CORS for Chrome extension
 app.add_middleware(
@@ -26,18 +44,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize form analyzer with Dedalus
+# Longest {"url", "user_profile"} line accepted ahead of a streamed page
+MAX_STREAM_HEADER = int(os.getenv('MAX_STREAM_HEADER', 1024 * 1024))
+
+# Per-request phase timings in a Server-Timing response header (off by default)
+TIMING_HEADERS = os.getenv('METRICS_TIMING_HEADERS', '').lower() in ('1', 'true', 'yes')
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request latency histogram plus optional Server-Timing header"""
+    started = time.perf_counter()
+    trace, token = start_trace()
+    try:
+        response = await call_next(request)
+    finally:
+        end_trace(token)
+
+    elapsed = time.perf_counter() - started
+    route = request.scope.get('route')
+    REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        path=getattr(route, 'path', 'unmatched'),
+        status=str(response.status_code)
+    )
+    if TIMING_HEADERS:
+        entries = [trace.server_timing(), f"total;dur={elapsed * 1000:.1f}"]
+        response.headers['Server-Timing'] = ', '.join(entry for entry in entries if entry)
+    return response
+
+
+# Initialize form analyzer with the configured LLM provider (Dedalus by default)
 form_analyzer = FormAnalyzer()
 
+# One DeepL client with a pooled keep-alive session for the app's lifetime
+translator = DeepLTranslator.from_env()
+
 # Active WebSocket connections
 active_connections: List[WebSocket] = []
 
+# Fill progress per analyzed form, so /ws messages only carry deltas
+fill_sessions = FillSessionStore.from_env()
+
+# Shows when CPU work blocks the event loop for every other request
+loop_lag = LoopLagMonitor.from_env()
+
 
 class FormAnalysisRequest(BaseModel):
-    html: str
+    html: Optional[str] = None  # Fallback when the client can't send field descriptors
     url: str
     user_profile: Dict[str, Any]
     screenshot: Optional[str] = None  # Base64 encoded screenshot
+    fields: Optional[Dict[str, Any]] = None  # Versioned field-descriptor payload (see form_parser)
 
 
 class FormAnalysisResponse(BaseModel):
@@ -47,6 +106,48 @@ class FormAnalysisResponse(BaseModel):
     confidence: float
     form_type: str
     error: Optional[str] = None
+    stats: Optional[Dict[str, int]] = None  # fields resolved per tier
+    fingerprint: Optional[str] = None  # for /api/analyze-form/lookup next time
+    found: Optional[bool] = None  # lookup only: False means upload the form
+    ats: Optional[Dict[str, Any]] = None  # {"platform", "version"} of the template used
+
+
+class FormLookupRequest(BaseModel):
+    fingerprint: str  # SHA-256 of the field-descriptor JSON
+    profile_paths: List[str] = []  # dotted profile paths that have a value
+
+
+def analysis_body(analysis: Optional[Dict[str, Any]] = None, error: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """
+    FormAnalysisResponse fields as a plain dict; responses are built from this
+    directly instead of validating every mapping through the pydantic model
+    """
+    body = {
+        "success": analysis is not None,
+        "field_mappings": analysis['field_mappings'] if analysis else [],
+        "instructions": analysis['instructions'] if analysis else [],
+        "confidence": analysis['confidence'] if analysis else 0.0,
+        "form_type": analysis['form_type'] if analysis else "unknown",
+        "error": error,
+        "stats": analysis.get('stats') if analysis else None,
+        "fingerprint": analysis.get('fingerprint') if analysis else None,
+        "found": None,
+        "ats": analysis.get('ats') if analysis else None,
+    }
+    body.update(extra)
+    return body
+
+
+def analysis_response(body: Dict[str, Any], compact: bool) -> FastJSONResponse:
+    """Full or compact (?compact=1) analysis response, serialized with orjson"""
+    if compact:
+        body = compact_analysis({key: value for key, value in body.items() if value is not None})
+    return FastJSONResponse(body)
+
+
+class BatchAnalysisRequest(BaseModel):
+    items: List[FormAnalysisRequest]
+    max_concurrency: Optional[int] = None  # concurrent LLM analyses
 
 
 @app.on_event("startup")
@@ -55,6 +156,16 @@ async def startup_event():
     print("🚀 Starting Dynamic Form Filler Backend Server")
     print(f"📡 WebSocket will be available at: ws://localhost:8000/ws")
     await form_analyzer.initialize()
+    await translator.start()
+    loop_lag.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections on shutdown"""
+    await loop_lag.stop()
+    await translator.close()
+    await form_analyzer.close()
 
 
 @app.get("/")
@@ -64,17 +175,17 @@ async def root():
         "status": "running",
         "service": "Dynamic Form Filler Backend",
         "version": "1.0.0",
-        "llm_provider": "dedalus"
+        "llm_provider": form_analyzer.provider.name
     }
 
 
 @app.post("/api/analyze-form", response_model=FormAnalysisResponse)
-async def analyze_form(request: FormAnalysisRequest):
+async def analyze_form(request: FormAnalysisRequest, compact: bool = False):
     """
     Analyze form structure using LLM and return field mappings
 
     This endpoint:
-    1. Takes the form HTML + user profile
+    1. Takes the form's field descriptors (or its HTML) + user profile
     2. Uses Dedalus LLM to understand the form structure
     3. Returns intelligent field mappings and filling instructions
     """
@@ -86,29 +197,161 @@ async def analyze_form(request: FormAnalysisRequest):
             html=request.html,
             url=request.url,
             user_profile=request.user_profile,
-            screenshot=request.screenshot
+            screenshot=request.screenshot,
+            fields=request.fields
         )
 
-        return FormAnalysisResponse(
-            success=True,
-            field_mappings=analysis['field_mappings'],
-            instructions=analysis['instructions'],
-            confidence=analysis['confidence'],
-            form_type=analysis['form_type'],
-            error=None
-        )
+        return analysis_response(analysis_body(analysis), compact)
 
     except Exception as e:
         print(f"❌ Error analyzing form: {str(e)}")
-        return FormAnalysisResponse(
-            success=False,
-            field_mappings=[],
-            instructions=[],
-            confidence=0.0,
-            form_type="unknown",
-            error=str(e)
+        return analysis_response(analysis_body(error=str(e)), compact)
+
+
+@app.post("/api/analyze-form/lookup", response_model=FormAnalysisResponse)
+async def lookup_form(request: FormLookupRequest, compact: bool = False):
+    """
+    Hash-first analysis: answer a known form from its fingerprint alone
+    Mappings come back with user_data_path instead of values, for the client
+    to fill from its local profile. found=False means send /api/analyze-form.
+    """
+    analysis = await form_analyzer.lookup_form(request.fingerprint, request.profile_paths)
+    if analysis is None:
+        body = analysis_body(success=True, found=False, fingerprint=request.fingerprint)
+    else:
+        body = analysis_body(analysis, found=True)
+    return analysis_response(body, compact)
+
+
+@app.post("/api/analyze-forms/batch")
+async def analyze_forms_batch(request: BatchAnalysisRequest, compact: bool = False):
+    """
+    Analyze many pages in one request
+
+    Results are streamed back as NDJSON in completion order, one line per
+    item with its "index" in the request, so clients can act on the first
+    results while slower pages are still being analyzed.
+    """
+    print(f"📝 Batch analyzing {len(request.items)} forms")
+
+    items = [item.dict() for item in request.items]
+
+    async def results():
+        async for index, analysis in form_analyzer.analyze_forms_batch(
+            items, max_concurrency=request.max_concurrency
+        ):
+            if isinstance(analysis, Exception):
+                print(f"❌ Error analyzing batch item {index}: {str(analysis)}")
+                body = analysis_body(error=str(analysis))
+            else:
+                body = analysis_body(analysis)
+            if compact:
+                body = compact_analysis({key: value for key, value in body.items() if value is not None})
+            yield dumps_text({"index": index, **body}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/api/analyze-form/stream", response_model=FormAnalysisResponse)
+async def analyze_form_stream(request: Request, compact: bool = False):
+    """
+    Streaming variant of /api/analyze-form for very large pages
+
+    The body is one JSON line with {"url", "user_profile"} followed by the raw
+    page HTML. The HTML is parsed chunk by chunk as it arrives, so the full
+    page is never held in memory. A first line over MAX_STREAM_HEADER bytes is
+    rejected with 400.
+    """
+    try:
+        chunks = request.stream()
+        header = bytearray()
+        rest = b''
+        async for chunk in chunks:
+            # Only the new bytes can hold the first newline
+            newline = chunk.find(b'\n')
+            if newline >= 0:
+                header += chunk[:newline]
+                rest = chunk[newline + 1:]
+            else:
+                header += chunk
+            if len(header) > MAX_STREAM_HEADER:
+                return FastJSONResponse(
+                    analysis_body(error=f"Stream header line exceeds {MAX_STREAM_HEADER} bytes"),
+                    status_code=400
+                )
+            if newline >= 0:
+                break
+
+        meta = json.loads(header)
+        print(f"📝 Streaming form analysis from: {meta['url']}")
+
+        async def body():
+            if rest:
+                yield rest
+            async for chunk in chunks:
+                yield chunk
+
+        analysis = await form_analyzer.analyze_form_stream(
+            chunks=body(),
+            url=meta['url'],
+            user_profile=meta.get('user_profile', {})
         )
 
+        return analysis_response(analysis_body(analysis), compact)
+
+    except Exception as e:
+        print(f"❌ Error analyzing form stream: {str(e)}")
+        return analysis_response(analysis_body(error=str(e)), compact)
+
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Form analysis cache hit/miss counters"""
+    return {**form_analyzer.cache.get_stats(), "fingerprints": form_analyzer.fingerprints.get_stats()}
+
+
+@app.get("/api/translation-stats")
+async def translation_stats():
+    """Translation cache and upstream batching counters"""
+    return translator.get_stats()
+
+
+@app.get("/api/dropdown-stats")
+async def dropdown_stats():
+    """Option index and remembered-selection cache counters"""
+    return form_analyzer.option_index.get_stats()
+
+
+@app.get("/api/ats-stats")
+async def ats_stats():
+    """ATS detections by route and the loaded template versions"""
+    return form_analyzer.ats.get_stats()
+
+
+@app.get("/api/fill-session-stats")
+async def fill_session_stats():
+    """Live WebSocket fill sessions and expiry counters"""
+    return fill_sessions.get_stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics: phase latencies, tokens, cache hits, tiers"""
+    dispatcher_stats = form_analyzer.dispatcher.get_stats()
+    LLM_QUEUE.set(dispatcher_stats["in_flight"], state="in_flight")
+    LLM_QUEUE.set(dispatcher_stats["queued"], state="queued")
+    loop_lag.take_max()
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/llm-stats")
+async def llm_stats():
+    """LLM dispatcher counters plus provider call, retry, timeout and latency metrics"""
+    return {
+        **form_analyzer.dispatcher.get_stats(),
+        "provider": form_analyzer.provider.get_stats()
+    }
+
 
 @app.post("/api/analyze-field")
 async def analyze_field(field_html: str, label_text: str, user_data: Dict):
@@ -135,70 +378,124 @@ async def analyze_field(field_html: str, label_text: str, user_data: Dict):
         }
 
 
+async def handle_ws_message(message: Dict[str, Any], reply):
+    """Handle one /ws message; runs concurrently with the connection's other messages"""
+
+    action = message.get('action')
+
+    if action == 'analyze_form':
+        # Real-time form analysis: each field_mapping/instruction is sent as
+        # soon as it is known, then the full form_analysis as before.
+        # The fill session exists from the start, so fields the client fills
+        # while the analysis is still streaming are recorded in it
+        session = fill_sessions.create()
+        await reply({
+            "type": "fill_session",
+            "data": {"session_id": session.session_id}
+        })
+        try:
+            async for event_type, event_data in form_analyzer.analyze_form_events(
+                html=message.get('html'),
+                url=message['url'],
+                user_profile=message['user_profile'],
+                fields=message.get('fields')
+            ):
+                if event_type == 'field_mapping':
+                    session.add([event_data])
+                elif event_type == 'form_analysis':
+                    # Fallback results arrive only here
+                    session.add(event_data.get('field_mappings', []))
+                    event_data = {**event_data, "session_id": session.session_id}
+                await reply({
+                    "type": event_type,
+                    "data": event_data
+                })
+        except BaseException:
+            fill_sessions.remove(session.session_id)
+            raise
+
+    elif action == 'get_next_action':
+        # Get next filling action
+        if 'session_id' in message:
+            # Delta form: just the fields filled since the last message
+            session = fill_sessions.get(message['session_id'])
+            if session is None:
+                raise ValueError(f"Unknown or expired fill session {message['session_id']}")
+            session.mark_filled(message.get('filled', []))
+            next_action = {**session.next_action(), **session.progress()}
+        else:
+            # Older clients send the whole state every time
+            next_action = await form_analyzer.get_next_filling_action(
+                current_state=message['current_state'],
+                filled_fields=message['filled_fields']
+            )
+        await reply({
+            "type": "next_action",
+            "data": next_action
+        })
+
+    elif action == 'field_filled':
+        # Acknowledge field was filled
+        if 'session_id' in message:
+            session = fill_sessions.get(message['session_id'])
+            if session is not None:
+                session.mark_filled([message['field_name']])
+        await reply({
+            "type": "ack",
+            "field": message['field_name'],
+            "status": "success"
+        })
+
+    elif action == 'error':
+        # Handle error - ask LLM for alternative approach
+        alternative = await form_analyzer.get_alternative_strategy(
+            error=message['error'],
+            field=message['field']
+        )
+        await reply({
+            "type": "alternative_strategy",
+            "data": alternative
+        })
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time form filling guidance
+    Messages are handled concurrently; replies echo the message's request_id
     """
     await websocket.accept()
     active_connections.append(websocket)
     print(f"🔌 WebSocket connected. Total connections: {len(active_connections)}")
 
+    async def send(payload: Dict[str, Any]):
+        await websocket.send_text(dumps_text(payload))
+
+    connection = ConnectionDispatcher.from_env(send, handle_ws_message)
+    connection.start()
+
     try:
         while True:
             # Receive message from extension
             data = await websocket.receive_text()
-            message = json.loads(data)
-
-            action = message.get('action')
-
-            if action == 'analyze_form':
-                # Real-time form analysis
-                response = await form_analyzer.analyze_form(
-                    html=message['html'],
-                    url=message['url'],
-                    user_profile=message['user_profile']
-                )
-                await websocket.send_json({
-                    "type": "form_analysis",
-                    "data": response
-                })
-
-            elif action == 'get_next_action':
-                # Get next filling action
-                next_action = await form_analyzer.get_next_filling_action(
-                    current_state=message['current_state'],
-                    filled_fields=message['filled_fields']
-                )
-                await websocket.send_json({
-                    "type": "next_action",
-                    "data": next_action
-                })
+            try:
+                message = json.loads(data)
+            except json.JSONDecodeError:
+                message = None
+            if not isinstance(message, dict):
+                await connection.send({"type": "error", "error": "Invalid message"})
+                continue
 
-            elif action == 'field_filled':
-                # Acknowledge field was filled
-                await websocket.send_json({
-                    "type": "ack",
-                    "field": message['field_name'],
-                    "status": "success"
-                })
-
-            elif action == 'error':
-                # Handle error - ask LLM for alternative approach
-                alternative = await form_analyzer.get_alternative_strategy(
-                    error=message['error'],
-                    field=message['field']
-                )
-                await websocket.send_json({
-                    "type": "alternative_strategy",
-                    "data": alternative
-                })
+            # Blocks while this connection's queue is full
+            await connection.submit(message)
 
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
-        print(f"🔌 WebSocket disconnected. Total connections: {len(active_connections)}")
+        print(f"🔌 WebSocket disconnected. Total connections: {len(active_connections) - 1}")
     except Exception as e:
         print(f"❌ WebSocket error: {str(e)}")
+    finally:
+        # Drop queued messages and cancel in-flight LLM work for this socket
+        await connection.close()
         if websocket in active_connections:
             active_connections.remove(websocket)
 
@@ -235,6 +532,46 @@ async def smart_dropdown_selection(
         }
 
 
+class DropdownItem(BaseModel):
+    options: List[str]
+    desired_value: str
+    context: str = ""
+
+
+class DropdownBatchRequest(BaseModel):
+    items: List[DropdownItem]
+
+
+@app.post("/api/smart-dropdown/batch")
+async def smart_dropdown_batch(request: DropdownBatchRequest):
+    """
+    Resolve every dropdown of a form in one LLM round-trip
+    Returns one selection per item, in request order
+    """
+    try:
+        selections = await form_analyzer.select_dropdown_options(
+            [item.dict() for item in request.items]
+        )
+
+        return {
+            "success": True,
+            "selections": [
+                {
+                    "selected_option": selected['option'],
+                    "confidence": selected['confidence'],
+                    "reasoning": selected['reasoning']
+                }
+                for selected in selections
+            ]
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 class ChatRequest(BaseModel):
     message: str
     page_url: str
@@ -277,27 +614,6 @@ async def chat_with_page(request: ChatRequest):
         }
 
 
-if __name__ == "__main__":
-    import uvicorn
-
-    port = int(os.getenv("PORT", 8000))
-
-    print("=" * 60)
-    print("🚀 Dynamic Form Filler Backend Server")
-    print("=" * 60)
-    print(f"📡 HTTP API: http://localhost:{port}")
-    print(f"🔌 WebSocket: ws://localhost:{port}/ws")
-    print(f"📚 API Docs: http://localhost:{port}/docs")
-    print("=" * 60)
-
-    uvicorn.run(
-        "server:app",
-        host="0.0.0.0",
-        port=port,
-        reload=True,
-        log_level="info"
-    )
-
 # Translation endpoint
 class TranslateRequest(BaseModel):
     text: str
@@ -308,9 +624,6 @@ class TranslateRequest(BaseModel):
 async def translate_text(request: TranslateRequest):
     """Translate using DeepL"""
     try:
-        from deepl_translator import DeepLTranslator
-        translator = DeepLTranslator()
-        
         translated = await translator.translate(
             text=request.text,
             source_lang=request.source_lang,
@@ -327,3 +640,25 @@ async def translate_text(request: TranslateRequest):
             "error": str(e),
             "translated_text": request.text
         }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.getenv("PORT", 8000))
+
+    print("=" * 60)
+    print("🚀 Dynamic Form Filler Backend Server")
+    print("=" * 60)
+    print(f"📡 HTTP API: http://localhost:{port}")
+    print(f"🔌 WebSocket: ws://localhost:{port}/ws")
+    print(f"📚 API Docs: http://localhost:{port}/docs")
+    print("=" * 60)
+
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=port,
+        reload=True,
+        log_level="info"
+    )
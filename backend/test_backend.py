@@ -4,6 +4,7 @@ Test script to verify backend is working correctly
 
 import asyncio
 import json
+import pytest
 from dedalus_labs import AsyncDedalus, DedalusRunner
 from form_analyzer import FormAnalyzer
 
@@ -118,6 +119,671 @@ async def test_dropdown_selection():
         return False
 
 
+async def test_translation_cache_and_batching():
+    """Test DeepL translation caching and batching against a local stub server"""
+    print("\n4️⃣  Testing translation cache and batching (stub DeepL)...")
+
+    from aiohttp import web
+    from deepl_translator import DeepLTranslator
+    from translation_cache import TranslationCache
+
+    upstream_calls = []
+
+    async def stub_translate(request):
+        form = await request.post()
+        texts = form.getall('text')
+        upstream_calls.append(texts)
+        return web.json_response({
+            "translations": [{"detected_source_language": form['source_lang'], "text": f"EN:{text}"} for text in texts]
+        })
+
+    app = web.Application()
+    app.router.add_post('/v2/translate', stub_translate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    translator = DeepLTranslator(
+        api_key="test-key",
+        api_url=f"http://127.0.0.1:{port}/v2/translate",
+        cache=TranslationCache(max_entries=100)
+    )
+
+    try:
+        await translator.start()
+
+        # Concurrent phrases for one language pair share a single upstream call
+        phrases = ["sí", "siguiente campo", "gracias", "sí"]
+        results = await asyncio.gather(*(translator.translate(p, "es") for p in phrases))
+        assert results == [f"EN:{p}" for p in phrases], results
+        assert len(upstream_calls) == 1, upstream_calls
+        assert sorted(upstream_calls[0]) == sorted(set(phrases)), upstream_calls
+
+        # Repeats are served from the cache without another upstream call
+        assert await translator.translate("gracias", "es") == "EN:gracias"
+        assert len(upstream_calls) == 1, upstream_calls
+
+        # A different language pair is never mixed into the same request
+        await asyncio.gather(translator.translate("oui", "fr"), translator.translate("ja", "de"))
+        assert len(upstream_calls) == 3, upstream_calls
+
+        stats = translator.get_stats()
+        print(f"   ✅ {len(phrases) + 3} translations, {len(upstream_calls)} upstream calls")
+        print(f"   📊 Cache hits: {stats['cache']['hits']}, batches: {stats['batching']['batches']}")
+        return True
+
+    except Exception as e:
+        print(f"   ❌ Translation cache/batching failed: {repr(e)}")
+        return False
+
+    finally:
+        await translator.close()
+        await runner.cleanup()
+
+
+def test_form_cache_user_isolation():
+    """A cached analysis never hands one user's values to another"""
+    print("\n5️⃣  Testing form cache isolation between users...")
+
+    from form_cache import FormStructureCache
+    from form_parser import parse_form_html
+
+    parser = parse_form_html("""
+    <form>
+        <input id="firstName" name="firstName">
+        <input id="fullName" name="fullName">
+        <textarea id="why" name="why"></textarea>
+        <select id="newsletter" name="newsletter"><option>Yes</option><option>No</option></select>
+        <select id="remote" name="remote"><option>Yes</option><option>No</option></select>
+    </form>
+    """)
+    profile_a = {"personalInfo": {"firstName": "John", "lastName": "Doe"}, "preferences": {"relocate": "Yes"}}
+    profile_b = {"personalInfo": {"firstName": "Alice", "lastName": "Smith"}, "preferences": {"relocate": "No"}}
+
+    # As the LLM returns it for profile A: one value with its profile path, two composed
+    # from it, and a constant answer that merely equals another profile value
+    analysis = {
+        "form_type": "job_application",
+        "confidence": 0.9,
+        "field_mappings": [
+            {"field_purpose": "first_name", "selector": "#firstName", "user_data_path": "personalInfo.firstName",
+             "value": "John", "field_type": "text"},
+            {"field_purpose": "full_name", "selector": "#fullName", "value": "John Doe", "field_type": "text"},
+            {"field_purpose": "motivation", "selector": "#why", "value": "I, John Doe, love this job", "field_type": "textarea"},
+            {"field_purpose": "newsletter", "selector": "#newsletter", "field_type": "select"},
+            {"field_purpose": "remote", "selector": "#remote", "value": "Yes", "field_type": "select"},
+        ],
+        "instructions": [
+            {"step": 1, "action": "fill", "selector": "#firstName", "value": "John"},
+            {"step": 2, "action": "fill", "selector": "#fullName", "value": "John Doe"},
+            {"step": 3, "action": "fill", "selector": "#why", "value": "I, John Doe, love this job"},
+            {"step": 4, "action": "select", "selector": "#remote", "value": "Yes"},
+        ],
+    }
+
+    cache = FormStructureCache(max_entries=10)
+    key = cache.make_key(parser, profile_a)
+    cache.put(key, parser, analysis, profile_a)
+
+    # Same structure and profile schema, different user
+    assert cache.make_key(parser, profile_b) == key
+    filled = cache.fill(cache.get(key), parser, profile_b)
+    assert "John" not in json.dumps(filled), filled
+    assert [(m['selector'], m.get('value')) for m in filled['field_mappings']] == [
+        ("#firstName", "Alice"), ("#newsletter", None)
+    ], filled['field_mappings']
+    assert [(i['step'], i['value']) for i in filled['instructions']] == [(1, "Alice")], filled['instructions']
+
+    # Hash-first lookups get the same entry with slots instead of values
+    slots = cache.fill(cache.get(key), parser, None)
+    assert "John" not in json.dumps(slots), slots
+    assert cache.get_stats()["dropped_values"] == 3
+
+    print("   ✅ Profile B got its own values; A's composed and unattributed values were not cached")
+
+
+def test_ats_detection_skips_generic_pages():
+    """Generic pages are not identified as an ATS; unfilled template fields fall through; stale versions miss"""
+    print("\n6️⃣  Testing ATS detection on a generic page...")
+
+    import os
+    from ats_detector import ATSRegistry
+    from form_analyzer import FormAnalyzer
+    from form_parser import parse_form_html
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, 'test-form.html'), encoding='utf-8') as f:
+        parser = parse_form_html(f.read())
+
+    registry = ATSRegistry()
+    assert registry.detect("http://example.com/apply", parser) is None
+    assert registry.get_stats()["unrecognized"] == 1
+
+    # The platform's own markup is still recognized
+    oneclick = parse_form_html("""
+    <form id="oneclick-form">
+        <input id="first-name-input"><input id="last-name-input"><input id="email-input">
+        <input type="checkbox" id="sponsorship-input">
+    </form>
+    """)
+    template = registry.detect("https://example.com/careers", oneclick)
+    assert template is not None and template.platform == "smartrecruiters", template
+
+    # Fields without a profile value go on to the rules tier/LLM instead of being swallowed
+    analyzer = FormAnalyzer.__new__(FormAnalyzer)
+    analyzer.rules_threshold = 0.85
+    profile = {"personalInfo": {"firstName": "Jane"}}
+    triage = analyzer._triage_parser(oneclick, profile, template)
+    assert triage["template"] == 1, triage
+    assert [m["value"] for m in triage["mappings"]] == ["Jane"], triage["mappings"]
+    assert triage["rules"] == 2, triage
+    assert "sponsorship-input" in triage["blocks"][0][0], triage["blocks"]
+
+    # Cached analyses built with an older template version are rejected
+    from form_cache import FormStructureCache
+    cache = FormStructureCache(max_entries=10)
+    analysis = {"field_mappings": [{"selector": "#first-name-input", "user_data_path": "personalInfo.firstName"}],
+                "instructions": [], "ats": template.describe()}
+    key = cache.make_key(oneclick, profile)
+    cache.put(key, oneclick, analysis, profile)
+    assert cache.get(key, registry.is_current) is not None
+    registry.templates["smartrecruiters"].version += 1
+    assert cache.get(key, registry.is_current) is None
+    assert cache.get(key) is None and cache.get_stats()["stale"] == 1
+
+    print("   ✅ test-form.html is not an ATS page; unfilled template fields reach the LLM")
+
+
+def test_parser_choice_labels():
+    """Text after a checkbox/radio labels it instead of the next field"""
+    print("\n8️⃣  Testing labels that follow checkboxes and radios...")
+
+    from form_parser import StreamingFormParser, parse_form_html
+
+    html = """
+    <form>
+        <div><input type="checkbox" name="terms"> I agree to the terms</div>
+        <div><input type="text" name="referrer"></div>
+        <input type="checkbox" id="news"><label for="news">Send me news</label>
+        <input type="text" name="nickname">
+        <p>Relocate?</p>
+        <input type="radio" name="relocate" value="y"> Yes
+        <input type="radio" name="relocate" value="n"> No
+        <div><input type="checkbox" name="sms"></div>
+        <h3>Phone</h3>
+        <input type="tel" name="phone">
+    </form>
+    """
+    expected = [
+        ("terms", "I agree to the terms"), ("referrer", None),
+        ("news", "Send me news"), ("nickname", None),
+        ("relocate", "Yes"), ("relocate", "No"),
+        ("sms", None), ("phone", "Phone"),
+    ]
+
+    labels = [(f['name'] or f['id'], f['label']) for f in parse_form_html(html).forms[0]['fields']]
+    assert labels == expected, labels
+
+    # Same labels when the page arrives in small chunks
+    streaming = StreamingFormParser()
+    fields = []
+    for start in range(0, len(html), 7):
+        fields.extend(field for _, field in streaming.feed_chunk(html[start:start + 7]))
+    fields.extend(field for _, field in streaming.finish())
+    assert [(f['name'] or f['id'], f['label']) for f in fields] == expected
+
+    print("   ✅ Trailing checkbox/radio text stays with its own field")
+
+
+def test_form_cache_selector_rewrite():
+    """Cached selectors follow random ids by whole token, not by substring"""
+    print("\n9️⃣  Testing cached selector rewriting...")
+
+    from form_cache import FormStructureCache
+    from form_parser import parse_form_html
+
+    # One id is a prefix of the other, and both change on the next page load
+    form = '<form><input id="f_{}" name="email"><input id="f_{}" name="phone"></form>'
+    first, second = parse_form_html(form.format(123, 1234)), parse_form_html(form.format(555, 9876))
+    profile = {"personalInfo": {"email": "a@example.com", "phone": "555 0100"}}
+    analysis = {
+        "field_mappings": [
+            {"selector": "#f_123", "user_data_path": "personalInfo.email", "value": "a@example.com"},
+            {"selector": "#f_1234", "user_data_path": "personalInfo.phone", "value": "555 0100"},
+            {"selector": "input[name='email']", "user_data_path": "personalInfo.email", "value": "a@example.com"},
+        ],
+        "instructions": [],
+    }
+
+    cache = FormStructureCache(max_entries=10)
+    key = cache.make_key(first, profile)
+    cache.put(key, first, analysis, profile)
+    assert cache.make_key(second, profile) == key
+
+    filled = cache.fill(cache.get(key), second, profile)
+    assert [m['selector'] for m in filled['field_mappings']] == [
+        "#f_555", "#f_9876", "input[name='email']"
+    ], filled['field_mappings']
+
+    print("   ✅ Selectors rewritten by exact id")
+
+
+def test_form_cache_sqlite_tier():
+    """The SQLite tier survives restarts, purges expired rows and takes concurrent async use"""
+    print("\n🔟 Testing the form cache's SQLite tier...")
+
+    import os
+    import sqlite3
+    import tempfile
+    import time
+    from form_cache import FormStructureCache
+    from form_parser import parse_form_html
+
+    profile = {"personalInfo": {"email": "a@example.com"}}
+    parsers = [parse_form_html(f'<form><input id="q{i}" name="email"></form>') for i in range(20)]
+    analysis = {"field_mappings": [{"selector": "#q", "user_data_path": "personalInfo.email"}], "instructions": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = FormStructureCache(max_entries=5, ttl_seconds=60, db_path=db_path)
+
+        async def exercise():
+            keys = [cache.make_key(parser, profile) for parser in parsers]
+            await asyncio.gather(*(cache.aput(key, parser, analysis, profile) for key, parser in zip(keys, parsers)))
+            # Only 5 fit in memory; the rest come back from disk in worker threads
+            found = await asyncio.gather(*(cache.aget(key) for key in keys))
+            return keys, found
+
+        keys, found = asyncio.run(exercise())
+        assert all(entry is not None for entry in found)
+        assert cache.get_stats()["disk_hits"] >= 15, cache.get_stats()
+
+        # A row older than the TTL is deleted when the cache opens
+        with sqlite3.connect(db_path) as db:
+            db.execute("UPDATE form_cache SET created = ? WHERE key = ?", (time.time() - 120, keys[0]))
+        reopened = FormStructureCache(max_entries=5, ttl_seconds=60, db_path=db_path)
+        assert reopened.get_stats()["purged"] == 1
+        assert reopened.get(keys[0]) is None and reopened.get(keys[1]) is not None
+
+    print("   ✅ Disk entries served across restarts; expired rows purged")
+
+
+def test_micro_batcher_failed_flush():
+    """Submitters never hang when a batch flush is cancelled or fails"""
+    print("\n1️⃣1️⃣ Testing micro-batcher flush failures...")
+
+    from micro_batcher import MicroBatcher
+
+    async def exercise():
+        async def slow(items):
+            await asyncio.sleep(10)
+            return items
+
+        batcher = MicroBatcher(slow, window=0.001)
+        submits = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert len(batcher._flushing) == 1  # the in-flight flush is referenced
+        for task in list(batcher._flushing):
+            task.cancel()
+        cancelled = await asyncio.wait_for(asyncio.gather(*submits, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in cancelled), cancelled
+        assert not batcher._flushing
+
+        async def short(items):
+            return items[:-1]
+
+        batcher = MicroBatcher(short, window=0.001)
+        failed = await asyncio.gather(*(batcher.submit(i) for i in range(2)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in failed), failed
+
+    asyncio.run(exercise())
+    print("   ✅ Cancelled and short flushes resolve every submitter")
+
+
+def test_option_matcher_range_markers():
+    """Range markers keep "5+ years" from matching or recalling "5 years" exactly"""
+    print("\n1️⃣2️⃣ Testing dropdown range markers...")
+
+    from option_matcher import OptionIndexCache, match_option, normalize_option
+
+    options = ['0-1 years', '1-3 years', '3-5 years', '5+ years', '10+ years']
+    assert normalize_option('5+ Years') != normalize_option('5 years')
+    assert normalize_option('< 1 year') != normalize_option('1 year')
+    assert match_option(options, '5+ years')['reasoning'] == 'Exact match'
+    for desired in ['5 years', '10 years']:
+        match = match_option(options, desired)
+        assert match['confidence'] < 1.0, (desired, match)
+
+    cache = OptionIndexCache()
+    cache.remember(options, '5+ years', {'option': '5+ years', 'confidence': 0.9})
+    assert cache.match(options, '5 years').get('remembered') is None
+    assert cache.match(options, '5+ years')['remembered'] is True
+
+    # Unsure LLM picks are not remembered, and a recalled pick is judged again
+    from llm_providers import create_provider
+    analyzer = FormAnalyzer(provider=create_provider('stub'))
+    analyzer._normalize_selection({'selected_option': '3-5 years', 'confidence': 0.4}, options, 'four')
+    assert analyzer._match_dropdown(options, 'four') is None
+    analyzer._normalize_selection({'selected_option': '3-5 YEARS ', 'confidence': 0.9}, options, 'four')
+    assert analyzer._match_dropdown(options, 'four')['option'] == '3-5 years'
+    analyzer.option_index.remember(options, 'four', {'option': '3-5 years', 'confidence': 0.4})
+    assert analyzer._match_dropdown(options, 'four') is None
+    print("   ✅ Ranged options only match exactly on the same range; unsure picks are not reused")
+
+
+def test_llm_dispatcher_priority_and_coalescing():
+    """Queued calls run by priority; identical prompts share one call that outlives a cancelled caller"""
+    print("\n1️⃣3️⃣ Testing LLM dispatcher priority, coalescing and cancellation...")
+
+    from llm_dispatcher import LLMDispatcher, Priority
+
+    async def exercise():
+        started = []
+        gate = asyncio.Event()
+
+        async def call(prompt, **kwargs):
+            started.append(prompt)
+            await gate.wait()
+            return prompt.upper()
+
+        dispatcher = LLMDispatcher(call, max_concurrency=1)
+
+        # One slot: later calls queue and are served interactive first, then standard, then bulk
+        first = asyncio.ensure_future(dispatcher.submit('first'))
+        await asyncio.sleep(0.01)
+        queued = [
+            asyncio.ensure_future(dispatcher.submit(prompt, priority))
+            for prompt, priority in [('bulk', Priority.BULK), ('standard', Priority.STANDARD), ('chat', Priority.INTERACTIVE)]
+        ]
+        await asyncio.sleep(0.01)
+        assert dispatcher.get_stats()['queued'] == 3
+        gate.set()
+        assert await asyncio.gather(first, *queued) == ['FIRST', 'BULK', 'STANDARD', 'CHAT']
+        assert started == ['first', 'chat', 'standard', 'bulk'], started
+
+        # The caller that started a shared call is cancelled; the other still gets the result
+        gate.clear()
+        started.clear()
+        leader = asyncio.ensure_future(dispatcher.submit('same', max_tokens=10))
+        follower = asyncio.ensure_future(dispatcher.submit('same', max_tokens=10))
+        await asyncio.sleep(0.01)
+        assert dispatcher.stats['coalesced'] == 1
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        assert await asyncio.wait_for(follower, 1) == 'SAME'
+        assert started == ['same']
+
+        # Once nobody is waiting the call is cancelled and its slot freed
+        gate.clear()
+        lone = asyncio.ensure_future(dispatcher.submit('lone'))
+        await asyncio.sleep(0.01)
+        lone.cancel()
+        await asyncio.gather(lone, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert not dispatcher._in_flight
+        assert dispatcher.get_stats()['in_flight'] == 0
+
+    asyncio.run(exercise())
+    print("   ✅ Priority order held; shared calls survive a cancelled caller and stop when unwanted")
+
+
+def test_ws_dispatch_close_keeps_shared_work():
+    """Closing one connection cancels its own work but not an LLM call another connection shares"""
+    print("\n1️⃣4️⃣ Testing WebSocket dispatch on close...")
+
+    from llm_dispatcher import LLMDispatcher
+    from ws_dispatch import ConnectionDispatcher
+
+    async def exercise():
+        calls = []
+
+        async def call(prompt, **kwargs):
+            calls.append(prompt)
+            await asyncio.sleep(0.05)
+            return f"ok:{prompt}"
+
+        llm = LLMDispatcher(call)
+
+        async def handler(message, reply):
+            if message.get('action') == 'boom':
+                raise RuntimeError("bad message")
+            if message.get('action') == 'cancelled':
+                # e.g. a shared task cancelled elsewhere, not this connection closing
+                raise asyncio.CancelledError()
+            await reply({"result": await llm.submit(message['prompt'])})
+
+        sent = {'a': [], 'b': []}
+
+        async def send_a(payload):
+            sent['a'].append(payload)
+
+        async def send_b(payload):
+            sent['b'].append(payload)
+
+        a = ConnectionDispatcher(send_a, handler)
+        # One worker, so later replies show it survived the failures
+        b = ConnectionDispatcher(send_b, handler, max_concurrency=1)
+        a.start()
+        b.start()
+        await a.submit({"prompt": "same", "request_id": 1})
+        await asyncio.sleep(0.01)
+        await b.submit({"prompt": "same", "request_id": 2})
+        await b.submit({"action": "cancelled", "request_id": 3})
+        await b.submit({"action": "boom", "request_id": 4})
+        await b.submit({"prompt": "other", "request_id": 5})
+        await asyncio.sleep(0.01)
+        await a.close()
+        await asyncio.sleep(0.2)
+        await b.close()
+
+        assert sent['a'] == []
+        assert {"result": "ok:same", "request_id": 2} in sent['b'], sent['b']
+        assert sent['b'][1:] == [
+            {"type": "error", "action": "cancelled", "error": "CancelledError", "request_id": 3},
+            {"type": "error", "action": "boom", "error": "bad message", "request_id": 4},
+            {"result": "ok:other", "request_id": 5},
+        ], sent['b']
+        assert calls == ['same', 'other']
+        assert a.get_stats()['cancelled'] == 1
+        assert b.get_stats()['completed'] == 2 and b.get_stats()['errors'] == 2
+
+    asyncio.run(exercise())
+    print("   ✅ Shared call finished for the open connection; failures are replied and the worker keeps serving")
+
+
+def test_fill_session_deltas():
+    """Sessions queue each field once, in order, and the store expires and evicts old sessions"""
+    print("\n1️⃣5️⃣ Testing fill sessions...")
+
+    from fill_session import FillSessionStore
+
+    store = FillSessionStore(max_sessions=2, ttl_seconds=3600)
+    session = store.create([{"selector": "#a", "value": "1"}])
+    # Streamed mappings arrive one by one, then again in the final analysis
+    session.add([{"selector": "#b", "value": "2", "field_type": "select"}])
+    session.mark_filled(["#a"])
+    session.add([{"selector": "#a", "value": "stale"}, {"selector": "#b", "value": "dup"}, {"selector": "#c"}, {}])
+    assert list(session.pending) == ["#b", "#c"]
+    assert session.next_action() == {"action": "fill", "selector": "#b", "value": "2", "field_type": "select"}
+    session.mark_filled(["#b", "#c"])
+    assert session.next_action()["action"] == "complete"
+    assert session.progress() == {"filled": 3, "pending": 0}
+
+    assert store.get(session.session_id) is session
+    assert store.get("unknown") is None and store.get(None) is None
+    newer = store.create()
+    store.get(session.session_id)  # refreshes it, so the other one is the oldest
+    store.create()
+    assert store.get(newer.session_id) is None and store.get_stats()["evictions"] == 1
+
+    store.ttl_seconds = 0
+    store.create()
+    assert store.get(session.session_id) is None and store.get_stats()["expired"] >= 1
+    print("   ✅ Duplicates skipped, fill order kept, idle and excess sessions dropped")
+
+
+def test_json_stream_chunking():
+    """Streamed elements match a whole parse however the output is split"""
+    print("\n1️⃣6️⃣ Testing incremental JSON parsing...")
+
+    import random
+    from json_stream import JSONArrayStreamer
+
+    document = {
+        "form_type": "job_application",
+        "field_mappings": [
+            {"selector": "#a", "value": 'quote " brace } bracket ] {"x": [1]}', "nested": {"list": [{"k": 1}]}},
+            {"selector": "#b", "value": "back\\slash \\\" and unicode é ✓"},
+            {"selector": "#big", "value": "x" * 200000},
+        ],
+        "instructions": [{"step": 1, "selector": "#a"}],
+        "notes": {"field_mappings": [{"selector": "#not-top-level"}]},
+    }
+    text = "Here is the analysis:\n```json\n" + json.dumps(document, ensure_ascii=False) + "\n```"
+
+    rng = random.Random(7)
+    for _ in range(20):
+        streamer = JSONArrayStreamer()
+        found, pos = [], 0
+        while pos < len(text):
+            size = rng.choice([1, 2, 3, 17, 500, 65536])
+            found.extend(streamer.feed(text[pos:pos + size]))
+            pos += size
+        assert found == [("field_mappings", m) for m in document["field_mappings"]] + [
+            ("instructions", document["instructions"][0])
+        ]
+        assert streamer.text == text
+        # Only the unfinished part is carried between chunks
+        assert len(streamer._buffer) < 1000
+
+    print("   ✅ Same elements for every chunking, including a 200 KB string")
+
+
+def test_request_body_limits():
+    """Compressed bodies are bounded before and while they are read, and after inflating"""
+    print("\n1️⃣7️⃣ Testing compressed request limits...")
+
+    import gzip
+    from request_encoding import DecompressRequestMiddleware
+
+    async def echo(scope, receive, send):
+        message = await receive()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': scope['headers']})
+        await send({'type': 'http.response.body', 'body': message['body']})
+
+    middleware = DecompressRequestMiddleware(echo, max_size=1000, max_compressed_size=100)
+
+    async def post(headers, chunks):
+        messages = [
+            {'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+            for index, chunk in enumerate(chunks)
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware({'type': 'http', 'headers': headers}, receive, send)
+        return sent[0]['status'], b''.join(message.get('body', b'') for message in sent[1:])
+
+    body = gzip.compress(b'{"url": "x"}')
+    gz = [(b'content-encoding', b'gzip')]
+
+    async def exercise():
+        assert await post(gz + [(b'content-length', str(len(body)).encode())], [body[:5], body[5:]]) == (200, b'{"url": "x"}')
+        # Declared too large: refused before reading
+        assert (await post(gz + [(b'content-length', b'5000')], []))[0] == 413
+        assert (await post(gz + [(b'content-length', b'lots')], []))[0] == 400
+        # Chunked, or a Content-Length that lies: the running total is enforced
+        assert (await post(gz, [b'x' * 60, b'x' * 60]))[0] == 413
+        assert (await post(gz + [(b'content-length', b'10')], [b'x' * 60, b'x' * 60]))[0] == 413
+        # Zip bomb, corrupt and unsupported bodies
+        assert (await post(gz, [gzip.compress(b'0' * 5000)]))[0] == 413
+        assert (await post(gz, [body[:-8]]))[0] == 400
+        assert (await post([(b'content-encoding', b'br')], [b'']))[0] == 415
+
+    asyncio.run(exercise())
+    print("   ✅ 413 for oversized bodies, 400 for bad lengths and streams, 415 for unknown encodings")
+
+
+def test_compact_response_roundtrip():
+    """The compact analysis shape expands back to the full one"""
+    print("\n1️⃣8️⃣ Testing compact analysis responses...")
+
+    from response_format import compact_analysis, dumps, expand_analysis
+
+    analysis = {
+        "success": True,
+        "form_type": "job_application",
+        "field_mappings": [
+            {"field_purpose": "email", "selector": "#email", "value": "a@b.co", "confidence": 0.9, "source": "rules"},
+            {"field_purpose": "consent", "selector": "#consent", "value": "true", "field_type": "checkbox"},
+            {"field_purpose": "first_name", "selector": "#first", "user_data_path": "personalInfo.firstName"},
+            {"field_purpose": "country", "selector": "#country", "value": "Canada", "options": ["Canada", "USA"]},
+        ],
+        "instructions": [
+            {"step": 1, "action": "fill", "selector": "#email", "value": "a@b.co", "description": "Fill email"},
+            {"step": 2, "action": "check", "selector": "#consent", "value": "true", "description": "Fill consent"},
+            {"step": 3, "action": "fill", "selector": "#first", "user_data_path": "personalInfo.firstName",
+             "description": "Fill first_name"},
+            {"step": 4, "action": "select", "selector": "#country", "value": "Canada", "description": "Pick a country"},
+            {"step": 5, "action": "click", "selector": "#submit", "description": "Submit"},
+        ],
+    }
+
+    compact = compact_analysis(analysis)
+    assert compact["format"] == "compact-1"
+    assert compact["mapping_columns"] == [
+        "field_purpose", "selector", "user_data_path", "value", "confidence", "field_type", "source", "options"
+    ]
+    assert compact["instructions"][:3] == [[0, "fill"], [1, "check"], [2, "fill"]]
+    assert compact["instructions"][3] == [3, "select", {"description": "Pick a country"}]
+    assert compact["instructions"][4] == analysis["instructions"][4]
+    assert expand_analysis(compact) == analysis
+    assert len(dumps(compact)) < len(dumps(analysis))
+    print("   ✅ Rows and instruction references expand to the original analysis")
+
+
+# Default RULES_CONFIDENCE_THRESHOLD
+RULES_THRESHOLD = 0.85
+
+# (markup, purpose the rules tier must not fill it as)
+RULES_NEGATIVE_CASES = [
+    # Identifiers that only mention a school or degree want part of the education string
+    ('<input name="school_name">', 'education'),
+    ('<input name="college_major">', 'education'),
+    ('<input name="degree_type">', 'education'),
+    ('<input name="graduation_school">', 'education'),
+    ('<input id="universityName">', 'education'),
+    # Label keywords that are also common English words
+    ('<label for="f">Handy</label><input id="f">', 'phone'),
+    ('<label for="f">Land</label><input id="f">', 'country'),
+    ('<label for="f">Alter</label><input id="f">', 'age'),
+    ('<label for="f">Formation</label><input id="f">', 'education'),
+    ('<label for="f">Nombre</label><input id="f">', 'first_name'),
+    ('<label for="f">School name</label><input id="f">', 'education'),
+    ('<label for="f">Degree type</label><input id="f">', 'education'),
+]
+
+
+@pytest.mark.parametrize("markup, purpose", RULES_NEGATIVE_CASES)
+def test_rules_tier_negative(markup, purpose):
+    """Ambiguous names and labels are left to the LLM instead of filled by the rules tier"""
+    from field_rules import PROFILE_PATHS, classify_field
+    from form_parser import parse_form_html
+
+    field = parse_form_html(f"<form>{markup}</form>").forms[0]['fields'][0]
+    found, confidence = classify_field(field)
+    assert found != purpose or confidence < RULES_THRESHOLD, (markup, found, confidence)
+    assert not (found in PROFILE_PATHS and confidence >= RULES_THRESHOLD), (markup, found)
+
+
 async def main():
     """Run all tests"""
     print("=" * 60)
@@ -135,6 +801,124 @@ async def main():
     # Test 3: Dropdown selection
     results.append(await test_dropdown_selection())
 
+    # Test 4: Translation cache and batching (offline)
+    results.append(await test_translation_cache_and_batching())
+
+    # Test 5: Form cache isolation (offline)
+    try:
+        test_form_cache_user_isolation()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Form cache isolation failed: {repr(e)}")
+        results.append(False)
+
+    # Test 6: ATS detection (offline)
+    try:
+        test_ats_detection_skips_generic_pages()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ ATS detection failed: {repr(e)}")
+        results.append(False)
+
+    # Test 7: Rules tier leaves ambiguous fields to the LLM (offline)
+    print("\n7️⃣  Testing rules tier on ambiguous fields...")
+    try:
+        for markup, purpose in RULES_NEGATIVE_CASES:
+            test_rules_tier_negative(markup, purpose)
+        print(f"   ✅ {len(RULES_NEGATIVE_CASES)} ambiguous fields left to the LLM")
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Rules tier filled an ambiguous field: {repr(e)}")
+        results.append(False)
+
+    # Test 8: Parser labels for checkboxes and radios (offline)
+    try:
+        test_parser_choice_labels()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Checkbox/radio labels failed: {repr(e)}")
+        results.append(False)
+
+    # Test 9: Cached selector rewriting (offline)
+    try:
+        test_form_cache_selector_rewrite()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Cached selector rewriting failed: {repr(e)}")
+        results.append(False)
+
+    # Test 10: Form cache SQLite tier (offline; runs its own event loop)
+    try:
+        await asyncio.to_thread(test_form_cache_sqlite_tier)
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Form cache SQLite tier failed: {repr(e)}")
+        results.append(False)
+
+    # Test 11: Micro-batcher flush failures (offline; runs its own event loop)
+    try:
+        await asyncio.to_thread(test_micro_batcher_failed_flush)
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Micro-batcher flush failures: {repr(e)}")
+        results.append(False)
+
+    # Test 12: Dropdown range markers (offline)
+    try:
+        test_option_matcher_range_markers()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Dropdown range markers: {repr(e)}")
+        results.append(False)
+
+    # Test 13: LLM dispatcher priority and coalescing (offline; runs its own event loop)
+    try:
+        await asyncio.to_thread(test_llm_dispatcher_priority_and_coalescing)
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ LLM dispatcher: {repr(e)}")
+        results.append(False)
+
+    # Test 14: WebSocket dispatch on close (offline; runs its own event loop)
+    try:
+        await asyncio.to_thread(test_ws_dispatch_close_keeps_shared_work)
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ WebSocket dispatch: {repr(e)}")
+        results.append(False)
+
+    # Test 15: Fill sessions (offline)
+    try:
+        test_fill_session_deltas()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Fill sessions: {repr(e)}")
+        results.append(False)
+
+    # Test 16: Incremental JSON parsing (offline)
+    try:
+        test_json_stream_chunking()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Incremental JSON parsing: {repr(e)}")
+        results.append(False)
+
+    # Test 17: Compressed request limits (offline; runs its own event loop)
+    try:
+        await asyncio.to_thread(test_request_body_limits)
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Compressed request limits: {repr(e)}")
+        results.append(False)
+
+    # Test 18: Compact analysis responses (offline)
+    try:
+        test_compact_response_roundtrip()
+        results.append(True)
+    except AssertionError as e:
+        print(f"   ❌ Compact analysis responses: {repr(e)}")
+        results.append(False)
+
     # Summary
     print("\n" + "=" * 60)
     print("📊 Test Summary")
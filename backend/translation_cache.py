@@ -0,0 +1,122 @@
+"""
+Cache for DeepL translations
+Voice users repeat the same short phrases, so (text, source, target) results
+are kept in an LRU with an optional SQLite tier
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class TranslationCache:
+    """LRU/TTL cache of translated text with an optional SQLite tier"""
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        ttl_seconds: float = 7 * 86400,
+        db_path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+        }
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translation_cache ("
+                "text TEXT NOT NULL, source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, "
+                "translated TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (text, source_lang, target_lang))"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "TranslationCache":
+        """Build cache from TRANSLATION_CACHE_* environment variables"""
+        return cls(
+            max_entries=int(os.getenv('TRANSLATION_CACHE_SIZE', 5000)),
+            ttl_seconds=float(os.getenv('TRANSLATION_CACHE_TTL', 7 * 86400)),
+            db_path=os.getenv('TRANSLATION_CACHE_DB') or None
+        )
+
+    @staticmethod
+    def make_key(text: str, source_lang: str, target_lang: str) -> Tuple[str, str, str]:
+        return text.strip(), source_lang.upper(), target_lang.upper()
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        """Return a cached translation or None"""
+        now = time.time()
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached:
+                created, translated = cached
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return translated
+                del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT translated, created FROM translation_cache "
+                "WHERE text = ? AND source_lang = ? AND target_lang = ?", key
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                with self._lock:
+                    self._store_memory(key, row[1], row[0])
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                return row[0]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: Tuple[str, str, str], translated: str):
+        created = time.time()
+
+        with self._lock:
+            self._store_memory(key, created, translated)
+
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translation_cache "
+                "(text, source_lang, target_lang, translated, created) VALUES (?, ?, ?, ?, ?)",
+                (*key, translated, created)
+            )
+            self._db.commit()
+
+    def _store_memory(self, key: Tuple[str, str, str], created: float, translated: str):
+        self._entries[key] = (created, translated)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current size"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "disk_enabled": self._db is not None,
+            }
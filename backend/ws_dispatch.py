@@ -0,0 +1,113 @@
+"""
+Per-connection message dispatch for the /ws WebSocket
+Messages run concurrently on a few workers instead of one at a time in the
+receive loop; replies carry the request_id of the message they answer
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class ConnectionDispatcher:
+    """
+    Bounded queue plus worker pool for one WebSocket connection.
+    submit() waits while the queue is full, so a client that floods the socket
+    stops being read (backpressure) instead of growing memory.
+    close() cancels queued and in-flight work. LLM calls shared with other
+    connections (identical prompts) keep running for them; a call is only
+    cancelled once nobody is waiting on it (LLMDispatcher.submit).
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        handler: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], Awaitable[None]]], Awaitable[None]],
+        max_concurrency: int = 4,
+        max_queued: int = 32
+    ):
+        self._send = send
+        self._handler = handler
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queued))
+        # Replies from concurrent handlers must not interleave on the socket
+        self._send_lock = asyncio.Lock()
+        self._workers: List[asyncio.Task] = []
+        self._active = 0
+        self._closed = False
+        self.stats = {"received": 0, "completed": 0, "errors": 0, "cancelled": 0}
+
+    @classmethod
+    def from_env(cls, send, handler) -> "ConnectionDispatcher":
+        """Build dispatcher from WS_* environment variables"""
+        return cls(
+            send,
+            handler,
+            max_concurrency=int(os.getenv('WS_MAX_CONCURRENCY', 4)),
+            max_queued=int(os.getenv('WS_MAX_QUEUED', 32))
+        )
+
+    def start(self):
+        for _ in range(self.max_concurrency):
+            self._workers.append(asyncio.ensure_future(self._work()))
+
+    async def submit(self, message: Dict[str, Any]):
+        """Queue a message; waits while the connection already has max_queued waiting"""
+        self.stats["received"] += 1
+        await self._queue.put(message)
+
+    async def send(self, payload: Dict[str, Any], request_id: Optional[Any] = None):
+        """Send one reply, tagged with the request it answers"""
+        if self._closed:
+            return
+        if request_id is not None:
+            payload = {**payload, "request_id": request_id}
+        async with self._send_lock:
+            await self._send(payload)
+
+    async def close(self):
+        """Cancel everything still queued or running for this connection"""
+        self._closed = True
+        self.stats["cancelled"] += self._queue.qsize() + self._active
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _work(self):
+        while True:
+            message = await self._queue.get()
+            request_id = message.get('request_id')
+
+            async def reply(payload: Dict[str, Any]):
+                await self.send(payload, request_id)
+
+            self._active += 1
+            try:
+                await self._handler(message, reply)
+                self.stats["completed"] += 1
+            except asyncio.CancelledError as e:
+                if self._closed:
+                    raise
+                # Not our close(): something the handler awaited was cancelled; keep the worker
+                await self._fail(message, reply, e)
+            except Exception as e:
+                await self._fail(message, reply, e)
+            finally:
+                self._active -= 1
+
+    async def _fail(self, message: Dict[str, Any], reply, error: BaseException):
+        self.stats["errors"] += 1
+        print(f"❌ WebSocket {message.get('action')} failed: {str(error) or type(error).__name__}")
+        try:
+            await reply({"type": "error", "action": message.get('action'), "error": str(error) or type(error).__name__})
+        except Exception:
+            pass  # socket already gone
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "active": self._active,
+            "queued": self._queue.qsize(),
+            "max_concurrency": self.max_concurrency,
+        }
@@ -10,7 +10,12 @@ class DynamicFormFiller {
     this.userData = null;
     this.currentAnalysis = null;
     this.filledFields = new Set();
+    this.dropdownChoices = new Map();
     this.isFilling = false;
+    this.streamingAnalysis = null;
+    this.fillQueue = Promise.resolve();
+    this.nextRequestId = 1;
+    this.fillSessionId = null;
 
     this.init();
   }
@@ -168,6 +173,10 @@ class DynamicFormFiller {
 
       this.ws.onclose = () => {
         console.log('🔌 WebSocket disconnected. Reconnecting in 3s...');
+        if (this.streamingAnalysis) {
+          this.streamingAnalysis.reject(new Error('Connection lost during analysis'));
+          this.streamingAnalysis = null;
+        }
         setTimeout(() => this.connectWebSocket(), 3000);
       };
     } catch (error) {
@@ -175,11 +184,56 @@ class DynamicFormFiller {
     }
   }
 
+  sendSocketMessage(payload) {
+    // Backend handles messages concurrently; replies echo this request_id
+    const requestId = this.nextRequestId++;
+    this.ws.send(JSON.stringify({ ...payload, request_id: requestId }));
+    return requestId;
+  }
+
   handleWebSocketMessage(message) {
+    // Streamed replies belong to the in-progress analyze_form request
+    const stream = this.streamingAnalysis && message.request_id === this.streamingAnalysis.requestId
+      ? this.streamingAnalysis
+      : null;
+
     switch (message.type) {
+      case 'fill_session':
+        // Sent before any mapping, so fills made while the analysis streams are recorded
+        this.fillSessionId = message.data.session_id || null;
+        break;
+
+      case 'field_mapping':
+        if (stream) {
+          stream.field_mappings.push(message.data);
+        }
+        break;
+
+      case 'instruction':
+        // Streamed analysis: fill each field as soon as its instruction arrives
+        if (stream) {
+          stream.instructions.push(message.data);
+          this.enqueueInstruction(stream, message.data);
+        }
+        break;
+
       case 'form_analysis':
         this.currentAnalysis = message.data;
+        // Server keeps fill progress under this id; later messages send only deltas
+        this.fillSessionId = message.data.session_id || null;
         console.log('📊 Received form analysis:', this.currentAnalysis);
+        if (stream) {
+          stream.resolve(message.data);
+          this.streamingAnalysis = null;
+        }
+        break;
+
+      case 'error':
+        console.error(`❌ Backend error (${message.action}):`, message.error);
+        if (stream) {
+          stream.reject(new Error(message.error));
+          this.streamingAnalysis = null;
+        }
         break;
 
       case 'next_action':
@@ -204,7 +258,11 @@ class DynamicFormFiller {
         break;
 
       case 'fillForm':
-        await this.fillFormIntelligently();
+        if (!this.currentAnalysis && this.ws && this.ws.readyState === WebSocket.OPEN) {
+          await this.fillFormStreaming();
+        } else {
+          await this.fillFormIntelligently();
+        }
         sendResponse({ success: true });
 
         // Notify popup that form was filled
@@ -247,32 +305,32 @@ class DynamicFormFiller {
     console.log('🔍 Detecting and analyzing form...');
 
     try {
-      // Extract complete form HTML and structure
-      const formData = this.extractFormStructure();
+      // Extract the form's fields (or, failing that, its HTML)
+      const formPayload = this.extractFormPayload();
 
-      if (!formData.html) {
+      if (!formPayload) {
         return {
           success: false,
           message: 'No form detected on this page'
         };
       }
 
-      // Send to backend for LLM analysis
-      const response = await fetch(`${this.backendUrl}/api/analyze-form`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          html: formData.html,
+      // A form the backend has seen is answered from its fingerprint alone;
+      // otherwise send it (compressed) for LLM analysis
+      let analysis = await this.lookupForm(formPayload);
+      if (!analysis) {
+        const response = await this.postJson('/api/analyze-form?compact=1', {
+          ...formPayload,
           url: window.location.href,
           user_profile: this.userData,
           screenshot: null // Could add screenshot here
-        })
-      });
-
-      const analysis = await response.json();
+        });
+        analysis = this.expandAnalysis(await response.json());
+      }
 
       if (analysis.success) {
         this.currentAnalysis = analysis;
+        this.fillSessionId = null;
 
         return {
           success: true,
@@ -297,6 +355,300 @@ class DynamicFormFiller {
     }
   }
 
+  extractFormPayload() {
+    /**
+     * What to send for analysis: compact field descriptors read from the DOM,
+     * or the raw form HTML for the server to parse when there are none
+     */
+    const fields = this.extractFieldDescriptors();
+    if (fields) {
+      return { fields };
+    }
+    const formData = this.extractFormStructure();
+    return formData.html ? { html: formData.html } : null;
+  }
+
+  async lookupForm(formPayload) {
+    /**
+     * Hash-first analysis: send only the fingerprint of the field descriptors
+     * and which profile paths have values. A known form comes back with
+     * user_data_path slots that are filled here from the local profile.
+     */
+    if (!formPayload.fields || !(window.crypto && crypto.subtle)) {
+      return null;
+    }
+
+    try {
+      const response = await fetch(`${this.backendUrl}/api/analyze-form/lookup?compact=1`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          fingerprint: await this.sha256Hex(JSON.stringify(formPayload.fields)),
+          profile_paths: this.profilePaths()
+        })
+      });
+      const result = this.expandAnalysis(await response.json());
+      if (!result.success || !result.found) {
+        return null;
+      }
+
+      console.log('⚡ Form recognized from its fingerprint');
+      for (const item of [...result.field_mappings, ...result.instructions]) {
+        if (item.user_data_path && item.value === undefined) {
+          item.value = this.profileValue(item.user_data_path);
+        }
+      }
+      return result;
+    } catch (error) {
+      console.warn('Form lookup failed, uploading the form instead:', error);
+      return null;
+    }
+  }
+
+  expandAnalysis(body) {
+    /**
+     * Rebuild the full analysis from the compact (?compact=1) shape: mappings
+     * are rows under mapping_columns, and an instruction is [mappingIndex,
+     * action, extras?] with its selector and value taken from that mapping
+     */
+    if (body.format !== 'compact-1') {
+      return body;
+    }
+
+    const columns = body.mapping_columns;
+    const mappings = body.field_mappings.map(row => {
+      const mapping = {};
+      columns.forEach((column, i) => {
+        if (row[i] !== null && row[i] !== undefined) {
+          mapping[column] = row[i];
+        }
+      });
+      return mapping;
+    });
+
+    const instructions = body.instructions.map((item, i) => {
+      if (!Array.isArray(item)) {
+        return item;
+      }
+      const [index, action, extras] = item;
+      const mapping = mappings[index];
+      const instruction = { action, selector: mapping.selector };
+      if ('value' in mapping) {
+        instruction.value = mapping.value;
+      } else if ('user_data_path' in mapping) {
+        instruction.user_data_path = mapping.user_data_path;
+      }
+      instruction.description = `Fill ${mapping.field_purpose || 'field'}`;
+      return { ...instruction, ...(extras || {}), step: i + 1 };
+    });
+
+    const { format, mapping_columns, ...rest } = body;
+    return { ...rest, field_mappings: mappings, instructions };
+  }
+
+  async postJson(path, payload) {
+    // Bodies worth it are gzip-compressed where the browser can do so natively
+    const json = JSON.stringify(payload);
+    const headers = { 'Content-Type': 'application/json' };
+    let body = json;
+
+    if (typeof CompressionStream !== 'undefined' && json.length > 1024) {
+      const compressed = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+      body = await new Response(compressed).arrayBuffer();
+      headers['Content-Encoding'] = 'gzip';
+    }
+
+    return fetch(`${this.backendUrl}${path}`, { method: 'POST', headers, body });
+  }
+
+  async sha256Hex(text) {
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+  }
+
+  profilePaths() {
+    // Dotted paths of profile values that are set, as the server's cache keys them
+    const paths = [];
+    const walk = (node, prefix) => {
+      for (const [key, value] of Object.entries(node || {})) {
+        const path = prefix ? `${prefix}.${key}` : key;
+        if (value && typeof value === 'object' && !Array.isArray(value)) {
+          walk(value, path);
+        } else if (Array.isArray(value) ? value.length > 0 : value) {
+          paths.push(path);
+        }
+      }
+    };
+    walk(this.userData, '');
+    return paths.sort();
+  }
+
+  profileValue(path) {
+    // Composite paths ("{personalInfo.city}, {personalInfo.state}") read several values
+    if (path.includes('{')) {
+      let missing = false;
+      const value = path.replace(/\{([^{}]+)\}/g, (_, ref) => {
+        const part = this.profileValue(ref);
+        missing = missing || !part;
+        return part;
+      });
+      return missing ? '' : value;
+    }
+    const value = path.split('.').reduce((node, key) => (node ? node[key] : undefined), this.userData);
+    if (Array.isArray(value)) {
+      return value.join(', ');
+    }
+    return value ? String(value) : '';
+  }
+
+  extractFieldDescriptors() {
+    /**
+     * The field records the server would otherwise parse out of the form HTML:
+     * { v: 1, forms: [{ attrs?, fields: [row, ...] }] }, one row per field in the
+     * server's DESCRIPTOR_KEYS order (form_parser.py)
+     */
+    const forms = document.querySelectorAll('form');
+    const groups = forms.length > 0
+      ? Array.from(forms, form => form.querySelectorAll('input, select, textarea'))
+      : [document.querySelectorAll('input, select, textarea')];
+
+    const payload = { v: 1, forms: [] };
+    let count = 0;
+    groups.forEach((fields, index) => {
+      const rows = Array.from(fields, field => this.describeField(field));
+      count += rows.length;
+      // Form id/action let the server recognize ATS platforms by their markup
+      const form = forms[index];
+      const attrs = {};
+      for (const name of ['id', 'action']) {
+        const value = form && form.getAttribute(name);
+        if (value) {
+          attrs[name] = value;
+        }
+      }
+      payload.forms.push(Object.keys(attrs).length > 0 ? { attrs, fields: rows } : { fields: rows });
+    });
+
+    return count > 0 ? payload : null;
+  }
+
+  describeField(element) {
+    const attr = name => element.getAttribute(name) || null;
+    const [label, labelSource] = this.findFieldLabel(element);
+
+    let dataAttrs = null;
+    for (const { name, value } of element.attributes) {
+      if (name.startsWith('data-')) {
+        dataAttrs = dataAttrs || {};
+        dataAttrs[name] = value;
+      }
+    }
+
+    const row = [
+      element.tagName.toLowerCase(),
+      attr('type') || 'text',
+      attr('name'),
+      attr('id'),
+      attr('placeholder'),
+      element.hasAttribute('required') ? 1 : null,
+      attr('role'),
+      attr('class'),
+      attr('aria-label'),
+      attr('autocomplete'),
+      label,
+      labelSource,
+      dataAttrs
+    ];
+
+    // Trailing nulls are implied
+    while (row.length > 0 && row[row.length - 1] === null) {
+      row.pop();
+    }
+    return row;
+  }
+
+  findFieldLabel(element) {
+    /**
+     * [text, source] resolved the way the server's HTML parser does:
+     * aria-labelledby, then <label for>, then a wrapping <label>, then nearby text
+     */
+    const labelledBy = element.getAttribute('aria-labelledby');
+    if (labelledBy) {
+      const text = labelledBy.split(/\s+/)
+        .map(id => document.getElementById(id))
+        .filter(Boolean)
+        .map(node => this.labelText(node))
+        .join(' ')
+        .trim();
+      if (text) {
+        return [text, 'aria'];
+      }
+    }
+
+    const labels = Array.from(element.labels || []);
+    const forLabel = labels.find(label => label.htmlFor && label.htmlFor === element.id);
+    for (const [label, source] of [[forLabel, 'for'], [labels.find(l => l !== forLabel), 'wrap']]) {
+      const text = label ? this.labelText(label) : '';
+      if (text) {
+        return [text, source];
+      }
+    }
+
+    // Checkboxes and radios are named by the text right after them ("[x] I agree")
+    if (this.isChoice(element)) {
+      for (let sibling = element.nextSibling; sibling; sibling = sibling.nextSibling) {
+        if (sibling.nodeType === Node.ELEMENT_NODE && sibling.matches('input, select, textarea')) {
+          break;
+        }
+        const text = this.labelText(sibling);
+        if (text) {
+          return [text, 'text'];
+        }
+      }
+    }
+
+    // Text just before the field, or before its wrapper, unless it names a preceding checkbox/radio
+    for (const node of [element, element.parentElement]) {
+      for (let sibling = node && node.previousSibling; sibling; sibling = sibling.previousSibling) {
+        if (sibling.nodeType === Node.ELEMENT_NODE && sibling.matches('input, select, textarea')) {
+          break;
+        }
+        const text = this.labelText(sibling);
+        if (text) {
+          let before = sibling.previousSibling;
+          while (before && !this.labelText(before) && !(before.nodeType === Node.ELEMENT_NODE && before.matches('input, select, textarea'))) {
+            before = before.previousSibling;
+          }
+          return before && this.isChoice(before) ? [null, null] : [text, 'text'];
+        }
+      }
+    }
+
+    return [null, null];
+  }
+
+  isChoice(node) {
+    return node.nodeType === Node.ELEMENT_NODE && node.matches('input[type="checkbox"], input[type="radio"]');
+  }
+
+  labelText(node) {
+    // Text of a node without the options or value of fields nested inside it
+    if (node.nodeType === Node.TEXT_NODE) {
+      return node.nodeValue.replace(/\s+/g, ' ').trim().slice(0, 200);
+    }
+    if (node.nodeType !== Node.ELEMENT_NODE || node.matches('select, textarea, script, style')) {
+      return '';
+    }
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    const parts = [];
+    while (walker.nextNode()) {
+      if (!walker.currentNode.parentElement.closest('select, textarea, script, style')) {
+        parts.push(walker.currentNode.nodeValue);
+      }
+    }
+    return parts.join(' ').replace(/\s+/g, ' ').trim().slice(0, 200);
+  }
+
   extractFormStructure() {
     /**
      * Extract complete form structure including:
@@ -357,6 +709,9 @@ class DynamicFormFiller {
     try {
       const instructions = this.currentAnalysis.instructions || [];
 
+      // Resolve all hard-to-match dropdowns in one backend round-trip
+      await this.prefetchDropdownChoices(instructions);
+
       for (const instruction of instructions) {
         await this.executeInstruction(instruction);
         await this.delay(800); // Reasonable delay between fields
@@ -373,6 +728,87 @@ class DynamicFormFiller {
     }
   }
 
+  async fillFormStreaming() {
+    /**
+     * Analyze and fill in one pass over the WebSocket: the backend streams
+     * each instruction as the LLM produces it, and filling starts right away
+     */
+
+    if (this.isFilling) {
+      console.log('Already filling form');
+      return;
+    }
+
+    const formPayload = this.extractFormPayload();
+    if (!formPayload) {
+      this.showNotification('No form detected on this page', 'warning');
+      return;
+    }
+
+    this.isFilling = true;
+    this.filledFields.clear();
+    this.fillQueue = Promise.resolve();
+
+    console.log('🎯 Starting streamed form filling...');
+    this.showNotification('Starting intelligent form fill...', 'info');
+
+    try {
+      const stream = { field_mappings: [], instructions: [], queued: new Set() };
+
+      // Returning visitors: a known form needs no upload and no LLM call
+      const known = await this.lookupForm(formPayload);
+      if (known) {
+        this.currentAnalysis = known;
+        this.fillSessionId = null;
+        for (const instruction of known.instructions) {
+          this.enqueueInstruction(stream, instruction);
+        }
+      } else {
+        const finished = new Promise((resolve, reject) => {
+          stream.resolve = resolve;
+          stream.reject = reject;
+        });
+        this.streamingAnalysis = stream;
+
+        stream.requestId = this.sendSocketMessage({
+          action: 'analyze_form',
+          ...formPayload,
+          url: window.location.href,
+          user_profile: this.userData
+        });
+
+        // The final analysis can carry instructions that were never streamed (fallback)
+        const analysis = await finished;
+        for (const instruction of analysis.instructions || []) {
+          this.enqueueInstruction(stream, instruction);
+        }
+      }
+      await this.fillQueue;
+
+      this.showNotification('Form filled successfully! 🎉', 'success');
+      console.log('✅ Form filling completed');
+
+    } catch (error) {
+      console.error('Error filling form:', error);
+      this.showNotification(`Error: ${error.message}`, 'error');
+    } finally {
+      this.streamingAnalysis = null;
+      this.isFilling = false;
+    }
+  }
+
+  enqueueInstruction(stream, instruction) {
+    // Instructions run one at a time, in arrival order
+    if (stream.queued.has(instruction.selector)) {
+      return;
+    }
+    stream.queued.add(instruction.selector);
+
+    this.fillQueue = this.fillQueue
+      .then(() => this.executeInstruction(instruction))
+      .then(() => this.delay(800)); // Reasonable delay between fields
+  }
+
   async executeInstruction(instruction) {
     const { action, selector, value, field_type } = instruction;
 
@@ -403,6 +839,12 @@ class DynamicFormFiller {
           await this.clickElement(element);
           break;
 
+        case 'check':
+        case 'uncheck':
+          // Sets the state instead of toggling it
+          await this.fillField(element, action === 'check' ? 'true' : 'false', field_type);
+          break;
+
         case 'upload':
           await this.uploadFile(element, value);
           break;
@@ -412,11 +854,12 @@ class DynamicFormFiller {
 
       // Notify backend via WebSocket
       if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-        this.ws.send(JSON.stringify({
+        this.sendSocketMessage({
           action: 'field_filled',
+          session_id: this.fillSessionId || undefined,
           field_name: selector,
           value: value
-        }));
+        });
       }
 
     } catch (error) {
@@ -424,11 +867,11 @@ class DynamicFormFiller {
 
       // Ask backend for alternative strategy
       if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-        this.ws.send(JSON.stringify({
+        this.sendSocketMessage({
           action: 'error',
           error: error.message,
           field: instruction
-        }));
+        });
       }
     }
   }
@@ -634,26 +1077,90 @@ class DynamicFormFiller {
     return options;
   }
 
-  selectNativeDropdown(selectElement, desiredValue) {
+  async prefetchDropdownChoices(instructions) {
     /**
-     * Select option from native <select>
+     * Collect every native <select> that local matching can't resolve
+     * and ask the backend for all of them in a single batch call
+     */
+    this.dropdownChoices = new Map();
+
+    const pending = [];
+    for (const instruction of instructions) {
+      if (instruction.value === undefined || instruction.value === null) continue;
+
+      const element = document.querySelector(instruction.selector);
+      if (!element || element.tagName !== 'SELECT') continue;
+
+      const desiredValue = String(instruction.value);
+      if (this.findNativeOption(element, desiredValue)) continue;
+
+      pending.push({ element, desiredValue });
+    }
+
+    if (pending.length === 0) return;
+
+    try {
+      const response = await fetch(`${this.backendUrl}/api/smart-dropdown/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          items: pending.map(({ element, desiredValue }) => ({
+            options: Array.from(element.options).map(opt => opt.text.trim()),
+            desired_value: desiredValue,
+            context: this.getElementContext(element)
+          }))
+        })
+      });
+
+      const result = await response.json();
+
+      if (result.success) {
+        result.selections.forEach((selection, i) => {
+          this.dropdownChoices.set(pending[i].element, selection.selected_option);
+        });
+        console.log(`✅ Resolved ${pending.length} dropdowns in one batch`);
+      }
+    } catch (error) {
+      console.error('Error with batched dropdown selection:', error);
+    }
+  }
+
+  findNativeOption(selectElement, desiredValue) {
+    /**
+     * Exact, then substring match against a native <select>'s options
      */
     const options = Array.from(selectElement.options);
+    const desired = desiredValue.toLowerCase();
 
     // Try exact match
     let matchingOption = options.find(opt =>
-      opt.value.toLowerCase() === desiredValue.toLowerCase() ||
-      opt.text.toLowerCase() === desiredValue.toLowerCase()
+      opt.value.toLowerCase() === desired ||
+      opt.text.toLowerCase() === desired
     );
 
     // Try substring match
     if (!matchingOption) {
       matchingOption = options.find(opt =>
-        opt.text.toLowerCase().includes(desiredValue.toLowerCase()) ||
-        desiredValue.toLowerCase().includes(opt.text.toLowerCase())
+        opt.text.toLowerCase().includes(desired) ||
+        desired.includes(opt.text.toLowerCase())
       );
     }
 
+    return matchingOption;
+  }
+
+  selectNativeDropdown(selectElement, desiredValue) {
+    /**
+     * Select option from native <select>
+     */
+    let matchingOption = this.findNativeOption(selectElement, desiredValue);
+
+    // Fall back to the choice resolved by the batched backend call
+    if (!matchingOption && this.dropdownChoices.has(selectElement)) {
+      const choice = this.dropdownChoices.get(selectElement);
+      matchingOption = Array.from(selectElement.options).find(opt => opt.text.trim() === choice);
+    }
+
     if (matchingOption) {
       selectElement.value = matchingOption.value;
       selectElement.dispatchEvent(new Event('change', { bubbles: true }));